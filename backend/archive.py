@@ -0,0 +1,325 @@
+"""Hot/cold storage for timesheets.
+
+Finalized (approved or rejected) timesheets dated before a cutoff are moved
+from ``timesheets`` to ``timesheets_archive`` in batches, so the hot
+collection and its indexes only hold the weeks people are still working
+on. ``TieredTimesheetRepository`` keeps the split invisible to the API: a
+read only touches the archive when its criteria can match an archived row,
+i.e. when it reaches back before the archive watermark and admits a
+finalized status, and a list page only when the hot rows do not already
+fill it back to the watermark; dashboards, pending approvals and recent
+lists stay on the hot collection.
+
+    python archive.py                          # archive finalized timesheets older than 180 days
+    python archive.py --before 2024-01-01
+    python archive.py --older-than-days 90 --dry-run
+
+The watermark (every archived row is dated before it) is raised before any
+row moves, then the run waits ``--settle-seconds`` so every worker's cached
+copy of it (``WATERMARK_TTL_SECONDS``) has expired. A row is copied to the
+archive before it is deleted from the hot collection, and list reads query
+hot before cold, so a row in flight is seen twice (and de-duplicated)
+rather than not at all. The delete only takes rows whose ``updated_at`` is
+still the copied one, so an edit made in between is never lost. An
+interrupted run is resumed by running it again.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Sequence
+
+import reports
+from pagination import encode_cursor
+from repositories import (
+    TIMESHEET_SORT,
+    ArchiveWatermarkRepository,
+    DuplicateError,
+    Page,
+    TimesheetRepository,
+    create_repositories,
+)
+from settings import Settings
+
+COLLECTION = "timesheets_archive"
+STATE_COLLECTION = "archive_state"
+TIMESHEETS_KEY = "timesheets"
+
+FINALIZED = ("approved", "rejected")
+WATERMARK_TTL_SECONDS = 10.0
+
+
+def _value(status):
+    return getattr(status, "value", status)
+
+
+def spans_archive(criteria: dict, watermark: Optional[datetime]) -> bool:
+    """Whether an archived timesheet can match ``criteria``."""
+    if watermark is None:
+        return False
+    if criteria.get("date_from") and criteria["date_from"] >= watermark:
+        return False
+    statuses = set(FINALIZED)
+    if criteria.get("status") is not None:
+        statuses &= {_value(criteria["status"])}
+    if criteria.get("status_in") is not None:
+        statuses &= {_value(status) for status in criteria["status_in"]}
+    if criteria.get("status_not_in"):
+        statuses -= {_value(status) for status in criteria["status_not_in"]}
+    return bool(statuses)
+
+
+def is_archivable(timesheet: dict, watermark: Optional[datetime]) -> bool:
+    return watermark is not None and _value(timesheet["status"]) in FINALIZED and timesheet["date"] < watermark
+
+
+def _sort_key(timesheet: dict) -> tuple:
+    return timesheet["date"], timesheet["id"]
+
+
+async def _next(iterator):
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class TieredTimesheetRepository(TimesheetRepository):
+    """A hot and an archive ``TimesheetRepository`` behind one interface."""
+
+    def __init__(
+        self,
+        hot: TimesheetRepository,
+        cold: TimesheetRepository,
+        watermark: ArchiveWatermarkRepository,
+        watermark_ttl: float = WATERMARK_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.hot = hot
+        self.cold = cold
+        self.watermark = watermark
+        self.watermark_ttl = watermark_ttl
+        self.clock = clock
+        self._watermark_value = None
+        self._watermark_expires = None
+
+    async def _watermark(self) -> Optional[datetime]:
+        now = self.clock()
+        if self._watermark_expires is None or now >= self._watermark_expires:
+            self._watermark_value = await self.watermark.read()
+            self._watermark_expires = now + self.watermark_ttl
+        return self._watermark_value
+
+    def expire_watermark(self) -> None:
+        self._watermark_expires = None
+
+    async def _spans(self, criteria: dict) -> bool:
+        return spans_archive(criteria, await self._watermark())
+
+    async def _restore(self, timesheets: List[dict]) -> None:
+        # Archived rows that an update took out of the archivable range go back to the hot collection
+        watermark = await self._watermark()
+        restored = [timesheet for timesheet in timesheets if not is_archivable(timesheet, watermark)]
+        if restored:
+            await self.hot.insert_many(restored)
+            await self.cold.delete_many({"ids": [timesheet["id"] for timesheet in restored]})
+
+    async def insert(self, timesheet: dict) -> None:
+        await self.hot.insert(timesheet)
+
+    async def insert_many(self, timesheets: List[dict]) -> None:
+        # Ids are only unique per collection, so rows that could be archived
+        # (old imports) are checked against the archive first
+        watermark = await self._watermark()
+        archivable = [timesheet["id"] for timesheet in timesheets if is_archivable(timesheet, watermark)]
+        archived = set()
+        if archivable:
+            found, _ = await self.cold.page({"ids": archivable}, len(archivable), None, False, ["id"])
+            archived = {timesheet["id"] for timesheet in found}
+        if not archived:
+            await self.hot.insert_many(timesheets)
+            return
+        positions = [position for position, timesheet in enumerate(timesheets) if timesheet["id"] not in archived]
+        duplicates = [position for position, timesheet in enumerate(timesheets) if timesheet["id"] in archived]
+        try:
+            await self.hot.insert_many([timesheets[position] for position in positions])
+        except DuplicateError as exc:
+            duplicates += [positions[index] for index in exc.indexes]
+        raise DuplicateError(sorted(duplicates))
+
+    async def find_one(self, criteria: dict, fields: Optional[Sequence[str]] = None) -> Optional[dict]:
+        timesheet = await self.hot.find_one(criteria, fields)
+        if timesheet is None and await self._spans(criteria):
+            timesheet = await self.cold.find_one(criteria, fields)
+        return timesheet
+
+    async def exists(self, timesheet_id: str) -> bool:
+        if await self.hot.exists(timesheet_id):
+            return True
+        return await self._watermark() is not None and await self.cold.exists(timesheet_id)
+
+    async def update(self, criteria: dict, changes: dict) -> Optional[dict]:
+        previous = await self.hot.update(criteria, changes)
+        if previous is None and await self._spans(criteria):
+            previous = await self.cold.update(criteria, changes)
+            if previous is not None:
+                await self._restore([{**previous, **changes}])
+        return previous
+
+    async def update_many(self, criteria: dict, changes: dict, limit: Optional[int] = None) -> List[dict]:
+        updated = await self.hot.update_many(criteria, changes, limit)
+        if (limit is None or len(updated) < limit) and await self._spans(criteria):
+            archived = await self.cold.update_many(criteria, changes, None if limit is None else limit - len(updated))
+            await self._restore(archived)
+            updated += archived
+        return updated
+
+    async def delete(self, criteria: dict) -> Optional[dict]:
+        timesheet = await self.hot.delete(criteria)
+        if timesheet is None and await self._spans(criteria):
+            timesheet = await self.cold.delete(criteria)
+        return timesheet
+
+    async def delete_many(self, criteria: dict) -> int:
+        deleted = await self.hot.delete_many(criteria)
+        if await self._spans(criteria):
+            deleted += await self.cold.delete_many(criteria)
+        return deleted
+
+    async def page(
+        self, criteria: dict, limit: int, cursor: Optional[str], paginate: bool, fields: Sequence[str]
+    ) -> Page:
+        hot_documents, hot_cursor = await self.hot.page(criteria, limit, cursor, paginate, fields)
+        if not await self._spans(criteria):
+            return hot_documents, hot_cursor
+        if paginate and len(hot_documents) == limit and hot_documents[-1]["date"] >= await self._watermark():
+            # Archived rows all sort after a full hot page that ends at or after
+            # the watermark, so they cannot be on it (the usual case for recent
+            # lists); the next page starts after it even if the hot tier is done
+            return hot_documents, hot_cursor or encode_cursor([hot_documents[-1][field] for field, _ in TIMESHEET_SORT])
+        # Each tier returns up to `limit` rows after the cursor; the next page
+        # starts after the last row kept from their merge
+        cold_documents, cold_cursor = await self.cold.page(criteria, limit, cursor, paginate, fields)
+        merged = {timesheet["id"]: timesheet for timesheet in cold_documents}
+        merged.update((timesheet["id"], timesheet) for timesheet in hot_documents)
+        documents = sorted(merged.values(), key=_sort_key, reverse=True)
+        if not paginate:
+            return documents, None
+        more = len(documents) > limit or hot_cursor is not None or cold_cursor is not None
+        documents = documents[:limit]
+        if not (more and documents):
+            return documents, None
+        return documents, encode_cursor([documents[-1][field] for field, _ in TIMESHEET_SORT])
+
+    async def scan(self, criteria: dict, fields: Sequence[str], batch_size: int):
+        if not await self._spans(criteria):
+            async for timesheet in self.hot.scan(criteria, fields, batch_size):
+                yield timesheet
+            return
+        # Both tiers are in export order; merge them, skipping a row met twice
+        iterators = [self.hot.scan(criteria, fields, batch_size).__aiter__(),
+                     self.cold.scan(criteria, fields, batch_size).__aiter__()]
+        heads = [await _next(iterator) for iterator in iterators]
+        last = None
+        while heads[0] is not None or heads[1] is not None:
+            if heads[1] is None or (heads[0] is not None and _sort_key(heads[0]) <= _sort_key(heads[1])):
+                side = 0
+            else:
+                side = 1
+            timesheet = heads[side]
+            heads[side] = await _next(iterators[side])
+            if _sort_key(timesheet) != last:
+                last = _sort_key(timesheet)
+                yield timesheet
+
+    async def hours_rollup(self, criteria: dict, period: str, group_by: Sequence[str]) -> List[dict]:
+        if not await self._spans(criteria):
+            return await self.hot.hours_rollup(criteria, period, group_by)
+        hot_rows, cold_rows = await asyncio.gather(
+            self.hot.hours_rollup(criteria, period, group_by), self.cold.hours_rollup(criteria, period, group_by)
+        )
+        return reports.merge_rollup_rows(hot_rows, cold_rows)
+
+    async def project_burn(self, project_id: str) -> dict:
+        if not await self._spans({"project_id": project_id}):
+            return await self.hot.project_burn(project_id)
+        hot_facets, cold_facets = await asyncio.gather(
+            self.hot.project_burn(project_id), self.cold.project_burn(project_id)
+        )
+        return reports.merge_burn_facets(hot_facets, cold_facets)
+
+
+async def archive_timesheets(
+    timesheets: TieredTimesheetRepository,
+    before: datetime,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+    settle_seconds: float = WATERMARK_TTL_SECONDS + 5,
+    log=print,
+) -> int:
+    """Move finalized timesheets dated before ``before`` to the archive; returns how many moved."""
+    criteria = {"status_in": FINALIZED, "date_before": before}
+    if dry_run:
+        count = 0
+        async for _ in timesheets.hot.scan(criteria, ["id"], batch_size):
+            count += 1
+        log(f"{count:,} timesheets dated before {before:%Y-%m-%d} would be archived")
+        return count
+
+    previous = await timesheets.watermark.advance(before)
+    timesheets.expire_watermark()
+    if previous is None or previous < before:
+        log(f"Archive watermark raised to {before:%Y-%m-%d}; waiting {settle_seconds:g}s for workers to see it")
+        await asyncio.sleep(settle_seconds)
+
+    moved = 0
+    while True:
+        batch, _ = await timesheets.hot.page(criteria, batch_size, None, True, None)
+        if not batch:
+            break
+        ids = [timesheet["id"] for timesheet in batch]
+        # Copies left behind by an interrupted run would collide on id
+        await timesheets.cold.delete_many({"ids": ids})
+        await timesheets.cold.insert_many(batch)
+        # Only rows still as copied: one edited meanwhile (say, a manager
+        # correcting an approved timesheet) would otherwise be lost
+        deleted = await timesheets.hot.delete_many({
+            **criteria,
+            "ids": ids,
+            "updated_at_by_id": {timesheet["id"]: timesheet.get("updated_at") for timesheet in batch},
+        })
+        if deleted < len(ids):
+            # Rows updated since the batch was read stay hot; drop their stale
+            # copies (those still archivable are copied again by a later batch)
+            still_hot, _ = await timesheets.hot.page({"ids": ids}, len(ids), None, False, ["id"])
+            await timesheets.cold.delete_many({"ids": [timesheet["id"] for timesheet in still_hot]})
+        moved += deleted
+        log(f"archived {moved:,}")
+    return moved
+
+
+async def _main(args) -> int:
+    settings = Settings.from_env()
+    repos = create_repositories(
+        settings.storage_backend, settings.mongo_url, settings.db_name, **settings.mongo_client_options()
+    )
+    before = args.before or (datetime.utcnow() - timedelta(days=args.older_than_days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    try:
+        await archive_timesheets(repos.timesheets, before, args.batch_size, args.dry_run, args.settle_seconds)
+    finally:
+        repos.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cutoff = parser.add_mutually_exclusive_group()
+    cutoff.add_argument("--before", type=datetime.fromisoformat, help="archive timesheets dated before this date")
+    cutoff.add_argument("--older-than-days", type=int, default=180)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be archived")
+    parser.add_argument("--settle-seconds", type=float, default=WATERMARK_TTL_SECONDS + 5,
+                        help="wait after raising the watermark, longer than the workers' cache TTL")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,124 @@
+"""Per-row serialization cost of the list endpoints, before and after the fast path.
+
+"model" is what the endpoints used to do: build a Pydantic model per row,
+validate the page again against response_model and render it with the json
+module. "fast" is the current path: rows projected to the model's fields go
+straight through ORJSONResponse. Both outputs are compared so the JSON
+contract is checked too. No database is needed:
+
+    python bench_serialization.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from server import Project, Timesheet, User
+
+
+def _timesheet_rows(count: int) -> list:
+    start = datetime(2024, 1, 1, 9, 30, 15, 123000)
+    return [{
+        "id": str(uuid.uuid4()),
+        "employee_id": str(uuid.uuid4()),
+        "project_id": str(uuid.uuid4()),
+        "date": start + timedelta(days=i % 90),
+        "hours": 7.5,
+        "description": "Implemented the reporting endpoint and reviewed two pull requests",
+        "status": ("draft", "submitted", "approved", "rejected")[i % 4],
+        "submitted_at": start if i % 4 else None,
+        "approved_at": start if i % 4 == 2 else None,
+        "approved_by": str(uuid.uuid4()) if i % 4 == 2 else None,
+        "rejected_at": start if i % 4 == 3 else None,
+        "rejected_by": str(uuid.uuid4()) if i % 4 == 3 else None,
+        "rejection_reason": "Needs more details" if i % 4 == 3 else None,
+        "created_at": start,
+        "updated_at": start,
+    } for i in range(count)]
+
+
+def _project_rows(count: int) -> list:
+    start = datetime(2024, 1, 1)
+    return [{
+        "id": str(uuid.uuid4()),
+        "name": f"Project {i}",
+        "description": "Internal tooling and platform work for the finance team",
+        "start_date": start,
+        "end_date": None,
+        "status": "active",
+        "assigned_employees": [str(uuid.uuid4()) for _ in range(20)],
+        "budget_hours": 500.0 if i % 2 else None,
+        "created_by": str(uuid.uuid4()),
+        "created_at": start + timedelta(minutes=i),
+    } for i in range(count)]
+
+
+def _user_rows(count: int) -> list:
+    start = datetime(2024, 1, 1)
+    return [{
+        "id": str(uuid.uuid4()),
+        "email": f"user{i}@example.com",
+        "username": f"user{i}",
+        "full_name": f"User Number {i}",
+        "role": "employee",
+        "created_at": start + timedelta(minutes=i),
+        "is_active": True,
+    } for i in range(count)]
+
+
+def _page_model(model):
+    class Page(BaseModel):
+        items: List[model]
+        next_cursor: Optional[str] = None
+    return Page
+
+
+def _model_path(model, adapter, rows: list) -> bytes:
+    content = {"items": [model(**row) for row in rows], "next_cursor": None}
+    value = adapter.validate_python(content, from_attributes=True)
+    data = adapter.dump_python(value, mode="json")
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _fast_path(rows: list) -> bytes:
+    return ORJSONResponse({"items": rows, "next_cursor": None}).body
+
+
+def _per_row_us(fn, rows: int, repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat / rows * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = [
+        ("get_timesheets", Timesheet, _timesheet_rows(args.rows)),
+        ("get_projects", Project, _project_rows(args.rows)),
+        ("get_users", User, _user_rows(args.rows)),
+    ]
+    print(f"{'endpoint':16} {'model us/row':>13} {'fast us/row':>12} {'speedup':>8}")
+    for name, model, rows in cases:
+        assert all(set(row) == set(model.model_fields) for row in rows), f"{name}: rows do not match the model"
+        adapter = TypeAdapter(_page_model(model))
+        assert json.loads(_model_path(model, adapter, rows)) == json.loads(_fast_path(rows)), \
+            f"{name}: fast path changes the JSON contract"
+
+        before = _per_row_us(lambda: _model_path(model, adapter, rows), args.rows, args.repeat)
+        after = _per_row_us(lambda: _fast_path(rows), args.rows, args.repeat)
+        print(f"{name:16} {before:13.2f} {after:12.2f} {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
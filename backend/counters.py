@@ -0,0 +1,186 @@
+"""Materialized dashboard counters.
+
+One document per employee (``_id: "employee:<id>"``) plus a global one
+(``_id: "global"``) in the ``dashboard_counters`` collection. The timesheet
+handlers pass the before/after images of each request's writes to
+``apply_changes`` (one bulk write of net increments), so the dashboard is a
+single ``_id`` lookup instead of a scan.
+
+The counters are not written in the same transaction as the timesheet, so a
+crash between the two writes leaves them off. Rebuild them from the raw
+collection with:
+
+    python counters.py            # rebuild and report drift
+    python counters.py --dry-run  # only report drift
+
+A rebuild replaces each counter with the aggregate, so increments from
+writes made while it runs are lost: rebuild with the API stopped (or
+read-only). The drift report is safe at any time and is also available to
+admins as a background job (POST /api/admin/counters/rebuild).
+"""
+import argparse
+import asyncio
+import logging
+from typing import Iterable, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+import archive
+import versions
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "dashboard_counters"
+GLOBAL_KEY = "global"
+FIELDS = (
+    "total_hours", "total_timesheets",
+    "approved_hours", "approved_timesheets",
+    "pending_hours", "pending_timesheets",
+)
+# Tolerance for float hours accumulated through $inc
+_EPSILON = 1e-6
+
+
+def employee_key(employee_id: str) -> str:
+    return f"employee:{employee_id}"
+
+
+def empty_counters() -> dict:
+    return {field: 0 for field in FIELDS}
+
+
+def contribution(timesheet: Optional[dict]) -> dict:
+    """What a single timesheet adds to its employee's and the global counters."""
+    counters = empty_counters()
+    if not timesheet:
+        return counters
+    hours = timesheet["hours"]
+    counters["total_hours"] = hours
+    counters["total_timesheets"] = 1
+    if timesheet["status"] == "approved":
+        counters["approved_hours"] = hours
+        counters["approved_timesheets"] = 1
+    elif timesheet["status"] == "submitted":
+        counters["pending_hours"] = hours
+        counters["pending_timesheets"] = 1
+    return counters
+
+
+def change_deltas(changes: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> dict:
+    """Net increments per counter key for many ``(before, after)`` images."""
+    deltas = {}
+    for before, after in changes:
+        old, new = contribution(before), contribution(after)
+        employee_id = (after or before)["employee_id"]
+        for key in (GLOBAL_KEY, employee_key(employee_id)):
+            delta = deltas.setdefault(key, empty_counters())
+            for field in FIELDS:
+                delta[field] += new[field] - old[field]
+    return deltas
+
+
+async def apply_changes(db, changes: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> None:
+    """Apply many ``(before, after)`` deltas in one bulk write."""
+    operations = []
+    for key, delta in change_deltas(changes).items():
+        delta = {field: value for field, value in delta.items() if value}
+        if delta:
+            operations.append(UpdateOne({"_id": key}, {"$inc": delta}, upsert=True))
+    if operations:
+        await db[COLLECTION].bulk_write(operations, ordered=False)
+
+
+async def read_counters(db, key: str) -> dict:
+    doc = await db[COLLECTION].find_one({"_id": key})
+    counters = empty_counters()
+    if doc:
+        counters.update({field: doc.get(field, 0) for field in FIELDS})
+    return counters
+
+
+async def compute_counters(db) -> dict:
+    """Counters recomputed from the timesheets (hot and archived), keyed like the stored docs."""
+    pipeline = [
+        {"$group": {
+            "_id": "$employee_id",
+            "total_hours": {"$sum": "$hours"},
+            "total_timesheets": {"$sum": 1},
+            "approved_hours": {"$sum": {"$cond": [{"$eq": ["$status", "approved"]}, "$hours", 0]}},
+            "approved_timesheets": {"$sum": {"$cond": [{"$eq": ["$status", "approved"]}, 1, 0]}},
+            "pending_hours": {"$sum": {"$cond": [{"$eq": ["$status", "submitted"]}, "$hours", 0]}},
+            "pending_timesheets": {"$sum": {"$cond": [{"$eq": ["$status", "submitted"]}, 1, 0]}},
+        }},
+    ]
+    computed = {GLOBAL_KEY: empty_counters()}
+    for collection in ("timesheets", archive.COLLECTION):
+        async for row in db[collection].aggregate(pipeline, allowDiskUse=True):
+            counters = computed.setdefault(employee_key(row["_id"]), empty_counters())
+            for field in FIELDS:
+                counters[field] += row[field]
+                computed[GLOBAL_KEY][field] += row[field]
+    return computed
+
+
+def counter_drift(computed: dict, stored: dict) -> list:
+    """``(key, field, stored, actual)`` for every stored value that is off."""
+    drift = []
+    for key in sorted(set(computed) | set(stored)):
+        actual = computed.get(key, empty_counters())
+        current = stored.get(key, {})
+        for field in FIELDS:
+            if abs(current.get(field, 0) - actual[field]) > _EPSILON:
+                drift.append((key, field, current.get(field, 0), actual[field]))
+    return drift
+
+
+async def rebuild_counters(db, dry_run: bool = False) -> list:
+    """Recompute every counter document and return the drift found.
+
+    Each drift entry is ``(key, field, stored, actual)``. Unless ``dry_run``
+    is set the stored documents are replaced and counters for employees
+    without timesheets are removed.
+    """
+    computed = await compute_counters(db)
+    stored = {doc["_id"]: doc async for doc in db[COLLECTION].find()}
+
+    drift = counter_drift(computed, stored)
+    if not dry_run:
+        operations = [ReplaceOne({"_id": key}, counters, upsert=True) for key, counters in computed.items()]
+        stale = [key for key in stored if key not in computed]
+        if stale:
+            operations.append(DeleteMany({"_id": {"$in": stale}}))
+        await db[COLLECTION].bulk_write(operations, ordered=False)
+        if drift:
+            # Dashboards served with the old values must not be answered with 304
+            await versions.new_epoch(db)
+    return drift
+
+
+async def ensure_counters(db) -> None:
+    """Build the counters on first start against an existing database."""
+    if await db[COLLECTION].find_one({"_id": GLOBAL_KEY}) is None:
+        drift = await rebuild_counters(db)
+        logger.info("Built dashboard counters (%d values initialised)", len(drift))
+
+
+async def _main(args) -> int:
+    settings = Settings.from_env(storage_backend="mongo")
+    client = AsyncIOMotorClient(settings.mongo_url, **settings.mongo_client_options())
+    db = client[settings.db_name]
+    try:
+        drift = await rebuild_counters(db, dry_run=args.dry_run)
+    finally:
+        client.close()
+    for key, field, stored, actual in drift:
+        print(f"{key:45} {field:20} stored={stored} actual={actual}")
+    print(f"{len(drift)} drifted value(s){' (not repaired)' if args.dry_run else ''}")
+    return 1 if drift and args.dry_run else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the dashboard counters from the timesheets collection")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without writing")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,115 @@
+"""In-process fan-out of timesheet events to streaming subscribers.
+
+Publishing never waits on a subscriber: each one has a bounded queue and a
+subscriber whose queue is full is evicted on the spot (its queue is replaced
+by a single "evicted" notice) so one slow client cannot hold up the handlers
+or grow memory without bound. Evicted clients reconnect and refetch.
+
+A write that changes many timesheets at once (bulk create, bulk approval)
+is published as a single "bulk" event per subscriber carrying the ids it
+may see, a hint to refetch, so one large write cannot fill every queue.
+
+The broker lives in one process; with several workers each one only sees
+the writes it handled itself.
+"""
+import asyncio
+import itertools
+from typing import Dict, List, Optional
+
+import orjson
+
+EVICTED = "evicted"
+BULK = "bulk"
+
+
+class Subscriber:
+    def __init__(self, employee_id: Optional[str], max_queue: int):
+        # employee_id=None receives everything (managers and admins)
+        self.employee_id = employee_id
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.evicted = False
+
+    def wants(self, event: dict) -> bool:
+        return self.employee_id is None or event["employee_id"] == self.employee_id
+
+
+class EventBroker:
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self, employee_id: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(employee_id, self.max_queue)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event_type: str, employee_id: str, data: dict) -> None:
+        event = {"id": next(self._ids), "type": event_type, "employee_id": employee_id, "data": data}
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            if subscriber.wants(event):
+                self._deliver(subscriber, event)
+
+    def publish_bulk(self, ids_by_employee: Dict[str, List[str]]) -> None:
+        """One "bulk" event per interested subscriber, with the changed ids it may see."""
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            if subscriber.employee_id is None:
+                ids = [timesheet_id for ids in ids_by_employee.values() for timesheet_id in ids]
+            else:
+                ids = ids_by_employee.get(subscriber.employee_id)
+            if ids:
+                event = {"id": next(self._ids), "type": BULK, "employee_id": subscriber.employee_id, "data": {"ids": ids}}
+                self._deliver(subscriber, event)
+
+    def _deliver(self, subscriber: Subscriber, event: dict) -> None:
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._evict(subscriber)
+
+    def _evict(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        subscriber.evicted = True
+        self.evictions += 1
+        # Drop the backlog so the notice is the next (and last) thing it reads
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait({"id": None, "type": EVICTED, "employee_id": subscriber.employee_id, "data": None})
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "max_queue": self.max_queue,
+            "published": self.published,
+            "evictions": self.evictions,
+        }
+
+
+def _status(timesheet: dict) -> str:
+    # Documents built from the models hold TimesheetStatus members, ones read back plain strings
+    return getattr(timesheet["status"], "value", timesheet["status"])
+
+
+def timesheet_event_type(before: Optional[dict], after: Optional[dict]) -> str:
+    """Name of the event for a write: created/submitted/approved/rejected/updated/deleted."""
+    if after is None:
+        return "deleted"
+    previous_status = _status(before) if before is not None else None
+    if _status(after) != previous_status and _status(after) in ("submitted", "approved", "rejected"):
+        return _status(after)
+    return "created" if before is None else "updated"
+
+
+def format_sse(event: dict) -> str:
+    # orjson never emits raw newlines, so the payload is always one data: line
+    message = f"event: {event['type']}\ndata: {orjson.dumps(event['data']).decode('utf-8')}\n\n"
+    if event["id"] is not None:
+        message = f"id: {event['id']}\n" + message
+    return message
@@ -0,0 +1,54 @@
+"""Streaming CSV / NDJSON encoders for timesheet exports.
+
+The encoders walk an async iterator of documents (a repository ``scan``,
+which reads in bounded batches) and yield one text chunk per batch, so
+memory use does not depend on the export size.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+
+EXPORT_BATCH_SIZE = 1000
+
+TIMESHEET_COLUMNS = (
+    "id", "employee_id", "project_id", "date", "hours", "description", "status",
+    "submitted_at", "approved_at", "approved_by", "rejected_at", "rejected_by",
+    "rejection_reason", "created_at", "updated_at",
+)
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+async def csv_chunks(cursor, columns=TIMESHEET_COLUMNS, batch_size: int = EXPORT_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    pending = 0
+    async for document in cursor:
+        writer.writerow(["" if document.get(column) is None else _plain(document[column]) for column in columns])
+        pending += 1
+        if pending == batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+async def ndjson_chunks(cursor, columns=TIMESHEET_COLUMNS, batch_size: int = EXPORT_BATCH_SIZE):
+    lines = []
+    async for document in cursor:
+        lines.append(json.dumps({column: _plain(document.get(column)) for column in columns}))
+        if len(lines) == batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
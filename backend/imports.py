@@ -0,0 +1,298 @@
+"""Streaming CSV import of timesheets, for migrations from other trackers.
+
+The first row names the columns, in any order; unknown columns are ignored:
+
+    username, project, date, hours       required
+    id, description, status,             optional (a new id, "", draft)
+    submitted_at, approved_at, approved_by, rejected_at, rejected_by,
+    rejection_reason, created_at, updated_at
+
+Users (username, approved_by, rejected_by) and projects (by name) are
+resolved through lookup tables loaded once per import. The upload is parsed
+as it arrives and written in unordered ``insert_many`` batches, the next
+batch being parsed while the previous one is written. A bad row is reported
+with its line number and skipped; the rest of the file is still imported.
+Rows with an ``id`` can be imported again: ids that exist are reported as
+duplicates instead of written twice.
+
+    python imports.py history.csv
+    python imports.py --dry-run history.csv
+    curl -X POST --data-binary @history.csv -H "Authorization: Bearer $TOKEN" \\
+         "$API/api/timesheets/import?dry_run=true"
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import math
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import reports
+import versions
+from repositories import DuplicateError, Repositories, create_repositories
+from settings import Settings
+
+IMPORT_BATCH_SIZE = 5000
+READ_CHUNK_SIZE = 1 << 20
+# The count of failed rows is exact; only this many of them are listed
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = ("username", "project", "date", "hours")
+DATETIME_COLUMNS = ("submitted_at", "approved_at", "rejected_at", "created_at", "updated_at")
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be imported (bad header, not UTF-8)."""
+
+
+class ImportLookups:
+    def __init__(self, users: Dict[str, str], projects: Dict[str, Optional[str]]):
+        self.users = users
+        # Project names are not unique; an ambiguous name maps to None
+        self.projects = projects
+
+    @classmethod
+    async def load(cls, repos: Repositories) -> "ImportLookups":
+        users, _ = await repos.users.page(0, None, False, ["id", "username"])
+        projects, _ = await repos.projects.page(None, 0, None, False, ["id", "name"])
+        by_name = {}
+        for project in projects:
+            by_name[project["name"]] = None if project["name"] in by_name else project["id"]
+        return cls({user["username"]: user["id"] for user in users}, by_name)
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[Tuple[int, List[str]]]]:
+    """``(line number, fields)`` for every record, one list per chunk of input.
+
+    Records are cut at line ends outside quotes (an even number of quotes so
+    far), so quoted fields may span lines and chunks.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    record = []
+    quotes = 0
+    line = 1
+
+    def complete(text: str) -> List[Tuple[int, str]]:
+        nonlocal record, quotes, line
+        records = []
+        for part in io.StringIO(text, newline="").readlines():
+            record.append(part)
+            quotes += part.count('"')
+            if quotes % 2 == 0:
+                records.append((line, "".join(record)))
+                line += len(record)
+                record, quotes = [], 0
+        return records
+
+    def parse(records: List[Tuple[int, str]]) -> List[Tuple[int, List[str]]]:
+        parsed = csv.reader([text for _, text in records])
+        return [(number, fields) for (number, _), fields in zip(records, parsed) if fields]
+
+    try:
+        async for chunk in chunks:
+            text = pending + decoder.decode(chunk)
+            # A trailing "\r" may be the first half of "\r\n"; a trailing partial line waits for the rest
+            cut = max(text.rfind("\n"), text.rfind("\r", 0, len(text) - 1)) + 1
+            pending = text[cut:]
+            if cut:
+                yield parse(complete(text[:cut]))
+        text = pending + decoder.decode(b"", final=True)
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError(f"The file is not UTF-8 (near line {line}): {exc.reason}")
+    records = complete(text)
+    if record:
+        raise ImportFormatError(f"Unterminated quoted field starting on line {line}")
+    yield parse(records)
+
+
+def _datetime(row: dict, column: str) -> Optional[datetime]:
+    # Naive UTC, like every stored datetime; values with an offset are converted
+    value = (row.get(column) or "").strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"{column}: not an ISO date/time: {value!r}")
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def _user(row: dict, column: str, lookups: ImportLookups) -> Optional[str]:
+    username = (row.get(column) or "").strip()
+    if not username:
+        return None
+    user_id = lookups.users.get(username)
+    if user_id is None:
+        raise ValueError(f"{column}: unknown user {username!r}")
+    return user_id
+
+
+def parse_row(row: dict, lookups: ImportLookups, now: datetime) -> dict:
+    """The timesheet document for one CSV row; raises ValueError with the reason it is invalid."""
+    employee_id = _user(row, "username", lookups)
+    if employee_id is None:
+        raise ValueError("username: missing")
+    project = row.get("project", "").strip()
+    if project not in lookups.projects:
+        raise ValueError(f"project: unknown project {project!r}")
+    if lookups.projects[project] is None:
+        raise ValueError(f"project: more than one project is named {project!r}")
+    date = _datetime(row, "date")
+    if date is None:
+        raise ValueError("date: missing")
+    try:
+        hours = float(row.get("hours", ""))
+    except ValueError:
+        raise ValueError(f"hours: not a number: {row.get('hours')!r}")
+    if not (math.isfinite(hours) and 0 < hours <= 24):
+        raise ValueError(f"hours: must be more than 0 and at most 24, not {hours:g}")
+    status = row.get("status", "").strip().lower() or "draft"
+    if status not in reports.STATUSES:
+        raise ValueError(f"status: must be one of {', '.join(reports.STATUSES)}, not {status!r}")
+    stamps = {column: _datetime(row, column) for column in DATETIME_COLUMNS}
+    created_at = stamps["created_at"] or now
+    return {
+        "id": row.get("id", "").strip() or str(uuid.uuid4()),
+        "employee_id": employee_id,
+        "project_id": lookups.projects[project],
+        "date": date,
+        "hours": hours,
+        "description": row.get("description", ""),
+        "status": status,
+        "submitted_at": stamps["submitted_at"],
+        "approved_at": stamps["approved_at"],
+        "approved_by": _user(row, "approved_by", lookups),
+        "rejected_at": stamps["rejected_at"],
+        "rejected_by": _user(row, "rejected_by", lookups),
+        "rejection_reason": row.get("rejection_reason") or None,
+        "created_at": created_at,
+        "updated_at": stamps["updated_at"] or created_at,
+    }
+
+
+async def record_imported(repos: Repositories, timesheets: List[dict]) -> None:
+    # Derived state for a batch written outside the API (the app passes its own)
+    await repos.counters.apply_changes([(None, timesheet) for timesheet in timesheets])
+    await repos.versions.bump(
+        versions.TIMESHEETS, *{versions.employee_timesheets(timesheet["employee_id"]) for timesheet in timesheets}
+    )
+
+
+async def import_timesheets(
+    repos: Repositories,
+    chunks: AsyncIterator[bytes],
+    dry_run: bool = False,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    on_inserted: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+) -> dict:
+    """Import CSV ``chunks``; returns ``{"imported", "failed", "errors", "dry_run"}``.
+
+    ``on_inserted`` is called with every written batch (default: update the
+    dashboard counters and ETag versions). Raises ``ImportFormatError`` if
+    the header or the encoding is wrong; nothing is written in that case
+    unless earlier batches already were.
+    """
+    on_inserted = on_inserted or (lambda timesheets: record_imported(repos, timesheets))
+    lookups = await ImportLookups.load(repos)
+    now = datetime.utcnow()
+    summary = {"imported": 0, "failed": 0, "errors": [], "dry_run": dry_run}
+
+    def fail(line: int, error: str) -> None:
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line, "error": error})
+
+    async def write(documents: List[dict], lines: List[int]) -> None:
+        try:
+            await repos.timesheets.insert_many(documents)
+        except DuplicateError as exc:
+            duplicates = set(exc.indexes)
+            for index in exc.indexes:
+                fail(lines[index], f"id: a timesheet with id {documents[index]['id']!r} already exists")
+            documents = [document for index, document in enumerate(documents) if index not in duplicates]
+        summary["imported"] += len(documents)
+        if documents:
+            await on_inserted(documents)
+
+    header = None
+    documents, lines = [], []
+    writing = None
+    async for rows in csv_rows(chunks):
+        for line, fields in rows:
+            if header is None:
+                header = [column.strip().lower() for column in fields]
+                missing = [column for column in REQUIRED_COLUMNS if column not in header]
+                if missing:
+                    raise ImportFormatError(f"Missing column(s) in the header row: {', '.join(missing)}")
+                continue
+            try:
+                documents.append(parse_row(dict(zip(header, fields)), lookups, now))
+                lines.append(line)
+            except ValueError as exc:
+                fail(line, str(exc))
+            if len(documents) == batch_size:
+                if writing is not None:
+                    await writing
+                if dry_run:
+                    summary["imported"] += len(documents)
+                else:
+                    writing = asyncio.ensure_future(write(documents, lines))
+                documents, lines = [], []
+    if writing is not None:
+        await writing
+    if documents:
+        if dry_run:
+            summary["imported"] += len(documents)
+        else:
+            await write(documents, lines)
+    if header is None:
+        raise ImportFormatError("The file is empty")
+    summary["errors"].sort(key=lambda error: error["line"])
+    return summary
+
+
+async def _file_chunks(stream):
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _main(args) -> int:
+    settings = Settings.from_env()
+    repos = create_repositories(
+        settings.storage_backend, settings.mongo_url, settings.db_name, **settings.mongo_client_options()
+    )
+    stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        await repos.prepare()
+        started = time.perf_counter()
+        summary = await import_timesheets(repos, _file_chunks(stream), args.dry_run, args.batch_size)
+    except ImportFormatError as exc:
+        print(exc)
+        return 1
+    finally:
+        stream.close()
+        repos.close()
+    elapsed = time.perf_counter() - started
+    for error in summary["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    verb = "valid" if args.dry_run else "imported"
+    print(f"{summary['imported']:,} rows {verb}, {summary['failed']:,} failed in {elapsed:.1f}s "
+          f"({summary['imported'] / max(elapsed, 1e-9):,.0f} rows/s)")
+    return 0 if not summary["failed"] else 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="CSV file, or - for stdin")
+    parser.add_argument("--dry-run", action="store_true", help="validate only; nothing is written")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,174 @@
+"""Index declarations for the timesheet backend.
+
+The app calls ``ensure_indexes`` at startup. To inspect a deployment, run
+this module directly:
+
+    python indexes.py                 # report missing / unused / unknown indexes
+    python indexes.py --apply         # create missing indexes
+    python indexes.py --drop-unknown  # also drop indexes that are no longer declared
+"""
+import argparse
+import asyncio
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+import archive
+import jobs
+import members
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Keyed by collection name. Index names are stable so that the report and
+# migrations can refer to them. List endpoints page with keyset cursors on
+# the sort keys in server.py (timesheets: date, id descending; projects and
+# users: created_at, id ascending), so every query shape has an index of
+# equality fields followed by those sort keys.
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING)], name="role"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "projects": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "timesheets": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("employee_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="employee_date"),
+        IndexModel([("project_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="project_date"),
+        IndexModel(
+            [("project_id", ASCENDING), ("status", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)],
+            name="project_status_date",
+        ),
+        IndexModel([("status", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="status_date"),
+        IndexModel([("date", DESCENDING), ("id", DESCENDING)], name="date_id"),
+    ],
+}
+# Archived timesheets are read with the same criteria as the hot ones
+INDEXES[archive.COLLECTION] = INDEXES["timesheets"]
+# A project's members and an employee's projects are both covered index scans
+INDEXES[members.COLLECTION] = [
+    IndexModel([("project_id", ASCENDING), ("employee_id", ASCENDING)], name="project_employee_unique", unique=True),
+    IndexModel([("employee_id", ASCENDING), ("project_id", ASCENDING)], name="employee_project"),
+]
+INDEXES[jobs.COLLECTION] = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel([("status", ASCENDING), ("heartbeat_at", ASCENDING)], name="status_heartbeat_at"),
+    # Documents without finished_at (unfinished jobs) never expire
+    IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=jobs.RETENTION_SECONDS),
+]
+INDEXES[jobs.OUTPUT_COLLECTION] = [
+    IndexModel([("job_id", ASCENDING), ("sequence", ASCENDING)], name="job_id_sequence", unique=True),
+    IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=jobs.RETENTION_SECONDS),
+]
+
+
+def _key(spec) -> tuple:
+    # index_information() returns [(field, 1.0), ...]; IndexModel holds a SON
+    items = spec.items() if hasattr(spec, "items") else spec
+    return tuple(
+        (field, int(direction) if isinstance(direction, (int, float)) else direction)
+        for field, direction in items
+    )
+
+
+async def _existing_indexes(collection) -> dict:
+    info = await collection.index_information()
+    return {_key(details["key"]): name for name, details in info.items()}
+
+
+async def missing_indexes(db) -> dict:
+    """Declared indexes that do not exist yet, keyed by collection name."""
+    missing = {}
+    for collection_name, models in INDEXES.items():
+        existing = await _existing_indexes(db[collection_name])
+        absent = [model for model in models if _key(model.document["key"]) not in existing]
+        if absent:
+            missing[collection_name] = absent
+    return missing
+
+
+async def ensure_indexes(db) -> None:
+    """Create every declared index that is missing. Safe to call repeatedly."""
+    for collection_name, models in (await missing_indexes(db)).items():
+        for model in models:
+            name = model.document["name"]
+            try:
+                await db[collection_name].create_indexes([model])
+                logger.info("Created index %s.%s", collection_name, name)
+            except OperationFailure as exc:
+                # Typically duplicates blocking a unique index. Keep serving;
+                # the report lists the index as missing until the data is fixed.
+                logger.error("Could not create index %s.%s: %s", collection_name, name, exc)
+
+
+async def index_report(db) -> dict:
+    """Missing, unknown (present but undeclared) and unused indexes per collection.
+
+    "Unused" comes from ``$indexStats`` and only covers accesses since the
+    last mongod restart.
+    """
+    missing = await missing_indexes(db)
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        declared = {_key(model.document["key"]) for model in models}
+        existing = await _existing_indexes(collection)
+        stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+        report[collection_name] = {
+            "missing": [model.document["name"] for model in missing.get(collection_name, [])],
+            "unknown": sorted(name for key, name in existing.items() if key not in declared and name != "_id_"),
+            "unused": sorted(
+                stat["name"] for stat in stats
+                if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0
+            ),
+        }
+    return report
+
+
+async def drop_unknown_indexes(db) -> None:
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        declared = {_key(model.document["key"]) for model in models}
+        for key, name in (await _existing_indexes(collection)).items():
+            if key not in declared and name != "_id_":
+                await collection.drop_index(name)
+                logger.info("Dropped index %s.%s", collection_name, name)
+
+
+async def _main(args) -> int:
+    settings = Settings.from_env(storage_backend="mongo")
+    client = AsyncIOMotorClient(settings.mongo_url, **settings.mongo_client_options())
+    db = client[settings.db_name]
+    try:
+        if args.apply or args.drop_unknown:
+            await ensure_indexes(db)
+        if args.drop_unknown:
+            await drop_unknown_indexes(db)
+
+        report = await index_report(db)
+        problems = 0
+        for collection_name, entry in report.items():
+            print(f"{collection_name}:")
+            for label in ("missing", "unknown", "unused"):
+                names = entry[label]
+                print(f"  {label:8} {', '.join(names) if names else '-'}")
+            problems += len(entry["missing"])
+        return 1 if problems else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report or apply the backend's MongoDB indexes")
+    parser.add_argument("--apply", action="store_true", help="create missing indexes")
+    parser.add_argument("--drop-unknown", action="store_true", help="create missing and drop undeclared indexes")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,222 @@
+"""Background jobs for operations too long for a request.
+
+The request that starts a job gets its id back straight away (202) and the
+client polls ``GET /api/jobs/{id}`` for status and progress. Jobs are stored
+in the ``jobs`` collection so any worker can answer for them; they run in
+the process that accepted them, on ``workers`` asyncio tasks, with at most
+``max_queue`` more waiting (beyond that ``JobQueueFull``, a 503).
+
+Output (an export's file) is stored in chunks next to the job and streamed
+from ``GET /api/jobs/{id}/output``. A running job's worker refreshes its
+heartbeat every ``HEARTBEAT_SECONDS``. When a worker dies without finishing
+a job, the job is requeued by the next worker to notice if its kind is
+``resumable`` (safe to run again from the start, like the project timesheet
+cascade), and otherwise marked failed when the next worker starts. Finished jobs
+and their output expire after ``RETENTION_SECONDS`` (a TTL index on MongoDB).
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Collection, Dict, Optional
+
+from repositories import JobRepository
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "jobs"
+OUTPUT_COLLECTION = "job_outputs"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+HEARTBEAT_SECONDS = 30.0
+ABANDONED_SECONDS = 120.0
+PROGRESS_INTERVAL_SECONDS = 1.0
+RETENTION_SECONDS = 7 * 24 * 3600
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobContext:
+    """Handed to a job's handler to report progress and write output."""
+
+    def __init__(self, repository: JobRepository, job: dict, clock: Callable[[], float] = time.monotonic):
+        self.repository = repository
+        self.job = job
+        self.clock = clock
+        self.done = 0
+        self.total = None
+        self._reported = None
+        self._chunks = 0
+
+    @property
+    def id(self) -> str:
+        return self.job["id"]
+
+    async def progress(self, done: int, total: Optional[int] = None) -> None:
+        # Written at most once per PROGRESS_INTERVAL_SECONDS; the final value
+        # is written when the job finishes
+        self.done = done
+        self.total = total if total is not None else self.total
+        now = self.clock()
+        if self._reported is None or now - self._reported >= PROGRESS_INTERVAL_SECONDS:
+            self._reported = now
+            await self.repository.update(self.id, {"progress": {"done": self.done, "total": self.total}})
+
+    async def write(self, data: bytes) -> None:
+        await self.repository.append_output(self.id, self._chunks, data)
+        self._chunks += 1
+
+
+Handler = Callable[..., Awaitable[Optional[dict]]]
+
+
+class JobRunner:
+    def __init__(self, repository: JobRepository, handlers: Dict[str, Handler], workers: int, max_queue: int,
+                 heartbeat_seconds: float = HEARTBEAT_SECONDS, abandoned_seconds: float = ABANDONED_SECONDS,
+                 resumable: Collection[str] = ()):
+        # handler(context, **params) returns the job's result; resumable kinds
+        # must be idempotent, as an interrupted one is run again in full
+        self.repository = repository
+        self.handlers = handlers
+        self.resumable = frozenset(resumable)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.heartbeat_seconds = heartbeat_seconds
+        self.abandoned_seconds = abandoned_seconds
+        self.running = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._active: Dict[str, dict] = {}
+        self._tasks = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self) -> None:
+        await self._resume_abandoned()
+        abandoned = await self.repository.fail_abandoned(self._abandoned_before(), "Interrupted: its worker stopped")
+        if abandoned:
+            logger.warning("Marked %d abandoned jobs as failed", abandoned)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job_id, job in list(self._active.items()):
+            try:
+                if job["kind"] in self.resumable:
+                    # Back in the queue with a stale heartbeat, for the next worker to resume
+                    await self.repository.update(
+                        job_id,
+                        {"status": QUEUED, "started_at": None, "heartbeat_at": self._abandoned_before()},
+                        status_in=[QUEUED, RUNNING],
+                    )
+                else:
+                    await self._finish(job_id, FAILED, error="Interrupted: the server shut down")
+            except Exception as exc:
+                logger.warning("Could not mark job %s as interrupted: %r", job_id, exc)
+        self._active.clear()
+
+    async def submit(self, kind: str, params: dict, created_by: Optional[str]) -> dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        if len(self._active) >= self.workers + self.max_queue:
+            raise JobQueueFull()
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "params": params,
+            "status": QUEUED,
+            "progress": {"done": 0, "total": None},
+            "result": None,
+            "error": None,
+            "created_by": created_by,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "heartbeat_at": now,
+        }
+        await self.repository.insert(job)
+        self._active[job["id"]] = job
+        self._queue.put_nowait(job)
+        return job
+
+    def _abandoned_before(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.abandoned_seconds)
+
+    async def _resume_abandoned(self) -> None:
+        if not self.resumable:
+            return
+        resumed = 0
+        while True:
+            job = await self.repository.claim_abandoned(self._abandoned_before(), self.resumable, datetime.utcnow())
+            if job is None:
+                break
+            self._active[job["id"]] = job
+            self._queue.put_nowait(job)
+            resumed += 1
+        if resumed:
+            logger.warning("Resumed %d abandoned jobs", resumed)
+
+    async def _finish(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None,
+                      progress: Optional[dict] = None) -> None:
+        changes = {"status": status, "result": result, "error": error, "finished_at": datetime.utcnow()}
+        if progress is not None:
+            changes["progress"] = progress
+        await self.repository.update(job_id, changes, status_in=[QUEUED, RUNNING])
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception:
+                logger.exception("Job %s could not be run", job["id"])
+            # Not reached when cancelled, so stop() marks the job as interrupted
+            self._active.pop(job["id"], None)
+
+    async def _run(self, job: dict) -> None:
+        now = datetime.utcnow()
+        started = await self.repository.update(
+            job["id"], {"status": RUNNING, "started_at": now, "heartbeat_at": now}, status_in=[QUEUED]
+        )
+        if started is None:
+            return
+        context = JobContext(self.repository, job)
+        self.running += 1
+        try:
+            result = await self.handlers[job["kind"]](context, **job["params"])
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+            await self._finish(job["id"], FAILED, error=str(exc) or type(exc).__name__)
+        else:
+            await self._finish(
+                job["id"], SUCCEEDED, result=result, progress={"done": context.done, "total": context.total}
+            )
+        finally:
+            self.running -= 1
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            if self._active:
+                try:
+                    await self.repository.touch(list(self._active), datetime.utcnow())
+                except Exception as exc:
+                    logger.warning("Job heartbeat failed: %r", exc)
+            # Also picks up resumable jobs whose worker died after this one started
+            try:
+                await self._resume_abandoned()
+            except Exception as exc:
+                logger.warning("Resuming abandoned jobs failed: %r", exc)
@@ -0,0 +1,348 @@
+"""Closed-loop load generator for the API.
+
+Virtual users log in once and then run their role's actions back to back
+(optionally with think time) until the duration is up:
+
+    employee  log time, submit a week, list own timesheets, dashboard
+    manager   list submitted timesheets, approve one, bulk approve, project report, dashboard
+    admin     dashboard, users, hours report, projects
+
+Latency is recorded per route template, and p50/p95/p99 and requests/sec are
+written as JSON so runs can be compared between commits:
+
+    python loadtest.py                                  # in-process (ASGI), memory storage
+    python loadtest.py --target http://localhost:8001   # a running server
+    python loadtest.py --users 50 --mix employee=7,manager=2,admin=1 --duration 60 --output run.json
+    python loadtest.py --compare baseline.json          # also print the change against an earlier run
+
+In-process runs build the app with memory storage (override with --storage)
+and cheap bcrypt rounds, so only the API itself is measured.
+Against a server, the target's own configuration applies.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+DEFAULT_MIX = "employee=6,manager=3,admin=1"
+PASSWORD = "load-test-password"
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(1, math.ceil(fraction * len(sorted_values))) - 1]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        role, _, weight = part.partition("=")
+        if role.strip() not in ("employee", "manager", "admin"):
+            raise argparse.ArgumentTypeError(f"unknown role in mix: {role!r}")
+        weights[role.strip()] = int(weight or 1)
+    return weights
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.errors[route][type(exc).__name__] += 1
+            return None
+        self.latencies[route].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[route][str(response.status_code)] += 1
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        for route in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies[route])
+            routes[route] = {
+                "requests": len(values),
+                "errors": dict(self.errors[route]),
+                "rps": len(values) / elapsed,
+                "mean_ms": sum(values) / len(values) if values else 0.0,
+                "p50_ms": percentile(values, 0.50),
+                "p95_ms": percentile(values, 0.95),
+                "p99_ms": percentile(values, 0.99),
+                "max_ms": values[-1] if values else 0.0,
+            }
+        total = sum(route["requests"] for route in routes.values())
+        return {"elapsed_s": elapsed, "requests": total, "rps": total / elapsed, "routes": routes}
+
+
+class VirtualUser:
+    def __init__(self, role: str, headers: dict, user_id: str, project_ids: list, rng: random.Random):
+        self.role = role
+        self.headers = headers
+        self.user_id = user_id
+        self.project_ids = project_ids
+        self.rng = rng
+
+    def _timesheet(self) -> dict:
+        day = datetime(2024, 1, 1) + timedelta(days=self.rng.randrange(365))
+        return {
+            "project_id": self.rng.choice(self.project_ids),
+            "date": day.isoformat(),
+            "hours": self.rng.choice([1, 2, 4, 6, 8]),
+            "description": "Load test entry",
+        }
+
+    async def step(self, client: httpx.AsyncClient, recorder: Recorder) -> None:
+        actions, weights = zip(*ACTIONS[self.role])
+        action = self.rng.choices(actions, weights=weights)[0]
+        await action(self, client, recorder)
+
+    # Employee actions
+    async def log_time(self, client, recorder):
+        await recorder.call(client, "POST /api/timesheets", "POST", "/api/timesheets", json=self._timesheet(), headers=self.headers)
+
+    async def submit_week(self, client, recorder):
+        entries = [self._timesheet() for _ in range(5)]
+        await recorder.call(
+            client, "POST /api/timesheets/bulk", "POST", "/api/timesheets/bulk",
+            json={"entries": entries, "submit": True}, headers=self.headers,
+        )
+
+    async def list_timesheets(self, client, recorder):
+        await recorder.call(client, "GET /api/timesheets", "GET", "/api/timesheets", headers=self.headers)
+
+    async def dashboard(self, client, recorder):
+        await recorder.call(client, "GET /api/dashboard/summary", "GET", "/api/dashboard/summary", headers=self.headers)
+
+    # Manager actions
+    async def review_and_approve(self, client, recorder):
+        response = await recorder.call(
+            client, "GET /api/timesheets?status=submitted", "GET", "/api/timesheets",
+            params={"status": "submitted", "limit": 20, "fields": "id,hours"}, headers=self.headers,
+        )
+        if response is None or response.status_code != 200 or not response.json()["items"]:
+            return
+        timesheet = self.rng.choice(response.json()["items"])
+        await recorder.call(
+            client, "POST /api/timesheets/{timesheet_id}/approve", "POST", f"/api/timesheets/{timesheet['id']}/approve",
+            json={"status": self.rng.choice(["approved", "approved", "approved", "rejected"]), "rejection_reason": "Load test"},
+            headers=self.headers,
+        )
+
+    async def bulk_approve(self, client, recorder):
+        await recorder.call(
+            client, "POST /api/timesheets/bulk/approve", "POST", "/api/timesheets/bulk/approve",
+            json={"status": "approved", "project_id": self.rng.choice(self.project_ids)}, headers=self.headers,
+        )
+
+    async def project_report(self, client, recorder):
+        project_id = self.rng.choice(self.project_ids)
+        await recorder.call(
+            client, "GET /api/projects/{project_id}/report", "GET", f"/api/projects/{project_id}/report", headers=self.headers
+        )
+
+    # Admin actions
+    async def list_users(self, client, recorder):
+        await recorder.call(client, "GET /api/users", "GET", "/api/users", headers=self.headers)
+
+    async def list_projects(self, client, recorder):
+        await recorder.call(client, "GET /api/projects", "GET", "/api/projects", headers=self.headers)
+
+    async def hours_report(self, client, recorder):
+        await recorder.call(
+            client, "GET /api/reports/hours", "GET", "/api/reports/hours",
+            params={"period": "month", "date_from": "2024-01-01T00:00:00", "date_to": "2024-12-31T23:59:59"},
+            headers=self.headers,
+        )
+
+
+# (action, weight) per role
+ACTIONS = {
+    "employee": [
+        (VirtualUser.log_time, 5),
+        (VirtualUser.submit_week, 1),
+        (VirtualUser.list_timesheets, 3),
+        (VirtualUser.dashboard, 1),
+    ],
+    "manager": [
+        (VirtualUser.review_and_approve, 5),
+        (VirtualUser.bulk_approve, 1),
+        (VirtualUser.project_report, 2),
+        (VirtualUser.dashboard, 2),
+    ],
+    "admin": [
+        (VirtualUser.dashboard, 3),
+        (VirtualUser.list_users, 2),
+        (VirtualUser.hours_report, 2),
+        (VirtualUser.list_projects, 3),
+    ],
+}
+
+
+async def _login(client: httpx.AsyncClient, role: str, run_id: str, index: int) -> tuple:
+    username = f"load-{run_id}-{role}-{index}"
+    response = await client.post("/api/auth/register", json={
+        "email": f"{username}@example.com",
+        "username": username,
+        "full_name": f"Load {role} {index}",
+        "password": PASSWORD,
+        "role": role,
+    })
+    response.raise_for_status()
+    response = await client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    body = response.json()
+    return {"Authorization": f"Bearer {body['access_token']}"}, body["user"]["id"]
+
+
+async def _setup(client: httpx.AsyncClient, args, rng: random.Random) -> list:
+    # Accounts and projects are created up front and are not part of the measurement
+    run_id = uuid.uuid4().hex[:8]
+    weights = args.mix
+    roles = rng.choices(list(weights), weights=list(weights.values()), k=args.users)
+    accounts = [(role, *(await _login(client, role, run_id, index))) for index, role in enumerate(roles)]
+
+    manager_headers = next((headers for role, headers, _ in accounts if role != "employee"), None)
+    if manager_headers is None:
+        manager_headers, _ = await _login(client, "manager", run_id, len(accounts))
+    employee_ids = [user_id for role, _, user_id in accounts if role == "employee"]
+
+    project_ids = []
+    for index in range(args.projects):
+        response = await client.post("/api/projects", headers=manager_headers, json={
+            "name": f"Load project {run_id}-{index}",
+            "description": "Created by loadtest.py",
+            "start_date": "2024-01-01T00:00:00",
+            "assigned_employees": employee_ids,
+            "budget_hours": 10000,
+        })
+        response.raise_for_status()
+        project_ids.append(response.json()["id"])
+
+    return [
+        VirtualUser(role, headers, user_id, project_ids, random.Random(rng.random()))
+        for role, headers, user_id in accounts
+    ]
+
+
+async def _run_users(client: httpx.AsyncClient, users: list, args) -> dict:
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    async def loop(user: VirtualUser):
+        while time.perf_counter() < deadline:
+            await user.step(client, recorder)
+            if args.think_ms:
+                await asyncio.sleep(user.rng.uniform(0, 2 * args.think_ms) / 1000)
+            else:
+                # In-process against memory storage nothing else ever suspends,
+                # so without this one user would starve the others
+                await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(loop(user) for user in users))
+    return recorder.summary(time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    if args.target == "asgi":
+        from server import create_app
+        from settings import Settings
+        app = create_app(Settings.from_env(storage_backend=args.storage, bcrypt_rounds=args.bcrypt_rounds))
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+                users = await _setup(client, args, rng)
+                return await _run_users(client, users, args)
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        users = await _setup(client, args, rng)
+        return await _run_users(client, users, args)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _print_summary(summary: dict) -> None:
+    print(f"{'route':48} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in summary["routes"].items():
+        errors = sum(stats["errors"].values())
+        print(f"{route:48} {stats['requests']:7d} {errors:5d} {stats['rps']:8.1f} "
+              f"{stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f}")
+    print(f"{'total':48} {summary['requests']:7d} {'':5} {summary['rps']:8.1f}")
+
+
+def _print_comparison(summary: dict, baseline: dict) -> None:
+    print(f"\n{'route':48} {'req/s':>16} {'p95 ms':>20}")
+    for route, stats in summary["routes"].items():
+        before = baseline["results"]["routes"].get(route)
+        if before is None:
+            continue
+        print(f"{route:48} {before['rps']:7.1f} -> {stats['rps']:6.1f} {before['p95_ms']:8.2f} -> {stats['p95_ms']:8.2f}"
+              f" ({(stats['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0:+.0f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="asgi", help='"asgi" (in-process, default) or a base URL such as http://localhost:8001')
+    parser.add_argument("--storage", default="memory", choices=("memory", "mongo"), help="storage backend for in-process runs")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="bcrypt cost for in-process runs")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"role weights (default {DEFAULT_MIX})")
+    parser.add_argument("--projects", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured load")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's actions")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--compare", type=Path, help="an earlier --output file to compare against")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    _print_summary(summary)
+
+    result = {
+        "commit": _git_commit(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "target": args.target,
+            "storage": args.storage if args.target == "asgi" else None,
+            "users": args.users,
+            "mix": args.mix,
+            "projects": args.projects,
+            "duration_s": args.duration,
+            "think_ms": args.think_ms,
+            "seed": args.seed,
+        },
+        "results": summary,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2) + "\n")
+    if args.compare:
+        _print_comparison(summary, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Project membership, stored as its own relation.
+
+Each assignment of an employee to a project is one document in the
+``project_members`` collection, ``{project_id, employee_id, added_at}``,
+unique per pair and indexed both ways (see indexes.py). Project documents
+do not carry an ``assigned_employees`` array: on a company-wide project
+that array was thousands of ids read, and scanned, on every timesheet
+write. Access checks use the set of project ids an employee is assigned to,
+which the app caches per user; the API fills ``assigned_employees`` from
+this collection only when a response asks for it.
+
+Databases from before the split are migrated when the app starts (see
+``migrate_assigned_employees``).
+"""
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "project_members"
+# Projects whose arrays are moved per bulk write
+MIGRATION_BATCH_SIZE = 100
+
+
+def membership_upserts(project_id: str, employee_ids, added_at: datetime) -> list:
+    return [
+        UpdateOne(
+            {"project_id": project_id, "employee_id": employee_id},
+            {"$setOnInsert": {"added_at": added_at}},
+            upsert=True,
+        )
+        for employee_id in dict.fromkeys(employee_ids)
+    ]
+
+
+async def migrate_assigned_employees(db) -> int:
+    """Move ``assigned_employees`` arrays left on project documents into the relation.
+
+    Memberships are written before the array is removed, so an interrupted
+    run is simply picked up again at the next start. Returns the number of
+    projects migrated.
+    """
+    migrated = 0
+    batch = []
+
+    async def flush():
+        operations = [
+            operation
+            for project in batch
+            for operation in membership_upserts(
+                project["id"], project.get("assigned_employees") or [], project.get("created_at") or datetime.utcnow()
+            )
+        ]
+        if operations:
+            await db[COLLECTION].bulk_write(operations, ordered=False)
+        await db.projects.update_many(
+            {"id": {"$in": [project["id"] for project in batch]}}, {"$unset": {"assigned_employees": ""}}
+        )
+
+    cursor = db.projects.find(
+        {"assigned_employees": {"$exists": True}}, {"_id": 0, "id": 1, "assigned_employees": 1, "created_at": 1}
+    )
+    async for project in cursor:
+        batch.append(project)
+        if len(batch) == MIGRATION_BATCH_SIZE:
+            await flush()
+            migrated += len(batch)
+            batch = []
+    if batch:
+        await flush()
+        migrated += len(batch)
+    if migrated:
+        logger.info("Moved the members of %d projects to %s", migrated, COLLECTION)
+    return migrated
@@ -0,0 +1,660 @@
+"""In-process implementation of the repositories in repositories.py.
+
+Documents live in dicts keyed by id. Unique keys (id, username, email) get
+hash indexes; every index declared for MongoDB in indexes.py gets a sorted
+list of key tuples ``(equality fields..., sort fields..., id)`` maintained
+with bisect. Lookups therefore go through the same query keys as on MongoDB,
+and a filtered page is a range scan from the cursor position rather than a
+filter-and-sort over the whole collection.
+
+Datetimes are stored at millisecond precision, like BSON, so keyset cursors
+compare exactly as they do against MongoDB. Nothing is persisted.
+"""
+import itertools
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime
+from enum import Enum
+from typing import Collection, Dict, Iterable, List, Optional, Sequence
+
+import archive
+import counters
+import jobs
+import reports
+import versions
+from pagination import decode_cursor, encode_cursor
+from repositories import (
+    PROJECT_SORT,
+    TIMESHEET_EXPORT_SORT,
+    TIMESHEET_SORT,
+    USER_SORT,
+    ArchiveWatermarkRepository,
+    CounterRepository,
+    DuplicateError,
+    JobRepository,
+    Page,
+    ProjectMemberRepository,
+    ProjectRepository,
+    Repositories,
+    TimesheetRepository,
+    UserRepository,
+    VersionRepository,
+)
+
+
+class _Top:
+    """Sorts after every other value; closes the upper end of a key range."""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __eq__(self, other):
+        return other is self
+
+    __hash__ = object.__hash__
+
+
+_TOP = _Top()
+
+
+def _stored(value):
+    # What a BSON round trip would give back: plain strings for enums,
+    # millisecond datetimes, and no aliasing with the caller's lists
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, list):
+        return [_stored(item) for item in value]
+    return value
+
+
+def _project(document: dict, fields: Optional[Sequence[str]], exclude_password: bool = False) -> dict:
+    # Keys keep the document's order, as a MongoDB projection does
+    if fields is None:
+        return {field: _stored(value) for field, value in document.items() if not (exclude_password and field == "password")}
+    wanted = set(fields)
+    return {field: _stored(value) for field, value in document.items() if field in wanted}
+
+
+class SortedIndex:
+    def __init__(self, equality: Sequence[str], order: Sequence[str]):
+        self.equality = tuple(equality)
+        # Range / sort fields; always ends with "id" so every key is unique
+        self.order = tuple(order)
+        self._keys = []
+
+    def _keys_for(self, document: dict) -> list:
+        heads = [()]
+        for field in self.equality:
+            # A list value is indexed once per element (like a multikey index)
+            value = document.get(field)
+            values = dict.fromkeys(value) if isinstance(value, list) else [value]
+            heads = [head + (item,) for head in heads for item in values]
+        tail = tuple(document[field] for field in self.order)
+        return [head + tail for head in heads]
+
+    def add(self, document: dict) -> None:
+        for key in self._keys_for(document):
+            insort(self._keys, key)
+
+    def add_many(self, documents: Iterable[dict]) -> None:
+        # One sort instead of an O(n) list insertion per key
+        for document in documents:
+            self._keys.extend(self._keys_for(document))
+        self._keys.sort()
+
+    def remove(self, document: dict) -> None:
+        for key in self._keys_for(document):
+            del self._keys[bisect_left(self._keys, key)]
+
+    def scan(self, equality_values: Sequence = (), lower=None, upper=None, after=None, descending: bool = False):
+        """Ids with these equality values, the leading order field within
+        ``[lower, upper]``, strictly after the order values ``after``."""
+        prefix = tuple(equality_values)
+        start = bisect_left(self._keys, prefix + ((lower,) if lower is not None else ()))
+        end = bisect_left(self._keys, prefix + ((upper, _TOP) if upper is not None else (_TOP,)))
+        if after is not None:
+            if descending:
+                end = min(end, bisect_left(self._keys, prefix + tuple(after)))
+            else:
+                start = max(start, bisect_right(self._keys, prefix + tuple(after)))
+        positions = range(end - 1, start - 1, -1) if descending else range(start, end)
+        for position in positions:
+            yield self._keys[position][-1]
+
+
+class _Table:
+    def __init__(self, unique: Sequence[str], indexes: dict):
+        self.documents = {}
+        self.unique = {field: {} for field in unique if field != "id"}
+        self.indexes = indexes
+
+    def get(self, document_id: str) -> Optional[dict]:
+        return self.documents.get(document_id)
+
+    def get_unique(self, field: str, value) -> Optional[dict]:
+        document_id = self.unique[field].get(value)
+        return self.documents[document_id] if document_id is not None else None
+
+    def insert(self, document: dict) -> None:
+        self.insert_many([document])
+
+    def insert_many(self, documents: Iterable[dict]) -> None:
+        """Unordered, like MongoDB's: duplicates are skipped and reported once the rest are in."""
+        inserted = []
+        duplicates = []
+        for position, document in enumerate(documents):
+            document = {field: _stored(value) for field, value in document.items()}
+            if document["id"] in self.documents or any(
+                document.get(field) in values for field, values in self.unique.items()
+            ):
+                duplicates.append(position)
+                continue
+            self.documents[document["id"]] = document
+            for field, values in self.unique.items():
+                values[document[field]] = document["id"]
+            inserted.append(document)
+        for index in self.indexes.values():
+            if len(inserted) == 1:
+                index.add(inserted[0])
+            elif inserted:
+                index.add_many(inserted)
+        if duplicates:
+            raise DuplicateError(duplicates)
+
+    def update(self, document: dict, changes: dict) -> dict:
+        """Apply ``changes`` in place and return the pre-image."""
+        before = dict(document)
+        for index in self.indexes.values():
+            index.remove(document)
+        for field, values in self.unique.items():
+            values.pop(document[field], None)
+        document.update({field: _stored(value) for field, value in changes.items()})
+        for field, values in self.unique.items():
+            values[document[field]] = document["id"]
+        for index in self.indexes.values():
+            index.add(document)
+        return before
+
+    def delete(self, document: dict) -> None:
+        for index in self.indexes.values():
+            index.remove(document)
+        for field, values in self.unique.items():
+            values.pop(document[field], None)
+        del self.documents[document["id"]]
+
+    def page(self, ids: Iterable[str], sort: list, limit: int, paginate: bool, fields) -> Page:
+        """A page of documents from ``ids``, which must already come in ``sort`` order."""
+        documents = []
+        for document_id in ids:
+            documents.append(self.documents[document_id])
+            if paginate and len(documents) > limit:
+                break
+        next_cursor = None
+        if paginate and len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_cursor([_stored(documents[-1][field]) for field, _ in sort])
+        return [_project(document, fields) for document in documents], next_cursor
+
+
+def _after(cursor: Optional[str], sort: list) -> Optional[list]:
+    return decode_cursor(cursor, sort) if cursor else None
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self):
+        self.table = _Table(
+            unique=("id", "username", "email"),
+            indexes={
+                "role": SortedIndex(["role"], ["id"]),
+                "created_at_id": SortedIndex([], ["created_at", "id"]),
+            },
+        )
+
+    async def get_by_username(self, username: str, with_password: bool = False) -> Optional[dict]:
+        user = self.table.get_unique("username", username)
+        return _project(user, None, exclude_password=not with_password) if user else None
+
+    async def exists(self, username: str, email: str) -> bool:
+        return self.table.get_unique("username", username) is not None or self.table.get_unique("email", email) is not None
+
+    async def insert(self, user: dict) -> None:
+        self.table.insert(user)
+
+    async def insert_many(self, users: List[dict]) -> None:
+        self.table.insert_many(users)
+
+    async def set_password(self, user_id: str, hashed: str) -> None:
+        user = self.table.get(user_id)
+        if user:
+            self.table.update(user, {"password": hashed})
+
+    async def update(self, user_id: str, changes: dict) -> Optional[dict]:
+        user = self.table.get(user_id)
+        if not user:
+            return None
+        self.table.update(user, changes)
+        return _project(user, None, exclude_password=True)
+
+    async def page(self, limit: int, cursor: Optional[str], paginate: bool, fields: Sequence[str]) -> Page:
+        ids = self.table.indexes["created_at_id"].scan(after=_after(cursor, USER_SORT))
+        return self.table.page(ids, USER_SORT, limit, paginate, fields)
+
+    async def count(self, role: Optional[str] = None) -> int:
+        if role is None:
+            return len(self.table.documents)
+        return sum(1 for _ in self.table.indexes["role"].scan([_stored(role)]))
+
+
+class MemoryProjectRepository(ProjectRepository):
+    def __init__(self):
+        self.table = _Table(
+            unique=("id",),
+            indexes={
+                "created_at_id": SortedIndex([], ["created_at", "id"]),
+            },
+        )
+
+    async def insert(self, project: dict) -> None:
+        self.table.insert(project)
+
+    async def insert_many(self, projects: List[dict]) -> None:
+        self.table.insert_many(projects)
+
+    async def get(self, project_id: str, fields: Optional[Sequence[str]] = None) -> Optional[dict]:
+        project = self.table.get(project_id)
+        return _project(project, fields) if project else None
+
+    async def exists(self, project_id: str) -> bool:
+        return self.table.get(project_id) is not None
+
+    async def get_many(self, project_ids: Iterable[str], fields: Optional[Sequence[str]] = None) -> List[dict]:
+        projects = (self.table.get(project_id) for project_id in dict.fromkeys(project_ids))
+        return [_project(project, fields) for project in projects if project]
+
+    async def update(self, project_id: str, changes: dict) -> Optional[dict]:
+        project = self.table.get(project_id)
+        if not project:
+            return None
+        self.table.update(project, changes)
+        return _project(project, None)
+
+    async def delete(self, project_id: str) -> bool:
+        project = self.table.get(project_id)
+        if not project:
+            return False
+        self.table.delete(project)
+        return True
+
+    async def page(
+        self, project_ids: Optional[Collection[str]], limit: int, cursor: Optional[str], paginate: bool,
+        fields: Sequence[str],
+    ) -> Page:
+        after = _after(cursor, PROJECT_SORT)
+        if project_ids is None:
+            ids = self.table.indexes["created_at_id"].scan(after=after)
+        else:
+            # An employee's few projects, sorted here as MongoDB sorts an $in match
+            projects = (self.table.get(project_id) for project_id in project_ids)
+            keys = sorted((project["created_at"], project["id"]) for project in projects if project)
+            ids = [key[-1] for key in keys if after is None or key > tuple(after)]
+        return self.table.page(ids, PROJECT_SORT, limit, paginate, fields)
+
+    async def count(self) -> int:
+        return len(self.table.documents)
+
+
+class MemoryProjectMemberRepository(ProjectMemberRepository):
+    def __init__(self):
+        # Both directions of the relation, like the two MongoDB indexes
+        self.by_project = defaultdict(dict)
+        self.by_employee = defaultdict(dict)
+
+    def _add(self, project_id: str, employee_id: str, added_at: datetime) -> bool:
+        if employee_id in self.by_project[project_id]:
+            return False
+        self.by_project[project_id][employee_id] = _stored(added_at)
+        self.by_employee[employee_id][project_id] = None
+        return True
+
+    def _remove(self, project_id: str, employee_id: str) -> bool:
+        if self.by_project.get(project_id, {}).pop(employee_id, None) is None:
+            return False
+        self.by_employee[employee_id].pop(project_id, None)
+        return True
+
+    async def insert_many(self, memberships: List[dict]) -> None:
+        for membership in memberships:
+            self._add(membership["project_id"], membership["employee_id"], membership["added_at"])
+
+    async def add(self, project_id: str, employee_ids: Iterable[str]) -> List[str]:
+        now = datetime.utcnow()
+        return [employee_id for employee_id in dict.fromkeys(employee_ids) if self._add(project_id, employee_id, now)]
+
+    async def remove(self, project_id: str, employee_ids: Iterable[str]) -> List[str]:
+        return [employee_id for employee_id in dict.fromkeys(employee_ids) if self._remove(project_id, employee_id)]
+
+    async def remove_project(self, project_id: str) -> List[str]:
+        removed = list(self.by_project.pop(project_id, {}))
+        for employee_id in removed:
+            self.by_employee[employee_id].pop(project_id, None)
+        return removed
+
+    async def project_ids(self, employee_id: str) -> List[str]:
+        return list(self.by_employee.get(employee_id, ()))
+
+    async def members(self, project_ids: Iterable[str]) -> Dict[str, List[str]]:
+        return {
+            project_id: sorted(self.by_project[project_id])
+            for project_id in dict.fromkeys(project_ids)
+            if self.by_project.get(project_id)
+        }
+
+
+# The timesheet indexes from indexes.py, most specific first
+_TIMESHEET_INDEXES = {
+    "employee_date": ["employee_id"],
+    "project_status_date": ["project_id", "status"],
+    "project_date": ["project_id"],
+    "status_date": ["status"],
+    "date_id": [],
+}
+
+
+def _timesheet_matches(timesheet: dict, criteria: dict) -> bool:
+    # "ids" is not checked here: _candidates only ever yields those ids
+    for field in ("id", "employee_id", "project_id", "status"):
+        if criteria.get(field) is not None and timesheet[field] != _stored(criteria[field]):
+            return False
+    if criteria.get("status_in") is not None and timesheet["status"] not in _stored(list(criteria["status_in"])):
+        return False
+    if criteria.get("status_not_in") and timesheet["status"] in _stored(list(criteria["status_not_in"])):
+        return False
+    if criteria.get("date_from") and timesheet["date"] < _stored(criteria["date_from"]):
+        return False
+    if criteria.get("date_to") and timesheet["date"] > _stored(criteria["date_to"]):
+        return False
+    if criteria.get("date_before") and timesheet["date"] >= _stored(criteria["date_before"]):
+        return False
+    versions = criteria.get("updated_at_by_id")
+    if versions is not None and (
+        timesheet["id"] not in versions or timesheet.get("updated_at") != _stored(versions[timesheet["id"]])
+    ):
+        return False
+    return True
+
+
+def _date_upper(criteria: dict):
+    # Inclusive index bound; date_before's own bound is excluded by _timesheet_matches
+    bounds = [_stored(criteria[field]) for field in ("date_to", "date_before") if criteria.get(field)]
+    return min(bounds) if bounds else None
+
+
+class MemoryTimesheetRepository(TimesheetRepository):
+    def __init__(self):
+        self.table = _Table(
+            unique=("id",),
+            indexes={name: SortedIndex(equality, ["date", "id"]) for name, equality in _TIMESHEET_INDEXES.items()},
+        )
+
+    def _candidates(self, criteria: dict, after=None, descending: bool = False):
+        """Ids that may match, in (date, id) order, from the best index for ``criteria``."""
+        if criteria.get("id") is not None or criteria.get("ids") is not None:
+            ids = [criteria["id"]] if criteria.get("id") is not None else dict.fromkeys(criteria["ids"])
+            found = [self.table.get(timesheet_id) for timesheet_id in ids]
+            keys = sorted((timesheet["date"], timesheet["id"]) for timesheet in found if timesheet)
+            if after is not None:
+                keys = [key for key in keys if (key < tuple(after) if descending else key > tuple(after))]
+            return [timesheet_id for _, timesheet_id in (reversed(keys) if descending else keys)]
+        for name, equality in _TIMESHEET_INDEXES.items():
+            if all(criteria.get(field) is not None for field in equality):
+                return self.table.indexes[name].scan(
+                    [_stored(criteria[field]) for field in equality],
+                    lower=_stored(criteria.get("date_from")),
+                    upper=_date_upper(criteria),
+                    after=after,
+                    descending=descending,
+                )
+
+    def _matching(self, criteria: dict, after=None, descending: bool = False):
+        for timesheet_id in self._candidates(criteria, after, descending):
+            timesheet = self.table.get(timesheet_id)
+            if _timesheet_matches(timesheet, criteria):
+                yield timesheet
+
+    async def insert(self, timesheet: dict) -> None:
+        self.table.insert(timesheet)
+
+    async def insert_many(self, timesheets: List[dict]) -> None:
+        self.table.insert_many(timesheets)
+
+    async def find_one(self, criteria: dict, fields: Optional[Sequence[str]] = None) -> Optional[dict]:
+        timesheet = next(self._matching(criteria), None)
+        return _project(timesheet, fields) if timesheet else None
+
+    async def exists(self, timesheet_id: str) -> bool:
+        return self.table.get(timesheet_id) is not None
+
+    async def update(self, criteria: dict, changes: dict) -> Optional[dict]:
+        # No await between the match and the write, so the criteria hold at the moment of the write
+        timesheet = next(self._matching(criteria), None)
+        if not timesheet:
+            return None
+        return _project(self.table.update(timesheet, changes), None)
+
+    async def update_many(self, criteria: dict, changes: dict, limit: Optional[int] = None) -> List[dict]:
+        matched = list(itertools.islice(self._matching(criteria), limit))
+        for timesheet in matched:
+            self.table.update(timesheet, changes)
+        return [_project(timesheet, None) for timesheet in matched]
+
+    async def delete(self, criteria: dict) -> Optional[dict]:
+        timesheet = next(self._matching(criteria), None)
+        if not timesheet:
+            return None
+        self.table.delete(timesheet)
+        return _project(timesheet, None)
+
+    async def delete_many(self, criteria: dict) -> int:
+        matched = list(self._matching(criteria))
+        for timesheet in matched:
+            self.table.delete(timesheet)
+        return len(matched)
+
+    async def page(
+        self, criteria: dict, limit: int, cursor: Optional[str], paginate: bool, fields: Sequence[str]
+    ) -> Page:
+        after = _after(cursor, TIMESHEET_SORT)
+        ids = (timesheet["id"] for timesheet in self._matching(criteria, after, descending=True))
+        return self.table.page(ids, TIMESHEET_SORT, limit, paginate, fields)
+
+    async def scan(self, criteria: dict, fields: Sequence[str], batch_size: int):
+        # Batch by batch from a keyset position, so writes between batches are harmless
+        after = None
+        while True:
+            batch = []
+            for timesheet in self._matching(criteria, after):
+                batch.append(_project(timesheet, fields))
+                if len(batch) == batch_size:
+                    after = [timesheet[field] for field, _ in TIMESHEET_EXPORT_SORT]
+                    break
+            for timesheet in batch:
+                yield timesheet
+            if len(batch) < batch_size:
+                return
+
+    async def hours_rollup(self, criteria: dict, period: str, group_by: Sequence[str]) -> List[dict]:
+        period_format = reports.PERIOD_FORMATS[period]
+        dimensions = [reports.GROUP_FIELDS[dimension] for dimension in group_by]
+        groups = {}
+        for timesheet in self._matching(criteria):
+            key = (timesheet["date"].strftime(period_format), *(timesheet[field] for field in dimensions))
+            row = groups.get(key)
+            if row is None:
+                row = groups[key] = {
+                    "_id": dict(zip(["period", *dimensions], key)),
+                    "total_hours": 0,
+                    "total_timesheets": 0,
+                    **{f"{status}_{measure}": 0 for status in reports.STATUSES for measure in ("hours", "timesheets")},
+                }
+            row["total_hours"] += timesheet["hours"]
+            row["total_timesheets"] += 1
+            row[f"{timesheet['status']}_hours"] += timesheet["hours"]
+            row[f"{timesheet['status']}_timesheets"] += 1
+        return [reports.rollup_row(groups[key]) for key in sorted(groups)]
+
+    async def project_burn(self, project_id: str) -> dict:
+        by_day = defaultdict(float)
+        by_employee = {}
+        for timesheet in self._matching({"project_id": project_id, "status_not_in": ["rejected"]}):
+            by_day[timesheet["date"].strftime("%Y-%m-%d")] += timesheet["hours"]
+            row = by_employee.setdefault(
+                timesheet["employee_id"],
+                {"_id": timesheet["employee_id"], "hours": 0, "approved_hours": 0, "timesheets": 0},
+            )
+            row["hours"] += timesheet["hours"]
+            row["timesheets"] += 1
+            if timesheet["status"] == "approved":
+                row["approved_hours"] += timesheet["hours"]
+        return {
+            "by_day": [{"_id": day, "hours": hours} for day, hours in sorted(by_day.items())],
+            "by_employee": sorted(by_employee.values(), key=lambda row: (-row["hours"], row["_id"])),
+        }
+
+
+class MemoryArchiveWatermarkRepository(ArchiveWatermarkRepository):
+    def __init__(self):
+        self.before = None
+
+    async def read(self) -> Optional[datetime]:
+        return self.before
+
+    async def advance(self, before: datetime) -> Optional[datetime]:
+        previous = self.before
+        self.before = max(previous, _stored(before)) if previous else _stored(before)
+        return previous
+
+
+class MemoryCounterRepository(CounterRepository):
+    def __init__(self, timesheet_tables: List[MemoryTimesheetRepository], versions: "MemoryVersionRepository"):
+        # The hot and the archive table: counters cover both
+        self.timesheet_tables = timesheet_tables
+        self.versions = versions
+        self.stored = {}
+
+    async def apply_changes(self, changes) -> None:
+        for key, delta in counters.change_deltas(changes).items():
+            stored = self.stored.setdefault(key, counters.empty_counters())
+            for field, value in delta.items():
+                stored[field] += value
+
+    async def read(self, key: str) -> dict:
+        return {**counters.empty_counters(), **self.stored.get(key, {})}
+
+    async def rebuild(self, dry_run: bool = False) -> list:
+        computed = {counters.GLOBAL_KEY: counters.empty_counters()}
+        for key, delta in counters.change_deltas(
+            (None, timesheet) for repository in self.timesheet_tables for timesheet in repository.table.documents.values()
+        ).items():
+            computed[key] = delta
+        drift = counters.counter_drift(computed, self.stored)
+        if not dry_run:
+            self.stored = computed
+            if drift:
+                # As on MongoDB: dashboards served with the old values must not be answered with 304
+                await self.versions.new_epoch()
+        return drift
+
+
+class MemoryVersionRepository(VersionRepository):
+    def __init__(self):
+        self.stamps = {versions.EPOCH: uuid.uuid4().hex}
+
+    async def bump(self, *scopes: str) -> None:
+        for scope in scopes:
+            self.stamps[scope] = uuid.uuid4().hex
+
+    async def read(self, scopes: Sequence[str]) -> list:
+        return [self.stamps.get(scope, "0") for scope in [versions.EPOCH, *scopes]]
+
+    async def new_epoch(self) -> None:
+        self.stamps[versions.EPOCH] = uuid.uuid4().hex
+
+
+class MemoryJobRepository(JobRepository):
+    def __init__(self):
+        self.documents = {}
+        self.outputs = defaultdict(list)
+
+    async def insert(self, job: dict) -> None:
+        self.documents[job["id"]] = {field: _stored(value) for field, value in job.items()}
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self.documents.get(job_id)
+        return _project(job, None) if job else None
+
+    async def update(self, job_id: str, changes: dict, status_in: Optional[Sequence[str]] = None) -> Optional[dict]:
+        job = self.documents.get(job_id)
+        if job is None or (status_in is not None and job["status"] not in status_in):
+            return None
+        job.update({field: _stored(value) for field, value in changes.items()})
+        return _project(job, None)
+
+    async def touch(self, job_ids: Sequence[str], at: datetime) -> None:
+        for job_id in job_ids:
+            if job_id in self.documents:
+                self.documents[job_id]["heartbeat_at"] = _stored(at)
+
+    async def claim_abandoned(self, heartbeat_before: datetime, kinds: Collection[str], at: datetime) -> Optional[dict]:
+        for job in self.documents.values():
+            if job["status"] in (jobs.QUEUED, jobs.RUNNING) and job["heartbeat_at"] < heartbeat_before and job["kind"] in kinds:
+                job.update(status=jobs.QUEUED, started_at=None, heartbeat_at=_stored(at))
+                return _project(job, None)
+        return None
+
+    async def fail_abandoned(self, heartbeat_before: datetime, error: str) -> int:
+        abandoned = [
+            job for job in self.documents.values()
+            if job["status"] in (jobs.QUEUED, jobs.RUNNING) and job["heartbeat_at"] < heartbeat_before
+        ]
+        for job in abandoned:
+            job.update(status=jobs.FAILED, error=error, finished_at=_stored(datetime.utcnow()))
+        return len(abandoned)
+
+    async def append_output(self, job_id: str, sequence: int, data: bytes) -> None:
+        self.outputs[job_id].append((sequence, bytes(data)))
+
+    async def read_output(self, job_id: str):
+        for _, data in sorted(self.outputs.get(job_id, ())):
+            yield data
+
+
+class MemoryRepositories(Repositories):
+    backend = "memory"
+
+    def __init__(self):
+        self.users = MemoryUserRepository()
+        self.projects = MemoryProjectRepository()
+        self.members = MemoryProjectMemberRepository()
+        hot, cold = MemoryTimesheetRepository(), MemoryTimesheetRepository()
+        self.timesheets = archive.TieredTimesheetRepository(hot, cold, MemoryArchiveWatermarkRepository())
+        self.versions = MemoryVersionRepository()
+        self.counters = MemoryCounterRepository([hot, cold], self.versions)
+        self.jobs = MemoryJobRepository()
+
+    async def prepare(self) -> None:
+        pass
+
+    async def warm_up(self, connections: int) -> None:
+        pass
+
+    async def ping(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,315 @@
+"""Prometheus metrics, served as text at /metrics.
+
+Recording is a dict lookup and a couple of increments per request or
+database command; the exposition text is only built when /metrics is
+scraped, and gauges backed by existing state (bcrypt queue, caches, event
+subscribers) are read at that point too, so nothing is maintained for them
+in between. The MongoDB listeners are called on the driver's threads, hence
+the per-metric locks.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+# Starlette appends "; charset=utf-8" to text/ media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 collect: Optional[Callable[[], object]] = None):
+        # collect: read at scrape time instead of recording; returns a number,
+        # or {label values: number} when the metric has labels
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._collect = collect
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _samples(self) -> Iterable[Tuple[LabelValues, float]]:
+        if self._collect is None:
+            with self._lock:
+                return list(self._values.items())
+        collected = self._collect()
+        if isinstance(collected, dict):
+            return [(key if isinstance(key, tuple) else (key,), value) for key, value in collected.items()]
+        return [((), collected)]
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        for values, value in self._samples():
+            yield f"{self.name}{_labels(self.label_names, values)} {_number(value)}"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (the last one is +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(values, list(counts), total) for values, (counts, total) in self._series.items()]
+        for values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = (), collect=None) -> Counter:
+        return self._register(Counter(name, help, labels, collect))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), collect=None) -> Gauge:
+        return self._register(Gauge(name, help, labels, collect))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets=REQUEST_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class HTTPMetrics:
+    def __init__(self, registry: Registry):
+        self.in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being handled")
+        self.duration = registry.histogram(
+            "http_request_duration_seconds",
+            "Time from receiving an HTTP request to finishing its response",
+            ("method", "route", "status"),
+            REQUEST_BUCKETS,
+        )
+
+
+class MetricsMiddleware:
+    """Times every HTTP request by route template (``/api/timesheets/{timesheet_id}``).
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so streamed
+    responses pass straight through. Requests that match no route are
+    labelled ``route=""`` to keep the label set bounded.
+    """
+
+    def __init__(self, app, http_metrics: HTTPMetrics):
+        self.app = app
+        self.metrics = http_metrics
+        self._templates: Dict[object, str] = {}
+
+    def _route(self, scope) -> str:
+        # The router records the matched endpoint in the (shared) scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return ""
+        template = self._templates.get(endpoint)
+        if template is None:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            template = self._templates[endpoint] = template or ""
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.in_flight.dec()
+            self.metrics.duration.observe(
+                time.perf_counter() - started, scope["method"], self._route(scope), str(status)
+            )
+
+
+def _command_collection(event: monitoring.CommandStartedEvent) -> str:
+    # {"find": "timesheets", ...}; getMore names the cursor id first
+    if event.command_name == "getMore":
+        return event.command.get("collection", "")
+    target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else ""
+
+
+class CommandListener(monitoring.CommandListener):
+    def __init__(self, registry: Registry):
+        self.duration = registry.histogram(
+            "mongodb_command_duration_seconds",
+            "MongoDB command round trip time as measured by the driver",
+            ("collection", "command"),
+            COMMAND_BUCKETS,
+        )
+        self.failures = registry.counter(
+            "mongodb_command_failures_total", "MongoDB commands that returned an error", ("collection", "command")
+        )
+        self._collections: Dict[tuple, str] = {}
+
+    def started(self, event) -> None:
+        self._collections[(event.connection_id, event.request_id)] = _command_collection(event)
+
+    def succeeded(self, event) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+        self.failures.inc(collection, event.command_name)
+
+
+class PoolListener(monitoring.ConnectionPoolListener):
+    """Connection pool checkout waits and usage.
+
+    A checkout runs start to finish on one thread, so the start time is kept
+    in a thread local.
+    """
+
+    def __init__(self, registry: Registry):
+        self.checkout_wait = registry.histogram(
+            "mongodb_pool_checkout_wait_seconds",
+            "Time spent waiting for a MongoDB connection from the pool",
+            buckets=CHECKOUT_BUCKETS,
+        )
+        self.checkout_failures = registry.counter(
+            "mongodb_pool_checkout_failures_total", "Failed connection checkouts", ("reason",)
+        )
+        self.connections = registry.gauge("mongodb_pool_connections", "Open pooled connections")
+        self.checked_out = registry.gauge("mongodb_pool_checked_out", "Pooled connections currently in use")
+        self._local = threading.local()
+
+    def _waited(self) -> None:
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            self.checkout_wait.observe(time.perf_counter() - started)
+            self._local.started = None
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        self._waited()
+        self.checked_out.inc()
+
+    def connection_check_out_failed(self, event) -> None:
+        self._waited()
+        self.checkout_failures.inc(event.reason)
+
+    def connection_checked_in(self, event) -> None:
+        self.checked_out.dec()
+
+    def connection_created(self, event) -> None:
+        self.connections.inc()
+
+    def connection_closed(self, event) -> None:
+        self.connections.dec()
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+
+def mongo_listeners(registry: Registry) -> list:
+    """``event_listeners`` for the MongoDB client."""
+    return [CommandListener(registry), PoolListener(registry)]
@@ -0,0 +1,417 @@
+"""MongoDB (Motor) implementation of the repositories in repositories.py."""
+import asyncio
+from datetime import datetime
+from typing import Collection, Dict, Iterable, List, Optional, Sequence
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import archive
+import counters
+import jobs
+import members
+import reports
+import versions
+from indexes import ensure_indexes
+from pagination import fetch_page
+from repositories import (
+    PROJECT_SORT,
+    TIMESHEET_EXPORT_SORT,
+    TIMESHEET_SORT,
+    USER_SORT,
+    ArchiveWatermarkRepository,
+    CounterRepository,
+    DuplicateError,
+    JobRepository,
+    Page,
+    ProjectMemberRepository,
+    ProjectRepository,
+    Repositories,
+    TimesheetRepository,
+    UserRepository,
+    VersionRepository,
+)
+
+
+def fields_projection(fields: Optional[Sequence[str]], exclude_password: bool = False) -> dict:
+    # Never _id, never the password hash unless asked for, never stray fields outside the model
+    if fields is None:
+        return {"_id": 0, "password": 0} if exclude_password else {"_id": 0}
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+
+def timesheet_filter(criteria: dict) -> dict:
+    query = {}
+    for field in ("id", "employee_id", "project_id"):
+        if criteria.get(field) is not None:
+            query[field] = criteria[field]
+    if criteria.get("ids") is not None:
+        query["id"] = {"$in": list(criteria["ids"])}
+    status = {}
+    if criteria.get("status") is not None:
+        status["$eq"] = criteria["status"]
+    if criteria.get("status_in") is not None:
+        status["$in"] = list(criteria["status_in"])
+    if criteria.get("status_not_in"):
+        status["$nin"] = list(criteria["status_not_in"])
+    if status:
+        query["status"] = status["$eq"] if list(status) == ["$eq"] else status
+    date = {}
+    if criteria.get("date_from"):
+        date["$gte"] = criteria["date_from"]
+    if criteria.get("date_to"):
+        date["$lte"] = criteria["date_to"]
+    if criteria.get("date_before"):
+        date["$lt"] = criteria["date_before"]
+    if date:
+        query["date"] = date
+    if criteria.get("updated_at_by_id") is not None:
+        query["$or"] = [
+            {"id": timesheet_id, "updated_at": updated_at}
+            for timesheet_id, updated_at in criteria["updated_at_by_id"].items()
+        ]
+    return query
+
+
+async def _page(collection, query: dict, sort: list, limit: int, cursor: Optional[str], paginate: bool, fields) -> Page:
+    projection = fields_projection(fields)
+    # paginate=False is the explicit opt-in to the old "everything in one response" behaviour
+    if not paginate:
+        return await collection.find(query, projection).sort(sort).to_list(None), None
+    return await fetch_page(collection, query, sort, limit, cursor, projection)
+
+
+async def _insert_many(collection, documents: List[dict]) -> None:
+    try:
+        await collection.insert_many([dict(document) for document in documents], ordered=False)
+    except BulkWriteError as exc:
+        errors = exc.details["writeErrors"]
+        if errors and all(error["code"] == 11000 for error in errors):
+            raise DuplicateError([error["index"] for error in errors])
+        raise
+
+
+class MongoUserRepository(UserRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get_by_username(self, username: str, with_password: bool = False) -> Optional[dict]:
+        return await self.collection.find_one(
+            {"username": username}, fields_projection(None, exclude_password=not with_password)
+        )
+
+    async def exists(self, username: str, email: str) -> bool:
+        return await self.collection.count_documents({"$or": [{"email": email}, {"username": username}]}, limit=1) > 0
+
+    async def insert(self, user: dict) -> None:
+        try:
+            # A copy, since insert_one adds an _id to the document it is given
+            await self.collection.insert_one(dict(user))
+        except DuplicateKeyError:
+            raise DuplicateError()
+
+    async def insert_many(self, users: List[dict]) -> None:
+        await _insert_many(self.collection, users)
+
+    async def set_password(self, user_id: str, hashed: str) -> None:
+        await self.collection.update_one({"id": user_id}, {"$set": {"password": hashed}})
+
+    async def update(self, user_id: str, changes: dict) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            {"id": user_id},
+            {"$set": changes},
+            projection=fields_projection(None, exclude_password=True),
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def page(self, limit: int, cursor: Optional[str], paginate: bool, fields: Sequence[str]) -> Page:
+        return await _page(self.collection, {}, USER_SORT, limit, cursor, paginate, fields)
+
+    async def count(self, role: Optional[str] = None) -> int:
+        if role is None:
+            return await self.collection.estimated_document_count()
+        return await self.collection.count_documents({"role": role})
+
+
+class MongoProjectRepository(ProjectRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert(self, project: dict) -> None:
+        await self.collection.insert_one(dict(project))
+
+    async def insert_many(self, projects: List[dict]) -> None:
+        await self.collection.insert_many([dict(project) for project in projects], ordered=False)
+
+    async def get(self, project_id: str, fields: Optional[Sequence[str]] = None) -> Optional[dict]:
+        return await self.collection.find_one({"id": project_id}, fields_projection(fields))
+
+    async def exists(self, project_id: str) -> bool:
+        return await self.collection.count_documents({"id": project_id}, limit=1) > 0
+
+    async def get_many(self, project_ids: Iterable[str], fields: Optional[Sequence[str]] = None) -> List[dict]:
+        return await self.collection.find({"id": {"$in": list(project_ids)}}, fields_projection(fields)).to_list(None)
+
+    async def update(self, project_id: str, changes: dict) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            {"id": project_id}, {"$set": changes}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+
+    async def delete(self, project_id: str) -> bool:
+        result = await self.collection.delete_one({"id": project_id})
+        return result.deleted_count > 0
+
+    async def page(
+        self, project_ids: Optional[Collection[str]], limit: int, cursor: Optional[str], paginate: bool,
+        fields: Sequence[str],
+    ) -> Page:
+        query = {"id": {"$in": list(project_ids)}} if project_ids is not None else {}
+        return await _page(self.collection, query, PROJECT_SORT, limit, cursor, paginate, fields)
+
+    async def count(self) -> int:
+        return await self.collection.estimated_document_count()
+
+
+class MongoProjectMemberRepository(ProjectMemberRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert_many(self, memberships: List[dict]) -> None:
+        operations = [
+            operation
+            for membership in memberships
+            for operation in members.membership_upserts(
+                membership["project_id"], [membership["employee_id"]], membership["added_at"]
+            )
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def add(self, project_id: str, employee_ids: Iterable[str]) -> List[str]:
+        employee_ids = list(dict.fromkeys(employee_ids))
+        if not employee_ids:
+            return []
+        result = await self.collection.bulk_write(
+            members.membership_upserts(project_id, employee_ids, datetime.utcnow()), ordered=False
+        )
+        # Only the upserts that inserted a document report an id
+        return [employee_ids[index] for index in sorted(result.upserted_ids)]
+
+    async def remove(self, project_id: str, employee_ids: Iterable[str]) -> List[str]:
+        query = {"project_id": project_id, "employee_id": {"$in": list(employee_ids)}}
+        removed = await self.collection.distinct("employee_id", query)
+        if removed:
+            await self.collection.delete_many(query)
+        return removed
+
+    async def remove_project(self, project_id: str) -> List[str]:
+        query = {"project_id": project_id}
+        removed = await self.collection.distinct("employee_id", query)
+        await self.collection.delete_many(query)
+        return removed
+
+    async def project_ids(self, employee_id: str) -> List[str]:
+        cursor = self.collection.find({"employee_id": employee_id}, {"_id": 0, "project_id": 1})
+        return [membership["project_id"] async for membership in cursor]
+
+    async def members(self, project_ids: Iterable[str]) -> Dict[str, List[str]]:
+        cursor = self.collection.find(
+            {"project_id": {"$in": list(project_ids)}}, {"_id": 0, "project_id": 1, "employee_id": 1}
+        ).sort([("project_id", 1), ("employee_id", 1)])
+        by_project = {}
+        async for membership in cursor:
+            by_project.setdefault(membership["project_id"], []).append(membership["employee_id"])
+        return by_project
+
+
+class MongoTimesheetRepository(TimesheetRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert(self, timesheet: dict) -> None:
+        await self.collection.insert_one(dict(timesheet))
+
+    async def insert_many(self, timesheets: List[dict]) -> None:
+        await _insert_many(self.collection, timesheets)
+
+    async def find_one(self, criteria: dict, fields: Optional[Sequence[str]] = None) -> Optional[dict]:
+        return await self.collection.find_one(timesheet_filter(criteria), fields_projection(fields))
+
+    async def exists(self, timesheet_id: str) -> bool:
+        return await self.collection.count_documents({"id": timesheet_id}, limit=1) > 0
+
+    async def update(self, criteria: dict, changes: dict) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            timesheet_filter(criteria), {"$set": changes}, projection={"_id": 0}, return_document=ReturnDocument.BEFORE
+        )
+
+    async def update_many(self, criteria: dict, changes: dict, limit: Optional[int] = None) -> List[dict]:
+        # Candidates come from the indexed criteria; the write keeps the
+        # criteria as its guard, and the change set (actor and timestamp) then
+        # tells the rows this call wrote from candidates changed concurrently.
+        # Every query is driven by the criteria's index or by id, never by the
+        # unindexed stamp fields alone. The ids travel in one $in, so callers
+        # pass a limit that keeps it well under the BSON document size.
+        query = timesheet_filter(criteria)
+        candidates = self.collection.find(query, {"_id": 0, "id": 1}).limit(limit or 0)
+        ids = [timesheet["id"] async for timesheet in candidates]
+        if not ids:
+            return []
+        await self.collection.update_many({**query, "id": {"$in": ids}}, {"$set": changes})
+        return await self.collection.find({"id": {"$in": ids}, **changes}, {"_id": 0}).to_list(None)
+
+    async def delete(self, criteria: dict) -> Optional[dict]:
+        return await self.collection.find_one_and_delete(timesheet_filter(criteria), projection={"_id": 0})
+
+    async def delete_many(self, criteria: dict) -> int:
+        result = await self.collection.delete_many(timesheet_filter(criteria))
+        return result.deleted_count
+
+    async def page(
+        self, criteria: dict, limit: int, cursor: Optional[str], paginate: bool, fields: Sequence[str]
+    ) -> Page:
+        return await _page(self.collection, timesheet_filter(criteria), TIMESHEET_SORT, limit, cursor, paginate, fields)
+
+    def scan(self, criteria: dict, fields: Sequence[str], batch_size: int):
+        return (
+            self.collection.find(timesheet_filter(criteria), fields_projection(fields))
+            .sort(TIMESHEET_EXPORT_SORT)
+            .batch_size(batch_size)
+        )
+
+    async def hours_rollup(self, criteria: dict, period: str, group_by: Sequence[str]) -> List[dict]:
+        pipeline = reports.hours_rollup_pipeline(timesheet_filter(criteria), period, group_by)
+        rows = await self.collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+        return [reports.rollup_row(row) for row in rows]
+
+    async def project_burn(self, project_id: str) -> dict:
+        facets = await self.collection.aggregate(reports.project_burn_pipeline(project_id)).to_list(1)
+        return facets[0]
+
+
+class MongoArchiveWatermarkRepository(ArchiveWatermarkRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def read(self) -> Optional[datetime]:
+        state = await self.collection.find_one({"_id": archive.TIMESHEETS_KEY})
+        return state["before"] if state else None
+
+    async def advance(self, before: datetime) -> Optional[datetime]:
+        previous = await self.collection.find_one_and_update(
+            {"_id": archive.TIMESHEETS_KEY}, {"$max": {"before": before}}, upsert=True
+        )
+        return previous["before"] if previous else None
+
+
+class MongoCounterRepository(CounterRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def apply_changes(self, changes) -> None:
+        await counters.apply_changes(self.db, changes)
+
+    async def read(self, key: str) -> dict:
+        return await counters.read_counters(self.db, key)
+
+    async def rebuild(self, dry_run: bool = False) -> list:
+        return await counters.rebuild_counters(self.db, dry_run=dry_run)
+
+
+class MongoVersionRepository(VersionRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def bump(self, *scopes: str) -> None:
+        await versions.bump(self.db, *scopes)
+
+    async def read(self, scopes: Sequence[str]) -> list:
+        return await versions.read(self.db, scopes)
+
+    async def new_epoch(self) -> None:
+        await versions.new_epoch(self.db)
+
+
+class MongoJobRepository(JobRepository):
+    def __init__(self, db):
+        self.collection = db[jobs.COLLECTION]
+        self.outputs = db[jobs.OUTPUT_COLLECTION]
+
+    async def insert(self, job: dict) -> None:
+        await self.collection.insert_one(dict(job))
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    async def update(self, job_id: str, changes: dict, status_in: Optional[Sequence[str]] = None) -> Optional[dict]:
+        query = {"id": job_id}
+        if status_in is not None:
+            query["status"] = {"$in": list(status_in)}
+        return await self.collection.find_one_and_update(
+            query, {"$set": changes}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+
+    async def touch(self, job_ids: Sequence[str], at: datetime) -> None:
+        await self.collection.update_many({"id": {"$in": list(job_ids)}}, {"$set": {"heartbeat_at": at}})
+
+    async def claim_abandoned(self, heartbeat_before: datetime, kinds: Collection[str], at: datetime) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            {"status": {"$in": [jobs.QUEUED, jobs.RUNNING]}, "heartbeat_at": {"$lt": heartbeat_before}, "kind": {"$in": list(kinds)}},
+            {"$set": {"status": jobs.QUEUED, "started_at": None, "heartbeat_at": at}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_abandoned(self, heartbeat_before: datetime, error: str) -> int:
+        result = await self.collection.update_many(
+            {"status": {"$in": [jobs.QUEUED, jobs.RUNNING]}, "heartbeat_at": {"$lt": heartbeat_before}},
+            {"$set": {"status": jobs.FAILED, "error": error, "finished_at": datetime.utcnow()}},
+        )
+        return result.modified_count
+
+    async def append_output(self, job_id: str, sequence: int, data: bytes) -> None:
+        await self.outputs.insert_one(
+            {"job_id": job_id, "sequence": sequence, "data": data, "created_at": datetime.utcnow()}
+        )
+
+    async def read_output(self, job_id: str):
+        # One chunk in memory at a time
+        async for chunk in self.outputs.find({"job_id": job_id}, {"_id": 0, "data": 1}).sort("sequence", 1):
+            yield bytes(chunk["data"])
+
+
+class MongoRepositories(Repositories):
+    backend = "mongo"
+
+    def __init__(self, mongo_url: str, db_name: str, **client_options):
+        self.client = AsyncIOMotorClient(mongo_url, **client_options)
+        self.db = self.client[db_name]
+        self.users = MongoUserRepository(self.db.users)
+        self.projects = MongoProjectRepository(self.db.projects)
+        self.members = MongoProjectMemberRepository(self.db[members.COLLECTION])
+        self.timesheets = archive.TieredTimesheetRepository(
+            MongoTimesheetRepository(self.db.timesheets),
+            MongoTimesheetRepository(self.db[archive.COLLECTION]),
+            MongoArchiveWatermarkRepository(self.db[archive.STATE_COLLECTION]),
+        )
+        self.counters = MongoCounterRepository(self.db)
+        self.versions = MongoVersionRepository(self.db)
+        self.jobs = MongoJobRepository(self.db)
+
+    async def prepare(self) -> None:
+        await ensure_indexes(self.db)
+        await members.migrate_assigned_employees(self.db)
+        await counters.ensure_counters(self.db)
+        await versions.ensure_epoch(self.db)
+
+    async def warm_up(self, connections: int) -> None:
+        # Concurrent commands each check out a connection, so the pool grows
+        # to `connections` now instead of during the first burst of traffic
+        await asyncio.gather(*(self.client.admin.command("ping") for _ in range(connections)))
+
+    async def ping(self) -> None:
+        await self.client.admin.command("ping")
+
+    def close(self) -> None:
+        self.client.close()
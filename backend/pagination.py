@@ -0,0 +1,82 @@
+"""Keyset (cursor) pagination over MongoDB collections.
+
+A page is read with ``find(query).sort(sort).limit(limit + 1)``; the sort key
+of the last returned document is encoded into an opaque cursor, and the next
+page starts strictly after it. With an index on the query's equality fields
+followed by the sort fields, every page is an index range scan whatever its
+depth, unlike skip/offset.
+"""
+import base64
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from bson import json_util
+from pymongo import ASCENDING
+
+
+# The type of each sort field's value; a cursor holding anything else (an
+# operator document such as {"$regex": ...} in particular) is rejected before
+# it reaches a query
+SORT_FIELD_TYPES = {"id": str, "date": datetime, "created_at": datetime}
+SORT_VALUE_TYPES = (str, int, float, datetime)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json_util.dumps(list(values)).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: Sequence[Tuple[str, int]]) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json_util.loads(raw.decode('utf-8'))
+    except Exception:
+        # Crafted extended JSON fails in many ways (InvalidId, InvalidBSON,
+        # TypeError, IndexError, ...); all of them are just a bad cursor
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursor("Invalid cursor")
+    for (field, _), value in zip(sort, values):
+        if not isinstance(value, SORT_FIELD_TYPES.get(field, SORT_VALUE_TYPES)):
+            raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def keyset_filter(sort: Sequence[Tuple[str, int]], values: Sequence) -> dict:
+    """Filter selecting documents that sort strictly after ``values``."""
+    branches = []
+    for position, (field, direction) in enumerate(sort):
+        branch = {prior: values[i] for i, (prior, _) in enumerate(sort[:position])}
+        branch[field] = {"$gt" if direction == ASCENDING else "$lt": values[position]}
+        branches.append(branch)
+    # The redundant bound on the leading field keeps the index scan tight
+    leading_field, leading_direction = sort[0]
+    return {
+        leading_field: {"$gte" if leading_direction == ASCENDING else "$lte": values[0]},
+        "$or": branches,
+    }
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    sort: List[Tuple[str, int]],
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None,
+) -> Tuple[list, Optional[str]]:
+    """Return ``(documents, next_cursor)``; ``next_cursor`` is None on the last page.
+
+    Raises ``InvalidCursor`` if ``cursor`` was not produced for this sort.
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+    documents = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor([documents[-1][field] for field, _ in sort])
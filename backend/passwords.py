@@ -0,0 +1,78 @@
+"""bcrypt hashing off the event loop.
+
+bcrypt is deliberately slow (~250ms at cost 12) and releases the GIL, so it
+runs on a small dedicated thread pool. Callers beyond ``workers +
+max_queue`` in flight are refused with ``PasswordHasherBusy`` straight away
+instead of queueing behind a login spike.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def hash_rounds(hashed: str) -> int:
+    # "$2b$12$<salt+hash>"
+    return int(hashed.split("$")[2])
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int, workers: int, max_queue: int):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._in_flight = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.workers)
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        self._in_flight += 1
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(fn, *args)
+        # Released when the work is done, not when the caller stops waiting:
+        # a cancelled request (client disconnect) leaves a running hash on
+        # its thread, and it still counts towards the bound until it ends
+        future.add_done_callback(lambda _: self._release(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, loop) -> None:
+        # Runs on the executor thread (or the loop's, for work cancelled while queued)
+        try:
+            loop.call_soon_threadsafe(self._done)
+        except RuntimeError:
+            # The loop has closed; nothing is left to count for
+            pass
+
+    def _done(self) -> None:
+        self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
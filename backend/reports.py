@@ -0,0 +1,160 @@
+"""Aggregation pipelines behind the reporting endpoints."""
+from datetime import date, timedelta
+
+STATUSES = ("draft", "submitted", "approved", "rejected")
+PERIOD_FORMATS = {
+    "week": "%G-W%V",  # ISO week, e.g. 2024-W05
+    "month": "%Y-%m",
+}
+GROUP_FIELDS = {
+    "employee": "employee_id",
+    "project": "project_id",
+}
+
+
+def hours_rollup_pipeline(match: dict, period: str, group_by) -> list:
+    """Hours per period (and per employee/project) with a per-status breakdown.
+
+    ``match`` should bound ``date`` so the scan stays on an index range.
+    """
+    group_id = {"period": {"$dateToString": {"format": PERIOD_FORMATS[period], "date": "$date"}}}
+    for dimension in group_by:
+        group_id[GROUP_FIELDS[dimension]] = "$" + GROUP_FIELDS[dimension]
+
+    group = {
+        "_id": group_id,
+        "total_hours": {"$sum": "$hours"},
+        "total_timesheets": {"$sum": 1},
+    }
+    for status in STATUSES:
+        is_status = {"$eq": ["$status", status]}
+        group[f"{status}_hours"] = {"$sum": {"$cond": [is_status, "$hours", 0]}}
+        group[f"{status}_timesheets"] = {"$sum": {"$cond": [is_status, 1, 0]}}
+
+    return [
+        {"$match": match},
+        {"$group": group},
+        {"$sort": {f"_id.{key}": 1 for key in group_id}},
+    ]
+
+
+def rollup_row(row: dict) -> dict:
+    result = dict(row["_id"])
+    result["total_hours"] = row["total_hours"]
+    result["total_timesheets"] = row["total_timesheets"]
+    result["by_status"] = {
+        status: {"hours": row[f"{status}_hours"], "timesheets": row[f"{status}_timesheets"]}
+        for status in STATUSES
+    }
+    return result
+
+
+def project_burn_pipeline(project_id: str) -> list:
+    """Daily and per-employee hours logged against a project (rejected excluded)."""
+    return [
+        {"$match": {"project_id": project_id, "status": {"$ne": "rejected"}}},
+        {"$facet": {
+            "by_day": [
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$date"}},
+                    "hours": {"$sum": "$hours"},
+                }},
+                {"$sort": {"_id": 1}},
+            ],
+            "by_employee": [
+                {"$group": {
+                    "_id": "$employee_id",
+                    "hours": {"$sum": "$hours"},
+                    "approved_hours": {"$sum": {"$cond": [{"$eq": ["$status", "approved"]}, "$hours", 0]}},
+                    "timesheets": {"$sum": 1},
+                }},
+                {"$sort": {"hours": -1, "_id": 1}},
+            ],
+        }},
+    ]
+
+
+def project_burn_report(project: dict, facets: dict, today: date) -> dict:
+    """Budget vs. consumed hours, burn rate and contributions from the pipeline output.
+
+    The burn rate is consumed hours per calendar day from the project start
+    up to today (or the end date, if that is earlier). The exhaustion date
+    extrapolates that rate and is only given for projects still running.
+    """
+    by_day = [{"date": row["_id"], "hours": row["hours"]} for row in facets["by_day"]]
+    by_employee = [
+        {
+            "employee_id": row["_id"],
+            "hours": row["hours"],
+            "approved_hours": row["approved_hours"],
+            "timesheets": row["timesheets"],
+        }
+        for row in facets["by_employee"]
+    ]
+    consumed = sum(row["hours"] for row in by_employee)
+    approved = sum(row["approved_hours"] for row in by_employee)
+
+    end = today
+    ended = project.get("end_date") is not None and project["end_date"].date() < today
+    if ended:
+        end = project["end_date"].date()
+    elapsed_days = max(1, (end - project["start_date"].date()).days + 1)
+    burn_rate = consumed / elapsed_days
+
+    budget = project.get("budget_hours")
+    remaining = budget - consumed if budget is not None else None
+    exhaustion = None
+    if not ended and remaining is not None and remaining > 0 and burn_rate > 0:
+        days_left = remaining / burn_rate
+        # A trickle of hours against a large budget can project past date.max
+        if days_left < (date.max - today).days:
+            exhaustion = (today + timedelta(days=days_left)).isoformat()
+
+    return {
+        "project_id": project["id"],
+        "name": project["name"],
+        "budget_hours": budget,
+        "consumed_hours": consumed,
+        "approved_hours": approved,
+        "remaining_hours": remaining,
+        "percent_consumed": consumed / budget * 100 if budget else None,
+        "daily_burn_rate": burn_rate,
+        "projected_exhaustion_date": exhaustion,
+        "by_day": by_day,
+        "by_employee": by_employee,
+    }
+
+
+def merge_rollup_rows(*row_lists) -> list:
+    """Sum ``rollup_row`` outputs computed over separate collections (hot and archive)."""
+    merged = {}
+    for rows in row_lists:
+        for row in rows:
+            key = tuple((name, value) for name, value in row.items() if name not in ("total_hours", "total_timesheets", "by_status"))
+            total = merged.get(key)
+            if total is None:
+                merged[key] = {**row, "by_status": {status: dict(sums) for status, sums in row["by_status"].items()}}
+                continue
+            total["total_hours"] += row["total_hours"]
+            total["total_timesheets"] += row["total_timesheets"]
+            for status, sums in row["by_status"].items():
+                total["by_status"][status]["hours"] += sums["hours"]
+                total["by_status"][status]["timesheets"] += sums["timesheets"]
+    return [merged[key] for key in sorted(merged, key=lambda key: [value for _, value in key])]
+
+
+def merge_burn_facets(*facet_list) -> dict:
+    """Sum ``project_burn_pipeline`` outputs computed over separate collections."""
+    by_day = {}
+    by_employee = {}
+    for facets in facet_list:
+        for row in facets["by_day"]:
+            by_day[row["_id"]] = by_day.get(row["_id"], 0) + row["hours"]
+        for row in facets["by_employee"]:
+            total = by_employee.setdefault(row["_id"], {"_id": row["_id"], "hours": 0, "approved_hours": 0, "timesheets": 0})
+            for field in ("hours", "approved_hours", "timesheets"):
+                total[field] += row[field]
+    return {
+        "by_day": [{"_id": day, "hours": hours} for day, hours in sorted(by_day.items())],
+        "by_employee": sorted(by_employee.values(), key=lambda row: (-row["hours"], row["_id"])),
+    }
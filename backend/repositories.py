@@ -0,0 +1,314 @@
+"""Storage interface for users, projects and timesheets.
+
+Handlers talk to a ``Repositories`` bundle instead of a database handle, so
+the storage backend can be swapped:
+
+    mongo   (mongo_repositories.py)   Motor / MongoDB, the production store
+    memory  (memory_repositories.py)  indexed in-process dicts, for tests,
+                                      benchmarks and load runs without MongoDB
+
+Documents are plain dicts shaped like the Pydantic models in server.py.
+``fields`` restricts a read to those keys (None = the whole document, never
+the password hash unless asked for). Timesheet reads and writes take a
+*criteria* dict; every key is optional:
+
+    id, ids, employee_id, project_id, status   exact match (ids: any of)
+    status_in, status_not_in                   status is one / none of these
+    date_from, date_to                         inclusive bounds on date
+    date_before                                exclusive upper bound on date
+    updated_at_by_id                           {id: updated_at}: only those ids,
+                                               each still at that updated_at
+
+Pages are keyset-paginated on the sort keys below and return
+``(documents, next_cursor)``; a bad cursor raises ``InvalidCursor``.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+
+# Stable sort keys for keyset cursors (see pagination.py); both backends
+# encode cursors from the same values so the format does not depend on them
+TIMESHEET_SORT = [("date", DESCENDING), ("id", DESCENDING)]
+TIMESHEET_EXPORT_SORT = [("date", ASCENDING), ("id", ASCENDING)]
+PROJECT_SORT = [("created_at", ASCENDING), ("id", ASCENDING)]
+USER_SORT = [("created_at", ASCENDING), ("id", ASCENDING)]
+
+BACKENDS = ("mongo", "memory")
+
+Page = Tuple[List[dict], Optional[str]]
+
+
+class DuplicateError(Exception):
+    """An insert collided with a unique key (id, username, email).
+
+    ``insert_many`` is unordered: every other document is still written, and
+    ``indexes`` holds the positions of the ones that were not.
+    """
+
+    def __init__(self, indexes: Sequence[int] = ()):
+        super().__init__()
+        self.indexes = list(indexes)
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    async def get_by_username(self, username: str, with_password: bool = False) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def exists(self, username: str, email: str) -> bool:
+        """Whether a user with this username *or* this email exists."""
+
+    @abstractmethod
+    async def insert(self, user: dict) -> None:
+        """Raises ``DuplicateError`` if the id, username or email is taken."""
+
+    @abstractmethod
+    async def insert_many(self, users: List[dict]) -> None:
+        """Raises ``DuplicateError`` if any id, username or email is taken."""
+
+    @abstractmethod
+    async def set_password(self, user_id: str, hashed: str) -> None: ...
+
+    @abstractmethod
+    async def update(self, user_id: str, changes: dict) -> Optional[dict]:
+        """Apply ``changes`` and return the updated user (None if missing)."""
+
+    @abstractmethod
+    async def page(self, limit: int, cursor: Optional[str], paginate: bool, fields: Sequence[str]) -> Page: ...
+
+    @abstractmethod
+    async def count(self, role: Optional[str] = None) -> int: ...
+
+
+class ProjectRepository(ABC):
+    @abstractmethod
+    async def insert(self, project: dict) -> None: ...
+
+    @abstractmethod
+    async def insert_many(self, projects: List[dict]) -> None: ...
+
+    @abstractmethod
+    async def get(self, project_id: str, fields: Optional[Sequence[str]] = None) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def exists(self, project_id: str) -> bool: ...
+
+    @abstractmethod
+    async def get_many(self, project_ids: Iterable[str], fields: Optional[Sequence[str]] = None) -> List[dict]: ...
+
+    @abstractmethod
+    async def update(self, project_id: str, changes: dict) -> Optional[dict]:
+        """Apply ``changes`` and return the updated project (None if missing)."""
+
+    @abstractmethod
+    async def delete(self, project_id: str) -> bool: ...
+
+    @abstractmethod
+    async def page(
+        self, project_ids: Optional[Collection[str]], limit: int, cursor: Optional[str], paginate: bool,
+        fields: Sequence[str],
+    ) -> Page:
+        """Projects (only those in ``project_ids``, if given)."""
+
+    @abstractmethod
+    async def count(self) -> int: ...
+
+
+class ProjectMemberRepository(ABC):
+    """Who is assigned to which project, one ``(project_id, employee_id)`` row per assignment.
+
+    Project documents do not carry their members (see members.py), so a
+    membership check never reads a project's whole member list.
+    """
+
+    @abstractmethod
+    async def insert_many(self, memberships: List[dict]) -> None:
+        """``{"project_id", "employee_id", "added_at"}`` rows; ones that exist are skipped."""
+
+    @abstractmethod
+    async def add(self, project_id: str, employee_ids: Iterable[str]) -> List[str]:
+        """Assign ``employee_ids``; returns the ones that were not members yet."""
+
+    @abstractmethod
+    async def remove(self, project_id: str, employee_ids: Iterable[str]) -> List[str]:
+        """Unassign ``employee_ids``; returns the ones that were members."""
+
+    @abstractmethod
+    async def remove_project(self, project_id: str) -> List[str]:
+        """Drop every membership of the project; returns the former members."""
+
+    @abstractmethod
+    async def project_ids(self, employee_id: str) -> List[str]:
+        """The projects ``employee_id`` is assigned to."""
+
+    @abstractmethod
+    async def members(self, project_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Member ids (sorted) per project; projects without members are left out."""
+
+
+class TimesheetRepository(ABC):
+    @abstractmethod
+    async def insert(self, timesheet: dict) -> None: ...
+
+    @abstractmethod
+    async def insert_many(self, timesheets: List[dict]) -> None: ...
+
+    @abstractmethod
+    async def find_one(self, criteria: dict, fields: Optional[Sequence[str]] = None) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def exists(self, timesheet_id: str) -> bool: ...
+
+    @abstractmethod
+    async def update(self, criteria: dict, changes: dict) -> Optional[dict]:
+        """Apply ``changes`` to the one timesheet matching and return its pre-image.
+
+        The criteria are evaluated atomically with the write, so they can
+        act as guards (e.g. ``status_not_in``).
+        """
+
+    @abstractmethod
+    async def update_many(self, criteria: dict, changes: dict, limit: Optional[int] = None) -> List[dict]:
+        """Apply ``changes`` to every match (at most ``limit``) and return the updated timesheets."""
+
+    @abstractmethod
+    async def delete(self, criteria: dict) -> Optional[dict]:
+        """Delete the one timesheet matching and return it."""
+
+    @abstractmethod
+    async def delete_many(self, criteria: dict) -> int:
+        """Delete every match and return how many were deleted."""
+
+    @abstractmethod
+    async def page(
+        self, criteria: dict, limit: int, cursor: Optional[str], paginate: bool, fields: Sequence[str]
+    ) -> Page: ...
+
+    @abstractmethod
+    def scan(self, criteria: dict, fields: Sequence[str], batch_size: int) -> AsyncIterator[dict]:
+        """Every match in export order (date, id ascending), read in batches."""
+
+    @abstractmethod
+    async def hours_rollup(self, criteria: dict, period: str, group_by: Sequence[str]) -> List[dict]:
+        """Rows as produced by ``reports.rollup_row`` (see reports.hours_rollup_pipeline)."""
+
+    @abstractmethod
+    async def project_burn(self, project_id: str) -> dict:
+        """``{"by_day": [...], "by_employee": [...]}`` as produced by reports.project_burn_pipeline."""
+
+
+class ArchiveWatermarkRepository(ABC):
+    """Every archived timesheet is dated before the watermark (see archive.py)."""
+
+    @abstractmethod
+    async def read(self) -> Optional[datetime]: ...
+
+    @abstractmethod
+    async def advance(self, before: datetime) -> Optional[datetime]:
+        """Raise the watermark to ``before`` (never lower it); returns the previous one."""
+
+
+class CounterRepository(ABC):
+    """Materialized dashboard counters (see counters.py)."""
+
+    @abstractmethod
+    async def apply_changes(self, changes: Iterable[Tuple[Optional[dict], Optional[dict]]]) -> None: ...
+
+    @abstractmethod
+    async def read(self, key: str) -> dict: ...
+
+    @abstractmethod
+    async def rebuild(self, dry_run: bool = False) -> list:
+        """Recompute from the timesheets; returns the drift as counters.rebuild_counters does."""
+
+
+class VersionRepository(ABC):
+    """ETag version stamps (see versions.py)."""
+
+    @abstractmethod
+    async def bump(self, *scopes: str) -> None: ...
+
+    @abstractmethod
+    async def read(self, scopes: Sequence[str]) -> list: ...
+
+    @abstractmethod
+    async def new_epoch(self) -> None: ...
+
+
+class JobRepository(ABC):
+    """Background jobs and their output chunks (see jobs.py)."""
+
+    @abstractmethod
+    async def insert(self, job: dict) -> None: ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def update(self, job_id: str, changes: dict, status_in: Optional[Sequence[str]] = None) -> Optional[dict]:
+        """Apply ``changes`` if the job's status is one of ``status_in`` (any, if None); returns the updated job."""
+
+    @abstractmethod
+    async def touch(self, job_ids: Sequence[str], at: datetime) -> None:
+        """Set the heartbeat of these jobs."""
+
+    @abstractmethod
+    async def claim_abandoned(self, heartbeat_before: datetime, kinds: Collection[str], at: datetime) -> Optional[dict]:
+        """Requeue one unfinished job of ``kinds`` whose heartbeat is older than ``heartbeat_before``.
+
+        The job is set back to queued, with its heartbeat at ``at``, in one
+        atomic write, so of several workers starting at once only one takes
+        it. Returns the job, or None when there is none left.
+        """
+
+    @abstractmethod
+    async def fail_abandoned(self, heartbeat_before: datetime, error: str) -> int:
+        """Fail unfinished jobs whose heartbeat is older than ``heartbeat_before``; returns how many."""
+
+    @abstractmethod
+    async def append_output(self, job_id: str, sequence: int, data: bytes) -> None: ...
+
+    @abstractmethod
+    def read_output(self, job_id: str) -> AsyncIterator[bytes]:
+        """The output chunks in the order they were appended."""
+
+
+class Repositories(ABC):
+    backend: str
+    users: UserRepository
+    projects: ProjectRepository
+    members: ProjectMemberRepository
+    timesheets: TimesheetRepository
+    counters: CounterRepository
+    versions: VersionRepository
+    jobs: JobRepository
+
+    @abstractmethod
+    async def prepare(self) -> None:
+        """Indexes and derived state the app expects at startup."""
+
+    @abstractmethod
+    async def warm_up(self, connections: int) -> None:
+        """Open up to ``connections`` database connections ahead of the first requests."""
+
+    @abstractmethod
+    async def ping(self) -> None:
+        """Raises if the storage cannot serve requests."""
+
+    @abstractmethod
+    def close(self) -> None: ...
+
+
+def create_repositories(
+    backend: str, mongo_url: Optional[str] = None, db_name: Optional[str] = None, **client_options
+) -> Repositories:
+    """``client_options`` go to the MongoDB client (pool size, event listeners, ...)."""
+    if backend == "mongo":
+        from mongo_repositories import MongoRepositories
+        return MongoRepositories(mongo_url, db_name, **client_options)
+    if backend == "memory":
+        from memory_repositories import MemoryRepositories
+        return MemoryRepositories()
+    raise ValueError(f"Unknown storage backend {backend!r} (expected one of: {', '.join(BACKENDS)})")
@@ -0,0 +1,266 @@
+"""Deterministic synthetic dataset for scale testing.
+
+The same seed and sizes always produce the same users, projects and
+timesheets (ids included), so a slow query can be reproduced on another
+machine. Documents are written straight through the storage repositories in
+``insert_many`` batches; passwords are hashed once per role template rather
+than once per user, so the dataset loads in minutes instead of days of
+bcrypt:
+
+    python seed.py --drop                                   # ~100k timesheets
+    python seed.py --drop --employees 5000 --projects 500 --members 400 --timesheets 5000000
+    python seed.py --storage memory --timesheets 200000     # time the in-memory backend
+
+Every seeded user of a role shares that role's password ("seed-<role>",
+e.g. employee00042 / seed-employee). Afterwards the dashboard counters are
+rebuilt and the storage is prepared (indexes are created after the bulk
+load, which is much faster than maintaining them during it). --drop only
+applies to MongoDB; the memory backend always starts empty.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import archive
+import counters
+import members
+import versions
+from passwords import hash_password
+from repositories import BACKENDS, DuplicateError, create_repositories
+from settings import Settings
+
+ROLES = ("admin", "manager", "employee")
+
+# Status mix by age: recent weeks are still in flight, older ones are settled
+RECENT_DAYS = 14
+RECENT_STATUSES = (("draft", 40), ("submitted", 40), ("approved", 15), ("rejected", 5))
+SETTLED_STATUSES = (("draft", 3), ("submitted", 5), ("approved", 85), ("rejected", 7))
+
+DESCRIPTIONS = (
+    "Feature development", "Code review", "Bug fixing", "Client meeting",
+    "Sprint planning", "Documentation", "Testing", "Deployment and release",
+)
+
+
+class Dataset:
+    """Document generators for one seed; each call to a generator restarts its stream."""
+
+    def __init__(self, seed: int, admins: int, managers: int, employees: int, projects: int,
+                 members: int, timesheets: int, days: int, end: datetime):
+        self.seed = seed
+        self.counts = {"admin": admins, "manager": managers, "employee": employees}
+        self.projects = projects
+        self.members = min(members, employees)
+        self.timesheets = timesheets
+        self.days = days
+        self.end = end
+        self.start = end - timedelta(days=days)
+
+        rng = random.Random(f"{seed}:ids")
+        self.user_ids = {role: [self._uuid(rng) for _ in range(count)] for role, count in self.counts.items()}
+        self.project_ids = [self._uuid(rng) for _ in range(projects)]
+
+        # Members per project: a random sample, plus round-robin so every employee is on at least one
+        rng = random.Random(f"{seed}:members")
+        employee_ids = self.user_ids["employee"]
+        self.assignments = []
+        for index in range(projects):
+            sample = rng.sample(employee_ids, self.members) if employee_ids else []
+            sample += employee_ids[index::projects]
+            self.assignments.append(list(dict.fromkeys(sample)))
+        self.employee_projects = {employee_id: [] for employee_id in employee_ids}
+        for project_id, assigned in zip(self.project_ids, self.assignments):
+            for employee_id in assigned:
+                self.employee_projects[employee_id].append(project_id)
+
+    @staticmethod
+    def _uuid(rng: random.Random) -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def users(self, password_hashes: dict):
+        created_at = self.start - timedelta(days=30)
+        for role in ROLES:
+            for index, user_id in enumerate(self.user_ids[role]):
+                created_at += timedelta(minutes=1)
+                username = f"{role}{index:05d}"
+                yield {
+                    "id": user_id,
+                    "email": f"{username}@example.com",
+                    "username": username,
+                    "full_name": f"{role.title()} {index}",
+                    "role": role,
+                    "created_at": created_at,
+                    "is_active": True,
+                    "password": password_hashes[role],
+                }
+
+    def project_documents(self):
+        rng = random.Random(f"{self.seed}:projects")
+        managers = self.user_ids["manager"] or self.user_ids["admin"]
+        for index, project_id in enumerate(self.project_ids):
+            start = self.start - timedelta(days=rng.randrange(0, 180))
+            ended = rng.random() < 0.2
+            yield {
+                "id": project_id,
+                "name": f"Project {index:04d}",
+                "description": rng.choice(DESCRIPTIONS),
+                "start_date": start,
+                "end_date": self.end - timedelta(days=rng.randrange(1, self.days or 1)) if ended else None,
+                "status": "completed" if ended else "active",
+                "budget_hours": float(rng.randrange(500, 20000, 100)),
+                "created_by": rng.choice(managers) if managers else None,
+                "created_at": start,
+            }
+
+    def membership_documents(self):
+        # Assigned when the project was created
+        for project, assigned in zip(self.project_documents(), self.assignments):
+            for employee_id in assigned:
+                yield {"project_id": project["id"], "employee_id": employee_id, "added_at": project["created_at"]}
+
+    def timesheet_documents(self):
+        rng = random.Random(f"{self.seed}:timesheets")
+        employees = [employee_id for employee_id, projects in self.employee_projects.items() if projects]
+        approvers = self.user_ids["manager"] or self.user_ids["admin"]
+        if not employees:
+            return
+        recent_cutoff = self.end - timedelta(days=RECENT_DAYS)
+        for index in range(self.timesheets):
+            employee_id = employees[index % len(employees)]
+            date = self.start + timedelta(days=rng.randrange(self.days or 1))
+            created_at = date + timedelta(hours=17, seconds=rng.randrange(3600))
+            statuses = RECENT_STATUSES if date >= recent_cutoff else SETTLED_STATUSES
+            status = rng.choices([name for name, _ in statuses], weights=[weight for _, weight in statuses])[0]
+            submitted_at = created_at + timedelta(days=rng.randrange(1, 4)) if status != "draft" else None
+            decided_at = submitted_at + timedelta(days=rng.randrange(1, 4)) if status in ("approved", "rejected") else None
+            approver = rng.choice(approvers) if decided_at and approvers else None
+            yield {
+                "id": self._uuid(rng),
+                "employee_id": employee_id,
+                "project_id": rng.choice(self.employee_projects[employee_id]),
+                "date": date,
+                "hours": rng.choice((1.0, 2.0, 4.0, 6.0, 7.5, 8.0)),
+                "description": rng.choice(DESCRIPTIONS),
+                "status": status,
+                "submitted_at": submitted_at,
+                "approved_at": decided_at if status == "approved" else None,
+                "approved_by": approver if status == "approved" else None,
+                "rejected_at": decided_at if status == "rejected" else None,
+                "rejected_by": approver if status == "rejected" else None,
+                "rejection_reason": "Please add more detail" if status == "rejected" else None,
+                "created_at": created_at,
+                "updated_at": decided_at or submitted_at or created_at,
+            }
+
+
+async def _insert_batches(insert_many, documents, batch_size: int, concurrency: int) -> int:
+    # Up to `concurrency` batches in flight; generation overlaps with the writes
+    in_flight = set()
+    written = 0
+    batch = []
+
+    async def flush(batch):
+        while len(in_flight) >= concurrency:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                in_flight.discard(task)
+                task.result()
+        in_flight.add(asyncio.ensure_future(insert_many(batch)))
+
+    for document in documents:
+        batch.append(document)
+        if len(batch) == batch_size:
+            await flush(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+        written += len(batch)
+    await asyncio.gather(*in_flight)
+    return written
+
+
+async def seed(repos, dataset: Dataset, rounds: int, batch_size: int = 5000, concurrency: int = 4, log=print) -> dict:
+    """Load ``dataset`` into ``repos`` and rebuild derived state; returns the counts written."""
+    started = time.perf_counter()
+    password_hashes = {role: hash_password(f"seed-{role}", rounds) for role in ROLES}
+
+    written = {}
+    for name, repository, documents in (
+        ("users", repos.users, dataset.users(password_hashes)),
+        ("projects", repos.projects, dataset.project_documents()),
+        ("members", repos.members, dataset.membership_documents()),
+        ("timesheets", repos.timesheets, dataset.timesheet_documents()),
+    ):
+        phase_started = time.perf_counter()
+        written[name] = await _insert_batches(repository.insert_many, documents, batch_size, concurrency)
+        elapsed = time.perf_counter() - phase_started
+        log(f"{name:11} {written[name]:>10,} in {elapsed:7.1f}s ({written[name] / max(elapsed, 1e-9):,.0f}/s)")
+
+    phase_started = time.perf_counter()
+    await repos.counters.rebuild()
+    await repos.versions.bump(versions.USERS, versions.PROJECTS, versions.TIMESHEETS)
+    await repos.prepare()
+    log(f"{'counters, indexes':20} done in {time.perf_counter() - phase_started:7.1f}s")
+    log(f"{'total':20} {time.perf_counter() - started:7.1f}s")
+    return written
+
+
+async def _main(args) -> int:
+    overrides = {"storage_backend": args.storage} if args.storage else {}
+    if args.bcrypt_rounds:
+        overrides["bcrypt_rounds"] = args.bcrypt_rounds
+    settings = Settings.from_env(**overrides)
+    args.storage = settings.storage_backend
+    rounds = settings.bcrypt_rounds
+    repos = create_repositories(
+        settings.storage_backend, settings.mongo_url, settings.db_name, **settings.mongo_client_options()
+    )
+
+    dataset = Dataset(
+        seed=args.seed,
+        admins=args.admins,
+        managers=args.managers,
+        employees=args.employees,
+        projects=args.projects,
+        members=args.members,
+        timesheets=args.timesheets,
+        days=args.days,
+        end=args.end,
+    )
+    try:
+        if args.drop and args.storage == "mongo":
+            for collection in (
+                "users", "projects", members.COLLECTION, "timesheets", archive.COLLECTION, archive.STATE_COLLECTION,
+                counters.COLLECTION, versions.COLLECTION,
+            ):
+                await repos.db.drop_collection(collection)
+        await seed(repos, dataset, rounds, args.batch_size, args.concurrency)
+    except DuplicateError:
+        print("The seeded users already exist; rerun with --drop to replace the data")
+        return 1
+    finally:
+        repos.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storage", choices=BACKENDS, help="default: STORAGE_BACKEND, else mongo")
+    parser.add_argument("--drop", action="store_true", help="drop the app's collections first (MongoDB)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--managers", type=int, default=50)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=300)
+    parser.add_argument("--members", type=int, default=200, help="sampled employees per project")
+    parser.add_argument("--timesheets", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365, help="timesheet dates span this many days before --end")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=datetime(2025, 1, 1), help="last timesheet date")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=4, help="insert batches in flight")
+    parser.add_argument("--bcrypt-rounds", type=int, help="default: BCRYPT_ROUNDS, else 12")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
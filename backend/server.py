@@ -1,39 +1,60 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from dotenv import load_dotenv
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+import asyncio
+import hashlib
 import logging
-from pathlib import Path
+from contextlib import asynccontextmanager
+from functools import partial
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Iterable, List, Optional
 import uuid
 from datetime import datetime, timedelta
-import bcrypt
 import jwt
 from enum import Enum
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+import counters
+from cache import TTLCache
+import events
+import exports
+import imports
+import jobs
+import metrics
+import reports
+from pagination import InvalidCursor
+from passwords import PasswordHasher, PasswordHasherBusy
+from repositories import DuplicateError, Repositories, create_repositories
+from settings import Settings
+import versions
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Create the main app without a prefix
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Liveness / readiness probes, outside /api
+health_router = APIRouter()
+
 # JWT settings
 SECRET_KEY = "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Pagination: keyset cursors on the sort keys in repositories.py
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Timesheets deleted per batch when a project's are cascaded
+CASCADE_BATCH_SIZE = 1000
+
+# A week grid is at most 7 days x a handful of projects
+MAX_BULK_ENTRIES = 200
+MAX_BULK_APPROVAL_IDS = 1000
+MAX_MEMBER_CHANGES = 1000
 
 # Enums
 class UserRole(str, Enum):
@@ -47,11 +68,25 @@ class TimesheetStatus(str, Enum):
     APPROVED = "approved"
     REJECTED = "rejected"
 
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+class ReportPeriod(str, Enum):
+    WEEK = "week"
+    MONTH = "month"
+
 class ProjectStatus(str, Enum):
     ACTIVE = "active"
     INACTIVE = "inactive"
     COMPLETED = "completed"
 
+class JobStatus(str, Enum):
+    QUEUED = jobs.QUEUED
+    RUNNING = jobs.RUNNING
+    SUCCEEDED = jobs.SUCCEEDED
+    FAILED = jobs.FAILED
+
 # Models
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -62,6 +97,10 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = True
 
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None
+
 class UserCreate(BaseModel):
     email: str
     username: str
@@ -69,6 +108,11 @@ class UserCreate(BaseModel):
     password: str
     role: UserRole = UserRole.EMPLOYEE
 
+class UserUpdate(BaseModel):
+    full_name: Optional[str] = None
+    role: Optional[UserRole] = None
+    is_active: Optional[bool] = None
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -86,15 +130,28 @@ class Project(BaseModel):
     end_date: Optional[datetime] = None
     status: ProjectStatus = ProjectStatus.ACTIVE
     assigned_employees: List[str] = []
+    budget_hours: Optional[float] = None
     created_by: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ProjectPage(BaseModel):
+    items: List[Project]
+    next_cursor: Optional[str] = None
+
 class ProjectCreate(BaseModel):
     name: str
     description: str
     start_date: datetime
     end_date: Optional[datetime] = None
     assigned_employees: List[str] = []
+    budget_hours: Optional[float] = Field(None, ge=0)
+
+class ProjectMembersAdd(BaseModel):
+    employee_ids: List[str] = Field(..., min_length=1, max_length=MAX_MEMBER_CHANGES)
+
+class ProjectMembersAdded(BaseModel):
+    added: List[str]
+    already_members: List[str]
 
 class Timesheet(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -113,12 +170,31 @@ class Timesheet(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class TimesheetPage(BaseModel):
+    items: List[Timesheet]
+    next_cursor: Optional[str] = None
+
 class TimesheetCreate(BaseModel):
     project_id: str
     date: datetime
     hours: float
     description: str
 
+class TimesheetBulkCreate(BaseModel):
+    entries: List[TimesheetCreate] = Field(..., min_length=1, max_length=MAX_BULK_ENTRIES)
+    # All-or-nothing: create every entry as submitted, or none if any entry fails
+    submit: bool = False
+
+class TimesheetBulkResult(BaseModel):
+    index: int
+    timesheet: Optional[Timesheet] = None
+    error: Optional[str] = None
+
+class TimesheetBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[TimesheetBulkResult]
+
 class TimesheetUpdate(BaseModel):
     hours: Optional[float] = None
     description: Optional[str] = None
@@ -128,12 +204,210 @@ class TimesheetApproval(BaseModel):
     status: TimesheetStatus
     rejection_reason: Optional[str] = None
 
+class TimesheetBulkApproval(TimesheetApproval):
+    # Either explicit ids or filters; only currently submitted timesheets change
+    ids: Optional[List[str]] = Field(None, max_length=MAX_BULK_APPROVAL_IDS)
+    project_id: Optional[str] = None
+    employee_id: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+class TimesheetBulkApprovalResponse(BaseModel):
+    updated: int
+    skipped: int
+    skipped_ids: List[str]
+    # Filter mode changes at most MAX_BULK_APPROVAL_IDS timesheets per call;
+    # when more still match, repeat the request for the next batch
+    truncated: bool = False
+
+class TimesheetImportError(BaseModel):
+    line: int
+    error: str
+
+class TimesheetImportResponse(BaseModel):
+    imported: int
+    failed: int
+    # The first imports.MAX_REPORTED_ERRORS failures, by line
+    errors: List[TimesheetImportError]
+    dry_run: bool
+
+class JobProgress(BaseModel):
+    done: int = 0
+    total: Optional[int] = None
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: JobStatus
+    progress: JobProgress
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# Default fieldsets for list endpoints: the free-text description (and a
+# project's member list, which lives in its own collection) is only fetched
+# when asked for with ?fields=
+TIMESHEET_LIST_FIELDS = [field for field in Timesheet.model_fields if field != "description"]
+PROJECT_LIST_FIELDS = [field for field in Project.model_fields if field not in ("description", "assigned_employees")]
+
+class Services:
+    """Per-app state, kept on ``app.state.services`` and injected with get_services.
+
+    Storage and the bcrypt pool are opened by the app's lifespan and released
+    on shutdown, so an app can be started more than once (as test clients do).
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.repos: Optional[Repositories] = None
+        self.password_hasher: Optional[PasswordHasher] = None
+        self.jobs: Optional[jobs.JobRunner] = None
+        self.ready = False
+        self.user_cache = TTLCache(settings.user_cache_max_size, settings.user_cache_ttl_seconds)
+        self.membership_cache = TTLCache(settings.membership_cache_max_size, settings.membership_cache_ttl_seconds)
+        self.project_report_cache = TTLCache(
+            settings.project_report_cache_max_size, settings.project_report_cache_ttl_seconds
+        )
+        self.event_broker = events.EventBroker(settings.event_queue_size)
+        self.metrics = metrics.Registry()
+        self.mongo_listeners = []
+        if settings.metrics_enabled:
+            self._register_metrics()
+    
+    def _register_metrics(self):
+        if self.settings.storage_backend == "mongo":
+            self.mongo_listeners = metrics.mongo_listeners(self.metrics)
+        self.metrics.gauge(
+            "password_hash_queue_depth", "bcrypt jobs waiting for a worker thread",
+            collect=lambda: self.password_hasher.queue_depth if self.password_hasher else 0,
+        )
+        self.metrics.counter(
+            "password_hash_rejected_total", "bcrypt jobs refused because the queue was full",
+            collect=lambda: self.password_hasher.rejected if self.password_hasher else 0,
+        )
+        caches = {
+            "users": self.user_cache,
+            "memberships": self.membership_cache,
+            "project_reports": self.project_report_cache,
+        }
+        self.metrics.counter(
+            "cache_lookups_total", "In-process cache lookups by result", ("cache", "result"),
+            collect=lambda: {
+                **{(name, "hit"): cache.hits for name, cache in caches.items()},
+                **{(name, "miss"): cache.misses for name, cache in caches.items()},
+            },
+        )
+        self.metrics.gauge(
+            "cache_entries", "Entries held by in-process caches", ("cache",),
+            collect=lambda: {name: len(cache) for name, cache in caches.items()},
+        )
+        self.metrics.gauge(
+            "event_subscribers", "Connected timesheet event streams",
+            collect=lambda: self.event_broker.stats()["subscribers"],
+        )
+        self.metrics.counter(
+            "event_evictions_total", "Event streams dropped for falling behind",
+            collect=lambda: self.event_broker.evictions,
+        )
+        self.metrics.gauge(
+            "jobs_queued", "Background jobs waiting for a worker",
+            collect=lambda: self.jobs.queue_depth if self.jobs else 0,
+        )
+        self.metrics.gauge(
+            "jobs_running", "Background jobs being run",
+            collect=lambda: self.jobs.running if self.jobs else 0,
+        )
+    
+    async def open(self):
+        settings = self.settings
+        self.password_hasher = PasswordHasher(
+            rounds=settings.bcrypt_rounds,
+            workers=settings.password_hash_workers,
+            max_queue=settings.password_hash_max_queue,
+        )
+        if settings.storage_backend == "mongo":
+            self.repos = create_repositories(
+                settings.storage_backend,
+                settings.mongo_url,
+                settings.db_name,
+                event_listeners=self.mongo_listeners,
+                **settings.mongo_client_options(),
+            )
+        else:
+            self.repos = create_repositories(settings.storage_backend)
+        await self.repos.prepare()
+        await self.repos.warm_up(settings.mongo_min_pool_size)
+        self.jobs = jobs.JobRunner(
+            self.repos.jobs,
+            {
+                "project_timesheets_cascade": partial(cascade_project_timesheets, self),
+                "timesheet_export": partial(export_timesheets_job, self),
+                "counter_rebuild": partial(rebuild_counters_job, self),
+            },
+            workers=settings.job_workers,
+            max_queue=settings.job_max_queue,
+            resumable={"project_timesheets_cascade"},
+        )
+        await self.jobs.start()
+        self.ready = True
+    
+    async def close(self):
+        self.ready = False
+        if self.jobs is not None:
+            await self.jobs.stop()
+        if self.repos is not None:
+            self.repos.close()
+        if self.password_hasher is not None:
+            self.password_hasher.shutdown()
+
+async def get_services(request: Request) -> Services:
+    # async so FastAPI does not send this lookup through the threadpool
+    return request.app.state.services
+
 # Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(services: Services, password: str) -> str:
+    try:
+        return await services.password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(services: Services, password: str, hashed: str) -> bool:
+    try:
+        return await services.password_hasher.verify(password, hashed)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+async def submit_job(services: Services, kind: str, params: dict, current_user: User) -> Job:
+    try:
+        job = await services.jobs.submit(kind, params, current_user.id)
+    except jobs.JobQueueFull:
+        raise HTTPException(status_code=503, detail="Too many jobs queued, please retry", headers={"Retry-After": "5"})
+    return Job(**job)
+
+async def accessible_project_ids(services: Services, user_id: str) -> frozenset:
+    # The projects a user is assigned to, cached per user so that access
+    # checks are a set lookup instead of a query
+    project_ids = services.membership_cache.get(user_id)
+    if project_ids is None:
+        project_ids = frozenset(await services.repos.members.project_ids(user_id))
+        services.membership_cache.set(user_id, project_ids)
+    return project_ids
+
+async def members_changed(services: Services, employee_ids: Iterable[str]):
+    for employee_id in employee_ids:
+        services.membership_cache.invalidate(employee_id)
+    # Employees' project lists and dashboards are versioned under PROJECTS
+    await services.repos.versions.bump(versions.PROJECTS)
+
+async def with_members(services: Services, projects: list, selected: list) -> list:
+    # Fill in assigned_employees from the membership relation, only when selected
+    if "assigned_employees" in selected and projects:
+        by_project = await services.repos.members.members([project["id"] for project in projects])
+        for project in projects:
+            project["assigned_employees"] = by_project.get(project["id"], [])
+    return projects
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -145,18 +419,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    services: Services = Depends(get_services)
+):
+    return await user_from_token(services, credentials.credentials)
+
+async def user_from_token(services: Services, token: str) -> User:
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Could not validate credentials")
         
-        user = await db.users.find_one({"username": username})
+        cached_user = services.user_cache.get(username)
+        if cached_user is not None:
+            return cached_user
+        
+        user = await services.repos.users.get_by_username(username)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         
-        return User(**user)
+        user_obj = User(**user)
+        services.user_cache.set(username, user_obj)
+        return user_obj
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
@@ -165,8 +451,95 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_stream_user(
+    access_token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    services: Services = Depends(get_services)
+):
+    # EventSource cannot set an Authorization header, so streams also accept ?access_token=
+    token = credentials.credentials if credentials else access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await get_current_active_user(await user_from_token(services, token))
+
+def select_fields(model, fields: Optional[str], default=None, required=("id",)) -> list:
+    # `fields` is the comma-separated sparse fieldset from the query string;
+    # the required fields (id and the pagination sort key) are always included
+    if fields is None:
+        selected = list(default if default is not None else model.model_fields)
+    else:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in model.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys([*required, *selected]))
+
+async def list_page(page):
+    # `page` is a repository page() call; paginate=False on it is the explicit
+    # opt-in to the old "everything in one response" behaviour
+    try:
+        return await page
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def with_defaults(model, documents: list, selected: list) -> list:
+    # Documents stored before a field existed lack it; the model would fill in
+    # its default, so the projected rows get the same value
+    optional = [
+        (field, model.model_fields[field]) for field in selected if not model.model_fields[field].is_required()
+    ]
+    for document in documents:
+        for field, info in optional:
+            if field not in document:
+                document[field] = info.get_default(call_default_factory=True)
+    return documents
+
+def page_response(model, documents: list, next_cursor: Optional[str], selected: list, fast: bool):
+    if fast or set(selected) != set(model.model_fields):
+        # Rows were written through the models and projected to the selected
+        # fields, so once defaults are filled in they match the response
+        # schema; returning a Response bypasses FastAPI's response_model
+        # validation (which would also reject a sparse fieldset).
+        return ORJSONResponse({"items": with_defaults(model, documents, selected), "next_cursor": next_cursor})
+    return {"items": [model(**document) for document in documents], "next_cursor": next_cursor}
+
+def detail_response(model, document: dict, selected: list):
+    if set(selected) != set(model.model_fields):
+        return ORJSONResponse(with_defaults(model, [document], selected)[0])
+    return model(**document)
+
+async def check_etag(
+    services: Services, request: Request, current_user: User, scopes: list, project_ids: Optional[frozenset] = None
+) -> str:
+    # Conditional GET: the ETag covers the URL, the caller and the version
+    # stamps of every scope the response depends on (see versions.py), so a
+    # match is answered with 304 before the real query runs.
+    # An employee's project set comes from this worker's membership cache,
+    # which can lag a change made through another worker; the set itself is
+    # part of the tag, so a stale answer is never served under the new stamp
+    # or kept alive by revalidation once the cache entry expires.
+    stamps = await services.repos.versions.read(scopes)
+    members = sorted(project_ids) if project_ids is not None else []
+    key = "|".join([request.url.path, request.url.query, current_user.id, current_user.role.value, *stamps, *members])
+    etag = f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in candidates or etag.removeprefix("W/") in candidates:
+            raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return etag
+
+def with_etag(result, response: Response, etag: str):
+    # Handlers returning a Response bypass the injected `response`, so set it on whichever is sent
+    target = result if isinstance(result, Response) else response
+    target.headers["ETag"] = etag
+    target.headers["Cache-Control"] = "private, no-cache"
+    return result
+
 def require_role(allowed_roles: List[UserRole]):
-    def role_checker(current_user: User = Depends(get_current_active_user)):
+    # async so FastAPI does not send this trivial check through the threadpool
+    async def role_checker(current_user: User = Depends(get_current_active_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=403,
@@ -177,14 +550,13 @@ def require_role(allowed_roles: List[UserRole]):
 
 # Authentication routes
 @api_router.post("/auth/register", response_model=User)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, services: Services = Depends(get_services)):
     # Check if user already exists
-    existing_user = await db.users.find_one({"$or": [{"email": user_data.email}, {"username": user_data.username}]})
-    if existing_user:
+    if await services.repos.users.exists(user_data.username, user_data.email):
         raise HTTPException(status_code=400, detail="User already exists")
     
     # Hash password
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(services, user_data.password)
     
     # Create user
     user_dict = user_data.dict()
@@ -195,21 +567,35 @@ async def register(user_data: UserCreate):
     user_to_store = user_obj.dict()
     user_to_store["password"] = hashed_password
     
-    await db.users.insert_one(user_to_store)
+    try:
+        await services.repos.users.insert(user_to_store)
+    except DuplicateError:
+        # Lost a race with a concurrent registration (unique username/email index)
+        raise HTTPException(status_code=400, detail="User already exists")
+    await services.repos.versions.bump(versions.USERS)
     return user_obj
 
 @api_router.post("/auth/login", response_model=Token)
-async def login(user_credentials: UserLogin):
-    user = await db.users.find_one({"username": user_credentials.username})
-    if not user or not verify_password(user_credentials.password, user["password"]):
+async def login(user_credentials: UserLogin, services: Services = Depends(get_services)):
+    user = await services.repos.users.get_by_username(user_credentials.username, with_password=True)
+    if not user or not await verify_password(services, user_credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    if services.password_hasher.needs_rehash(user["password"]):
+        # Cost factor changed since this hash was made; the login still succeeds if the pool is busy
+        try:
+            new_hash = await services.password_hasher.hash(user_credentials.password)
+            await services.repos.users.set_password(user["id"], new_hash)
+        except PasswordHasherBusy:
+            pass
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user["username"]}, expires_delta=access_token_expires
     )
     
     user_obj = User(**user)
+    services.user_cache.set(user_obj.username, user_obj)
     return {"access_token": access_token, "token_type": "bearer", "user": user_obj}
 
 @api_router.get("/auth/me", response_model=User)
@@ -220,146 +606,468 @@ async def get_current_user_profile(current_user: User = Depends(get_current_acti
 @api_router.post("/projects", response_model=Project)
 async def create_project(
     project_data: ProjectCreate,
-    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER]))
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
 ):
     project_dict = project_data.dict()
     project_dict["created_by"] = current_user.id
+    project_dict["assigned_employees"] = sorted(set(project_dict["assigned_employees"]))
     project_obj = Project(**project_dict)
     
-    await db.projects.insert_one(project_obj.dict())
+    # Members are stored in their own collection, not on the project
+    project_doc = project_obj.dict()
+    assigned = project_doc.pop("assigned_employees")
+    await services.repos.projects.insert(project_doc)
+    await services.repos.members.add(project_obj.id, assigned)
+    await members_changed(services, assigned)
     return project_obj
 
-@api_router.get("/projects", response_model=List[Project])
-async def get_projects(current_user: User = Depends(get_current_active_user)):
+@api_router.get("/projects", response_model=ProjectPage)
+async def get_projects(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    paginate: bool = True,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
     if current_user.role == UserRole.EMPLOYEE:
         # Employees can only see projects they're assigned to
-        projects = await db.projects.find({"assigned_employees": current_user.id}).to_list(1000)
+        project_ids = await accessible_project_ids(services, current_user.id)
     else:
         # Managers and admins can see all projects
-        projects = await db.projects.find().to_list(1000)
+        project_ids = None
+    etag = await check_etag(services, request, current_user, [versions.PROJECTS], project_ids)
+    selected = select_fields(Project, fields, PROJECT_LIST_FIELDS, required=("id", "created_at"))
     
-    return [Project(**project) for project in projects]
+    projects, next_cursor = await list_page(services.repos.projects.page(project_ids, limit, cursor, paginate, selected))
+    await with_members(services, projects, selected)
+    return with_etag(page_response(Project, projects, next_cursor, selected, services.settings.fast_list_serialization), response, etag)
 
 @api_router.get("/projects/{project_id}", response_model=Project)
-async def get_project(project_id: str, current_user: User = Depends(get_current_active_user)):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
+async def get_project(
+    project_id: str,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    selected = select_fields(Project, fields)
+    # Check if employee has access to this project, without fetching the member list
+    if current_user.role == UserRole.EMPLOYEE and project_id not in await accessible_project_ids(services, current_user.id):
+        if await services.repos.projects.exists(project_id):
+            raise HTTPException(status_code=403, detail="Access denied")
         raise HTTPException(status_code=404, detail="Project not found")
     
-    project_obj = Project(**project)
-    
-    # Check if employee has access to this project
-    if current_user.role == UserRole.EMPLOYEE and current_user.id not in project_obj.assigned_employees:
-        raise HTTPException(status_code=403, detail="Access denied")
+    project = await services.repos.projects.get(project_id, selected)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
     
-    return project_obj
+    await with_members(services, [project], selected)
+    return detail_response(Project, project, selected)
 
 @api_router.put("/projects/{project_id}", response_model=Project)
 async def update_project(
     project_id: str,
     project_data: ProjectCreate,
-    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER]))
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
 ):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
     update_data = project_data.dict()
+    assigned = list(dict.fromkeys(update_data.pop("assigned_employees")))
     update_data["updated_at"] = datetime.utcnow()
     
-    await db.projects.update_one({"id": project_id}, {"$set": update_data})
-    
-    updated_project = await db.projects.find_one({"id": project_id})
+    updated_project = await services.repos.projects.update(project_id, update_data)
+    if not updated_project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    # Only the difference to the current members is written
+    current = set((await services.repos.members.members([project_id])).get(project_id, []))
+    added = await services.repos.members.add(project_id, [employee_id for employee_id in assigned if employee_id not in current])
+    removed = await services.repos.members.remove(project_id, current.difference(assigned))
+    services.project_report_cache.invalidate(project_id)
+    await members_changed(services, [*added, *removed])
+    updated_project["assigned_employees"] = sorted(assigned)
     return Project(**updated_project)
 
+@api_router.post("/projects/{project_id}/members", response_model=ProjectMembersAdded)
+async def add_project_members(
+    project_id: str,
+    members_data: ProjectMembersAdd,
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
+):
+    if not await services.repos.projects.exists(project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    added = await services.repos.members.add(project_id, members_data.employee_ids)
+    if added:
+        await members_changed(services, added)
+    newly_added = set(added)
+    already_members = [employee_id for employee_id in dict.fromkeys(members_data.employee_ids) if employee_id not in newly_added]
+    return {"added": added, "already_members": already_members}
+
+@api_router.delete("/projects/{project_id}/members/{employee_id}")
+async def remove_project_member(
+    project_id: str,
+    employee_id: str,
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
+):
+    if not await services.repos.members.remove(project_id, [employee_id]):
+        if not await services.repos.projects.exists(project_id):
+            raise HTTPException(status_code=404, detail="Project not found")
+        raise HTTPException(status_code=404, detail="Employee is not assigned to this project")
+    await members_changed(services, [employee_id])
+    return {"message": "Member removed successfully"}
+
+@api_router.get("/projects/{project_id}/report")
+async def get_project_report(
+    project_id: str,
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
+):
+    report = services.project_report_cache.get(project_id)
+    if report is None:
+        project = await services.repos.projects.get(project_id, ["id", "name", "start_date", "end_date", "budget_hours"])
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        facets = await services.repos.timesheets.project_burn(project_id)
+        report = reports.project_burn_report(project, facets, datetime.utcnow().date())
+        services.project_report_cache.set(project_id, report)
+    return report
+
 @api_router.delete("/projects/{project_id}")
 async def delete_project(
     project_id: str,
-    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER]))
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
 ):
-    result = await db.projects.delete_one({"id": project_id})
-    if result.deleted_count == 0:
+    if not await services.repos.projects.exists(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
-    return {"message": "Project deleted successfully"}
+    # The project's timesheets are deleted in the background; the job is
+    # queued first so a full queue refuses the request before anything changes
+    job = await submit_job(services, "project_timesheets_cascade", {"project_id": project_id}, current_user)
+    if not await services.repos.projects.delete(project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    services.project_report_cache.invalidate(project_id)
+    await members_changed(services, await services.repos.members.remove_project(project_id))
+    return {"message": "Project deleted successfully", "job_id": job.id}
+
+async def cascade_project_timesheets(services: Services, job: jobs.JobContext, project_id: str) -> dict:
+    # Resumable: the project is already gone, so a rerun after an interruption
+    # just deletes whatever of its timesheets is left
+    criteria = {"project_id": project_id}
+    deleted = 0
+    while True:
+        batch, _ = await services.repos.timesheets.page(criteria, CASCADE_BATCH_SIZE, None, True, None)
+        if not batch:
+            break
+        await services.repos.timesheets.delete_many({**criteria, "ids": [timesheet["id"] for timesheet in batch]})
+        # A project's worth of delete events would overrun every subscriber's queue
+        await record_timesheet_changes(services, [(timesheet, None) for timesheet in batch], publish=False)
+        deleted += len(batch)
+        await job.progress(deleted)
+    return {"deleted_timesheets": deleted}
+
+async def record_timesheet_changes(services: Services, changes: list, publish: bool = True):
+    # Every timesheet write reports its (before, after) images here so that
+    # derived state (dashboard counters, cached reports, ETags) stays in step
+    await services.repos.counters.apply_changes(changes)
+    scopes = [versions.TIMESHEETS]
+    for before, after in changes:
+        timesheet = after or before
+        services.project_report_cache.invalidate(timesheet["project_id"])
+        scopes.append(versions.employee_timesheets(timesheet["employee_id"]))
+    await services.repos.versions.bump(*scopes)
+    if not publish:
+        return
+    
+    if len(changes) > 1:
+        # One event per subscriber however many rows changed; clients refetch
+        ids_by_employee = {}
+        for before, after in changes:
+            timesheet = after or before
+            ids_by_employee.setdefault(timesheet["employee_id"], []).append(timesheet["id"])
+        services.event_broker.publish_bulk(ids_by_employee)
+        return
+    
+    for before, after in changes:
+        timesheet = after or before
+        event_type = events.timesheet_event_type(before, after)
+        # Same shape as a GET /timesheets item
+        data = {field: timesheet.get(field) for field in Timesheet.model_fields}
+        services.event_broker.publish(event_type, timesheet["employee_id"], data)
 
 # Timesheet routes
 @api_router.post("/timesheets", response_model=Timesheet)
 async def create_timesheet(
     timesheet_data: TimesheetCreate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
 ):
     # Check if project exists and user has access
-    project = await db.projects.find_one({"id": timesheet_data.project_id})
-    if not project:
+    if not await services.repos.projects.exists(timesheet_data.project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     
-    if current_user.role == UserRole.EMPLOYEE and current_user.id not in project["assigned_employees"]:
+    if current_user.role == UserRole.EMPLOYEE and timesheet_data.project_id not in await accessible_project_ids(services, current_user.id):
         raise HTTPException(status_code=403, detail="You are not assigned to this project")
     
     timesheet_dict = timesheet_data.dict()
     timesheet_dict["employee_id"] = current_user.id
     timesheet_obj = Timesheet(**timesheet_dict)
     
-    await db.timesheets.insert_one(timesheet_obj.dict())
+    timesheet_doc = timesheet_obj.dict()
+    await services.repos.timesheets.insert(timesheet_doc)
+    await record_timesheet_changes(services, [(None, timesheet_doc)])
     return timesheet_obj
 
-@api_router.get("/timesheets", response_model=List[Timesheet])
-async def get_timesheets(
+@api_router.post("/timesheets/bulk", response_model=TimesheetBulkResponse)
+async def bulk_create_timesheets(
+    bulk_data: TimesheetBulkCreate,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    # One existence check per distinct project instead of one per entry
+    project_ids = {entry.project_id for entry in bulk_data.entries}
+    existing = {project["id"] for project in await services.repos.projects.get_many(project_ids, ["id"])}
+    accessible = (
+        await accessible_project_ids(services, current_user.id) if current_user.role == UserRole.EMPLOYEE else None
+    )
+    
+    now = datetime.utcnow()
+    results = []
+    documents = []
+    for index, entry in enumerate(bulk_data.entries):
+        if entry.project_id not in existing:
+            results.append(TimesheetBulkResult(index=index, error="Project not found"))
+            continue
+        if accessible is not None and entry.project_id not in accessible:
+            results.append(TimesheetBulkResult(index=index, error="You are not assigned to this project"))
+            continue
+        
+        timesheet_dict = entry.dict()
+        timesheet_dict["employee_id"] = current_user.id
+        if bulk_data.submit:
+            timesheet_dict["status"] = TimesheetStatus.SUBMITTED
+            timesheet_dict["submitted_at"] = now
+        timesheet_obj = Timesheet(**timesheet_dict)
+        results.append(TimesheetBulkResult(index=index, timesheet=timesheet_obj))
+        documents.append(timesheet_obj.dict())
+    
+    failed = len(bulk_data.entries) - len(documents)
+    if bulk_data.submit and failed:
+        # Atomic submission: report why, but write nothing
+        for result in results:
+            result.timesheet = None
+        return {"created": 0, "failed": failed, "results": results}
+    
+    if documents:
+        await services.repos.timesheets.insert_many(documents)
+        await record_timesheet_changes(services, [(None, document) for document in documents])
+    return {"created": len(documents), "failed": failed, "results": results}
+
+@api_router.post("/timesheets/import", response_model=TimesheetImportResponse)
+async def import_timesheets_csv(
+    request: Request,
+    dry_run: bool = False,
+    current_user: User = Depends(require_role([UserRole.ADMIN])),
+    services: Services = Depends(get_services)
+):
+    # The request body is the CSV file (see imports.py), parsed as it streams in
+    try:
+        return await imports.import_timesheets(
+            services.repos,
+            request.stream(),
+            dry_run=dry_run,
+            on_inserted=lambda documents: record_timesheet_changes(
+                services, [(None, document) for document in documents], publish=False
+            ),
+        )
+    except imports.ImportFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def timesheet_query(
+    current_user: User,
     project_id: Optional[str] = None,
     employee_id: Optional[str] = None,
     status: Optional[TimesheetStatus] = None,
-    current_user: User = Depends(get_current_active_user)
-):
-    query = {}
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> dict:
+    # Repository criteria (see repositories.py); both date bounds are inclusive
+    query = {"project_id": project_id, "status": status, "date_from": date_from, "date_to": date_to}
     
     if current_user.role == UserRole.EMPLOYEE:
         # Employees can only see their own timesheets
         query["employee_id"] = current_user.id
-    elif employee_id:
+    else:
         query["employee_id"] = employee_id
     
-    if project_id:
-        query["project_id"] = project_id
+    return query
+
+@api_router.get("/timesheets", response_model=TimesheetPage)
+async def get_timesheets(
+    request: Request,
+    response: Response,
+    project_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    status: Optional[TimesheetStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    paginate: bool = True,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    if current_user.role == UserRole.EMPLOYEE:
+        etag = await check_etag(services, request, current_user, [versions.employee_timesheets(current_user.id)])
+    else:
+        etag = await check_etag(services, request, current_user, [versions.TIMESHEETS])
+    selected = select_fields(Timesheet, fields, TIMESHEET_LIST_FIELDS, required=("id", "date"))
+    query = timesheet_query(current_user, project_id, employee_id, status, date_from, date_to)
+    timesheets, next_cursor = await list_page(services.repos.timesheets.page(query, limit, cursor, paginate, selected))
+    return with_etag(page_response(Timesheet, timesheets, next_cursor, selected, services.settings.fast_list_serialization), response, etag)
+
+@api_router.get("/timesheets/export")
+async def export_timesheets(
+    format: ExportFormat = ExportFormat.CSV,
+    project_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    status: Optional[TimesheetStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    query = timesheet_query(current_user, project_id, employee_id, status, date_from, date_to)
+    cursor = services.repos.timesheets.scan(query, exports.TIMESHEET_COLUMNS, exports.EXPORT_BATCH_SIZE)
     
-    if status:
-        query["status"] = status
+    if format == ExportFormat.CSV:
+        body, media_type = exports.csv_chunks(cursor), "text/csv"
+    else:
+        body, media_type = exports.ndjson_chunks(cursor), "application/x-ndjson"
     
-    timesheets = await db.timesheets.find(query).to_list(1000)
-    return [Timesheet(**timesheet) for timesheet in timesheets]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="timesheets.{format.value}"'},
+    )
+
+@api_router.post("/timesheets/export/jobs", response_model=Job, status_code=202)
+async def start_timesheet_export(
+    format: ExportFormat = ExportFormat.CSV,
+    project_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    status: Optional[TimesheetStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    # For exports too large to stream in one request: the file is built in
+    # the background and downloaded from /api/jobs/{id}/output
+    query = timesheet_query(current_user, project_id, employee_id, status, date_from, date_to)
+    if query.get("status") is not None:
+        query["status"] = query["status"].value
+    return await submit_job(services, "timesheet_export", {"query": query, "format": format.value}, current_user)
+
+async def export_timesheets_job(services: Services, job: jobs.JobContext, query: dict, format: str) -> dict:
+    rows = 0
+    
+    async def counted(cursor):
+        nonlocal rows
+        async for timesheet in cursor:
+            rows += 1
+            yield timesheet
+    
+    cursor = counted(services.repos.timesheets.scan(query, exports.TIMESHEET_COLUMNS, exports.EXPORT_BATCH_SIZE))
+    if format == ExportFormat.CSV.value:
+        chunks, media_type = exports.csv_chunks(cursor), "text/csv"
+    else:
+        chunks, media_type = exports.ndjson_chunks(cursor), "application/x-ndjson"
+    async for chunk in chunks:
+        await job.write(chunk.encode('utf-8'))
+        await job.progress(rows)
+    return {"rows": rows, "media_type": media_type, "filename": f"timesheets.{format}"}
+
+@api_router.get("/events/timesheets")
+async def stream_timesheet_events(
+    current_user: User = Depends(get_stream_user),
+    services: Services = Depends(get_services)
+):
+    # Server-sent events for timesheet writes, scoped like GET /timesheets:
+    # employees only hear about their own timesheets
+    subscriber = services.event_broker.subscribe(current_user.id if current_user.role == UserRole.EMPLOYEE else None)
+    
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), services.settings.event_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield events.format_sse(event)
+                if event["type"] == events.EVICTED:
+                    return
+        finally:
+            services.event_broker.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @api_router.get("/timesheets/{timesheet_id}", response_model=Timesheet)
-async def get_timesheet(timesheet_id: str, current_user: User = Depends(get_current_active_user)):
-    timesheet = await db.timesheets.find_one({"id": timesheet_id})
+async def get_timesheet(
+    timesheet_id: str,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    selected = select_fields(Timesheet, fields)
+    query = {"id": timesheet_id}
+    if current_user.role == UserRole.EMPLOYEE:
+        # Check access permissions
+        query["employee_id"] = current_user.id
+    
+    timesheet = await services.repos.timesheets.find_one(query, selected)
     if not timesheet:
+        if current_user.role == UserRole.EMPLOYEE and await services.repos.timesheets.exists(timesheet_id):
+            raise HTTPException(status_code=403, detail="Access denied")
         raise HTTPException(status_code=404, detail="Timesheet not found")
     
-    timesheet_obj = Timesheet(**timesheet)
-    
-    # Check access permissions
-    if current_user.role == UserRole.EMPLOYEE and timesheet_obj.employee_id != current_user.id:
+    return detail_response(Timesheet, timesheet, selected)
+
+def employee_write_guard(current_user: User) -> dict:
+    # Employees may only change their own timesheets, and only until they are approved/rejected
+    if current_user.role != UserRole.EMPLOYEE:
+        return {}
+    return {
+        "employee_id": current_user.id,
+        "status_not_in": [TimesheetStatus.APPROVED, TimesheetStatus.REJECTED],
+    }
+
+async def raise_timesheet_write_error(services: Services, timesheet_id: str, current_user: User, action: str):
+    # Only reached when a guarded write matched nothing; work out why
+    timesheet = await services.repos.timesheets.find_one({"id": timesheet_id}, ["employee_id", "status"])
+    if not timesheet:
+        raise HTTPException(status_code=404, detail="Timesheet not found")
+    if current_user.role == UserRole.EMPLOYEE and timesheet["employee_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
-    
-    return timesheet_obj
+    raise HTTPException(status_code=400, detail=f"Cannot {action} approved/rejected timesheets")
 
 @api_router.put("/timesheets/{timesheet_id}", response_model=Timesheet)
 async def update_timesheet(
     timesheet_id: str,
     timesheet_data: TimesheetUpdate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
 ):
-    timesheet = await db.timesheets.find_one({"id": timesheet_id})
-    if not timesheet:
-        raise HTTPException(status_code=404, detail="Timesheet not found")
-    
-    timesheet_obj = Timesheet(**timesheet)
-    
-    # Check permissions
-    if current_user.role == UserRole.EMPLOYEE:
-        if timesheet_obj.employee_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Access denied")
-        if timesheet_obj.status in [TimesheetStatus.APPROVED, TimesheetStatus.REJECTED]:
-            raise HTTPException(status_code=400, detail="Cannot edit approved/rejected timesheets")
-    
     update_data = {k: v for k, v in timesheet_data.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
@@ -368,125 +1076,359 @@ async def update_timesheet(
         if update_data["status"] == TimesheetStatus.SUBMITTED:
             update_data["submitted_at"] = datetime.utcnow()
     
-    await db.timesheets.update_one({"id": timesheet_id}, {"$set": update_data})
+    # Permission checks live in the filter, so they hold at the moment of the write
+    query = {"id": timesheet_id, **employee_write_guard(current_user)}
+    timesheet = await services.repos.timesheets.update(query, update_data)
+    if not timesheet:
+        await raise_timesheet_write_error(services, timesheet_id, current_user, "edit")
     
-    updated_timesheet = await db.timesheets.find_one({"id": timesheet_id})
+    # Post-image: the pre-image with the $set applied
+    updated_timesheet = {**timesheet, **update_data}
+    await record_timesheet_changes(services, [(timesheet, updated_timesheet)])
     return Timesheet(**updated_timesheet)
 
-@api_router.post("/timesheets/{timesheet_id}/approve", response_model=Timesheet)
-async def approve_reject_timesheet(
-    timesheet_id: str,
-    approval_data: TimesheetApproval,
-    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER]))
-):
-    timesheet = await db.timesheets.find_one({"id": timesheet_id})
-    if not timesheet:
-        raise HTTPException(status_code=404, detail="Timesheet not found")
-    
+def approval_update(approval_data: TimesheetApproval, current_user: User) -> dict:
     if approval_data.status not in [TimesheetStatus.APPROVED, TimesheetStatus.REJECTED]:
         raise HTTPException(status_code=400, detail="Invalid status for approval")
     
+    now = datetime.utcnow()
     update_data = {
         "status": approval_data.status,
-        "updated_at": datetime.utcnow()
+        "updated_at": now
     }
     
     if approval_data.status == TimesheetStatus.APPROVED:
-        update_data["approved_at"] = datetime.utcnow()
+        update_data["approved_at"] = now
         update_data["approved_by"] = current_user.id
     else:
-        update_data["rejected_at"] = datetime.utcnow()
+        update_data["rejected_at"] = now
         update_data["rejected_by"] = current_user.id
         update_data["rejection_reason"] = approval_data.rejection_reason
     
-    await db.timesheets.update_one({"id": timesheet_id}, {"$set": update_data})
+    return update_data
+
+@api_router.post("/timesheets/bulk/approve", response_model=TimesheetBulkApprovalResponse)
+async def bulk_approve_reject_timesheets(
+    approval_data: TimesheetBulkApproval,
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
+):
+    update_data = approval_update(approval_data, current_user)
+    
+    query = {
+        "ids": approval_data.ids,
+        "project_id": approval_data.project_id,
+        "employee_id": approval_data.employee_id,
+        "date_from": approval_data.date_from,
+        "date_to": approval_data.date_to,
+    }
+    if all(value is None for value in query.values()):
+        raise HTTPException(status_code=400, detail="Provide timesheet ids or at least one filter")
+    
+    # The status guard in the criteria makes the transition conditional: rows
+    # approved/rejected/edited since the manager loaded them are left alone.
+    # Filter mode is capped like the ids list, which bounds the $in of ids the
+    # repository writes and reads back with
+    query["status"] = TimesheetStatus.SUBMITTED
+    changed = await services.repos.timesheets.update_many(query, update_data, limit=MAX_BULK_APPROVAL_IDS)
+    await record_timesheet_changes(services, [
+        ({**timesheet, "status": TimesheetStatus.SUBMITTED}, timesheet)
+        for timesheet in changed
+    ])
+    
+    changed_ids = {timesheet["id"] for timesheet in changed}
+    skipped_ids = [timesheet_id for timesheet_id in approval_data.ids or [] if timesheet_id not in changed_ids]
+    # Rows this call finalized no longer match the status guard
+    truncated = (
+        len(changed) == MAX_BULK_APPROVAL_IDS and await services.repos.timesheets.find_one(query, ["id"]) is not None
+    )
+    return {"updated": len(changed_ids), "skipped": len(skipped_ids), "skipped_ids": skipped_ids, "truncated": truncated}
+
+@api_router.post("/timesheets/{timesheet_id}/approve", response_model=Timesheet)
+async def approve_reject_timesheet(
+    timesheet_id: str,
+    approval_data: TimesheetApproval,
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
+):
+    update_data = approval_update(approval_data, current_user)
+    
+    # Only a timesheet that is not yet approved/rejected can transition, so
+    # two managers acting at once cannot both finalize it
+    timesheet = await services.repos.timesheets.update(
+        {"id": timesheet_id, "status_not_in": [TimesheetStatus.APPROVED, TimesheetStatus.REJECTED]},
+        update_data,
+    )
+    if not timesheet:
+        if await services.repos.timesheets.exists(timesheet_id):
+            raise HTTPException(status_code=409, detail="Timesheet has already been approved/rejected")
+        raise HTTPException(status_code=404, detail="Timesheet not found")
     
-    updated_timesheet = await db.timesheets.find_one({"id": timesheet_id})
+    updated_timesheet = {**timesheet, **update_data}
+    await record_timesheet_changes(services, [(timesheet, updated_timesheet)])
     return Timesheet(**updated_timesheet)
 
 @api_router.delete("/timesheets/{timesheet_id}")
 async def delete_timesheet(
     timesheet_id: str,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
 ):
-    timesheet = await db.timesheets.find_one({"id": timesheet_id})
+    timesheet = await services.repos.timesheets.delete({"id": timesheet_id, **employee_write_guard(current_user)})
     if not timesheet:
-        raise HTTPException(status_code=404, detail="Timesheet not found")
+        await raise_timesheet_write_error(services, timesheet_id, current_user, "delete")
     
-    timesheet_obj = Timesheet(**timesheet)
-    
-    # Check permissions
-    if current_user.role == UserRole.EMPLOYEE:
-        if timesheet_obj.employee_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Access denied")
-        if timesheet_obj.status in [TimesheetStatus.APPROVED, TimesheetStatus.REJECTED]:
-            raise HTTPException(status_code=400, detail="Cannot delete approved/rejected timesheets")
-    
-    await db.timesheets.delete_one({"id": timesheet_id})
+    await record_timesheet_changes(services, [(timesheet, None)])
     return {"message": "Timesheet deleted successfully"}
 
 # Dashboard routes
 @api_router.get("/dashboard/summary")
-async def get_dashboard_summary(current_user: User = Depends(get_current_active_user)):
+async def get_dashboard_summary(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
     if current_user.role == UserRole.EMPLOYEE:
         # Employee dashboard - their own stats
-        timesheets = await db.timesheets.find({"employee_id": current_user.id}).to_list(1000)
-        projects = await db.projects.find({"assigned_employees": current_user.id}).to_list(1000)
-        
-        total_hours = sum(ts["hours"] for ts in timesheets)
-        approved_hours = sum(ts["hours"] for ts in timesheets if ts["status"] == TimesheetStatus.APPROVED)
-        pending_hours = sum(ts["hours"] for ts in timesheets if ts["status"] == TimesheetStatus.SUBMITTED)
+        project_ids = await accessible_project_ids(services, current_user.id)
+        etag = await check_etag(
+            services, request, current_user, [versions.employee_timesheets(current_user.id), versions.PROJECTS], project_ids
+        )
+        totals = await services.repos.counters.read(counters.employee_key(current_user.id))
         
-        return {
-            "total_hours": total_hours,
-            "approved_hours": approved_hours,
-            "pending_hours": pending_hours,
-            "total_projects": len(projects),
-            "total_timesheets": len(timesheets)
-        }
+        return with_etag({
+            "total_hours": totals["total_hours"],
+            "approved_hours": totals["approved_hours"],
+            "pending_hours": totals["pending_hours"],
+            "total_projects": len(project_ids),
+            "total_timesheets": totals["total_timesheets"]
+        }, response, etag)
     else:
         # Manager/Admin dashboard - all stats
-        timesheets = await db.timesheets.find().to_list(1000)
-        projects = await db.projects.find().to_list(1000)
-        users = await db.users.find({"role": UserRole.EMPLOYEE}).to_list(1000)
+        etag = await check_etag(services, request, current_user, [versions.TIMESHEETS, versions.PROJECTS, versions.USERS])
+        totals, total_projects, total_employees = await asyncio.gather(
+            services.repos.counters.read(counters.GLOBAL_KEY),
+            services.repos.projects.count(),
+            services.repos.users.count(role=UserRole.EMPLOYEE),
+        )
         
-        total_hours = sum(ts["hours"] for ts in timesheets)
-        approved_hours = sum(ts["hours"] for ts in timesheets if ts["status"] == TimesheetStatus.APPROVED)
-        pending_approvals = len([ts for ts in timesheets if ts["status"] == TimesheetStatus.SUBMITTED])
-        
-        return {
-            "total_hours": total_hours,
-            "approved_hours": approved_hours,
-            "pending_approvals": pending_approvals,
-            "total_projects": len(projects),
-            "total_employees": len(users),
-            "total_timesheets": len(timesheets)
-        }
+        return with_etag({
+            "total_hours": totals["total_hours"],
+            "approved_hours": totals["approved_hours"],
+            "pending_approvals": totals["pending_timesheets"],
+            "total_projects": total_projects,
+            "total_employees": total_employees,
+            "total_timesheets": totals["total_timesheets"]
+        }, response, etag)
+
+# Report routes
+@api_router.get("/reports/hours")
+async def get_hours_rollup(
+    period: ReportPeriod = ReportPeriod.WEEK,
+    group_by: str = "employee,project",
+    project_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    status: Optional[TimesheetStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    dimensions = [dimension.strip() for dimension in group_by.split(",") if dimension.strip()]
+    unknown = [dimension for dimension in dimensions if dimension not in reports.GROUP_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot group by: {', '.join(unknown)}")
+    
+    # Same role scoping as get_timesheets
+    query = timesheet_query(current_user, project_id, employee_id, status, date_from, date_to)
+    rows = await services.repos.timesheets.hours_rollup(query, period.value, dimensions)
+    return ORJSONResponse({
+        "period": period.value,
+        "group_by": dimensions,
+        "rows": rows,
+    })
 
 # Users management (for admins)
-@api_router.get("/users", response_model=List[User])
-async def get_users(current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER]))):
-    users = await db.users.find().to_list(1000)
-    return [User(**user) for user in users]
-
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+@api_router.get("/users", response_model=UserPage)
+async def get_users(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    paginate: bool = True,
+    fields: Optional[str] = None,
+    current_user: User = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER])),
+    services: Services = Depends(get_services)
+):
+    etag = await check_etag(services, request, current_user, [versions.USERS])
+    selected = select_fields(User, fields, required=("id", "created_at"))
+    users, next_cursor = await list_page(services.repos.users.page(limit, cursor, paginate, selected))
+    return with_etag(page_response(User, users, next_cursor, selected, services.settings.fast_list_serialization), response, etag)
+
+@api_router.put("/users/{user_id}", response_model=User)
+async def update_user(
+    user_id: str,
+    user_data: UserUpdate,
+    current_user: User = Depends(require_role([UserRole.ADMIN])),
+    services: Services = Depends(get_services)
+):
+    update_data = {k: v for k, v in user_data.dict().items() if v is not None}
+    if not update_data:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    update_data["updated_at"] = datetime.utcnow()
+    
+    user = await services.repos.users.update(user_id, update_data)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Role / is_active changes must take effect on the next request
+    services.user_cache.invalidate(user["username"])
+    await services.repos.versions.bump(versions.USERS)
+    return User(**user)
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(
+    current_user: User = Depends(require_role([UserRole.ADMIN])),
+    services: Services = Depends(get_services)
+):
+    return {
+        "users": services.user_cache.stats(),
+        "memberships": services.membership_cache.stats(),
+        "project_reports": services.project_report_cache.stats(),
+    }
+
+@api_router.get("/admin/event-stats")
+async def get_event_stats(
+    current_user: User = Depends(require_role([UserRole.ADMIN])),
+    services: Services = Depends(get_services)
+):
+    return services.event_broker.stats()
+
+@api_router.post("/admin/counters/rebuild", response_model=Job, status_code=202)
+async def start_counter_rebuild(
+    dry_run: bool = True,
+    current_user: User = Depends(require_role([UserRole.ADMIN])),
+    services: Services = Depends(get_services)
+):
+    # Only the drift report runs online: a repair replaces every counter with
+    # values aggregated minutes earlier, losing the increments of live writes
+    # made in between, so it is done offline with `python counters.py`
+    if not dry_run:
+        raise HTTPException(
+            status_code=400,
+            detail="Counters are only repaired offline (python counters.py, with writes stopped); use dry_run=true",
+        )
+    return await submit_job(services, "counter_rebuild", {"dry_run": True}, current_user)
+
+async def rebuild_counters_job(services: Services, job: jobs.JobContext, dry_run: bool) -> dict:
+    drift = await services.repos.counters.rebuild(dry_run=dry_run)
+    # (key, field, stored, actual) for the first few values that were off
+    return {"dry_run": dry_run, "drifted": len(drift), "sample": [list(entry) for entry in drift[:100]]}
+
+# Job routes
+async def visible_job(services: Services, job_id: str, current_user: User) -> dict:
+    job = await services.repos.jobs.get(job_id)
+    # Other users' jobs are reported as missing rather than forbidden
+    if not job or (current_user.role != UserRole.ADMIN and job["created_by"] != current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    return Job(**await visible_job(services, job_id, current_user))
+
+@api_router.get("/jobs/{job_id}/output")
+async def get_job_output(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    services: Services = Depends(get_services)
+):
+    job = await visible_job(services, job_id, current_user)
+    result = job["result"] or {}
+    if job["status"] != jobs.SUCCEEDED or "media_type" not in result:
+        raise HTTPException(status_code=409, detail="Job has no output (yet)")
+    return StreamingResponse(
+        services.repos.jobs.read_output(job_id),
+        media_type=result["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{result["filename"]}"'},
+    )
+
+async def get_metrics(services: Services = Depends(get_services)):
+    return Response(services.metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# Health probes
+@health_router.get("/healthz", include_in_schema=False)
+async def liveness():
+    # The process is up and its event loop is turning; nothing else is checked,
+    # so a database outage does not get healthy workers restarted
+    return {"status": "ok"}
+
+@health_router.get("/readyz", include_in_schema=False)
+async def readiness(services: Services = Depends(get_services)):
+    # Ready once the lifespan has opened and warmed the storage, and for as
+    # long as it answers; load balancers stop routing here otherwise
+    if not services.ready:
+        raise HTTPException(status_code=503, detail="Not ready")
+    try:
+        await asyncio.wait_for(services.repos.ping(), services.settings.readiness_timeout_seconds)
+    except Exception as exc:
+        logger.warning("Readiness check failed: %r", exc)
+        raise HTTPException(status_code=503, detail="Storage unavailable")
+    return {"status": "ready"}
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """A new app instance; ``settings`` default to ``Settings.from_env()``.
+
+    Nothing is opened until the app's lifespan starts (the storage, connection
+    warm-up, the bcrypt pool), so several apps can coexist in one process.
+    """
+    settings = settings or Settings.from_env()
+    services = Services(settings)
+    
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        try:
+            await services.open()
+            yield
+        finally:
+            await services.close()
+    
+    app = FastAPI(lifespan=lifespan)
+    app.state.services = services
+    app.include_router(api_router)
+    app.include_router(health_router)
+    if settings.metrics_enabled:
+        app.add_api_route("/metrics", get_metrics, include_in_schema=False)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Added last so it is the outermost middleware and times everything
+    if settings.metrics_enabled:
+        app.add_middleware(metrics.MetricsMiddleware, http_metrics=metrics.HTTPMetrics(services.metrics))
+    return app
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+def __getattr__(name: str):
+    # `uvicorn server:app` still works: the app is built from the environment
+    # on first access rather than at import
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
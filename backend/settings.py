@@ -0,0 +1,119 @@
+"""Application settings.
+
+``Settings.from_env()`` reads each field from the environment variable of
+the same name in upper case (``BCRYPT_ROUNDS``, ``MONGO_MAX_POOL_SIZE``, ...),
+falling back to backend/.env and then to the defaults below. Tests and tools
+can build ``Settings(...)`` directly and pass it to ``server.create_app``.
+"""
+import os
+from pathlib import Path
+from typing import Optional
+
+from dotenv import dotenv_values
+from pydantic import BaseModel, Field, model_validator
+
+from repositories import BACKENDS
+
+ENV_FILE = Path(__file__).parent / '.env'
+
+
+class Settings(BaseModel):
+    # Storage: "mongo" (MONGO_URL / DB_NAME) or "memory" for runs without a
+    # database (see repositories.py)
+    storage_backend: str = "mongo"
+    mongo_url: Optional[str] = None
+    db_name: Optional[str] = None
+
+    # MongoDB client. The lifespan opens mongo_min_pool_size connections
+    # before the app reports ready, so the first requests do not pay for the
+    # TCP/TLS/auth handshakes. The connect and server selection timeouts are
+    # shorter than the driver's (20s / 30s) so an unreachable database fails
+    # startup and /readyz quickly; unset ones keep the driver defaults.
+    mongo_max_pool_size: int = Field(100, ge=1)
+    mongo_min_pool_size: int = Field(10, ge=0)
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_connect_timeout_ms: int = 5000
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    # Comma-separated wire compressors in order of preference, e.g.
+    # "zstd,snappy,zlib" (zstd and snappy need their Python packages)
+    mongo_compressors: str = ""
+
+    # /readyz fails when a storage ping takes longer than this
+    readiness_timeout_seconds: float = 2.0
+
+    # Password hashing runs on a bounded thread pool (see passwords.py).
+    # Changing bcrypt_rounds rehashes each user's password on their next login.
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = Field(default_factory=lambda: min(4, os.cpu_count() or 1))
+    password_hash_max_queue: int = 64
+
+    # Authenticated users are cached per token subject. The TTL bounds how long a
+    # role / is_active change made outside this process (another worker, a direct
+    # database edit) can go unnoticed; changes through the API invalidate at once.
+    user_cache_ttl_seconds: float = 30.0
+    user_cache_max_size: int = 10000
+
+    # The ids of the projects each user is assigned to, for access checks. As
+    # with users, the TTL bounds how long a membership change made by another
+    # worker goes unnoticed here.
+    membership_cache_ttl_seconds: float = 30.0
+    membership_cache_max_size: int = 10000
+
+    # Project budget reports are cached per project and dropped whenever one of
+    # the project's timesheets changes; the TTL only covers writes made by other
+    # workers.
+    project_report_cache_max_size: int = 1000
+    project_report_cache_ttl_seconds: float = 300.0
+
+    # List endpoints encode projected database rows straight to JSON with orjson
+    # instead of building a Pydantic model per row and validating it again
+    # against response_model. Set FAST_LIST_SERIALIZATION=0 to go through the
+    # models (e.g. when debugging a contract difference).
+    fast_list_serialization: bool = True
+
+    # Timesheet events are pushed to /api/events/timesheets subscribers (see
+    # events.py). A subscriber more than event_queue_size events behind is
+    # dropped; idle streams get a comment line every event_keepalive_seconds so
+    # proxies keep them open and dead connections are noticed.
+    event_queue_size: int = 100
+    event_keepalive_seconds: float = 15.0
+
+    # Background jobs (see jobs.py): this many run at once per process, with
+    # up to job_max_queue more waiting before new ones are refused with 503
+    job_workers: int = Field(2, ge=1)
+    job_max_queue: int = 100
+
+    # Prometheus metrics at /metrics (see metrics.py). METRICS_ENABLED=0
+    # removes the middleware, the driver listeners and the route.
+    metrics_enabled: bool = True
+
+    @model_validator(mode="after")
+    def check_storage(self) -> "Settings":
+        if self.storage_backend not in BACKENDS:
+            raise ValueError(f"storage_backend must be one of: {', '.join(BACKENDS)}")
+        if self.storage_backend == "mongo" and not (self.mongo_url and self.db_name):
+            raise ValueError("MONGO_URL and DB_NAME are required for the mongo storage backend")
+        return self
+
+    @classmethod
+    def from_env(cls, env_file: Optional[Path] = ENV_FILE, **overrides) -> "Settings":
+        # The environment wins over the .env file, which is only read, never
+        # loaded into os.environ; keyword overrides win over both
+        environ = {**(dotenv_values(env_file) if env_file else {}), **os.environ}
+        values = {name: environ[name.upper()] for name in cls.model_fields if name.upper() in environ}
+        return cls(**{**values, **overrides})
+
+    def mongo_client_options(self) -> dict:
+        options = {
+            "maxPoolSize": self.mongo_max_pool_size,
+            "minPoolSize": self.mongo_min_pool_size,
+            "maxIdleTimeMS": self.mongo_max_idle_time_ms,
+            "connectTimeoutMS": self.mongo_connect_timeout_ms,
+            "serverSelectionTimeoutMS": self.mongo_server_selection_timeout_ms,
+            "socketTimeoutMS": self.mongo_socket_timeout_ms,
+            "waitQueueTimeoutMS": self.mongo_wait_queue_timeout_ms,
+            "compressors": self.mongo_compressors or None,
+        }
+        return {name: value for name, value in options.items() if value is not None}
@@ -0,0 +1,49 @@
+"""Version stamps for conditional GETs.
+
+Each scope ("timesheets", "timesheets:employee:<id>", "projects", "users")
+has a document in the ``versions`` collection whose ``v`` is replaced with a
+fresh random token whenever data in that scope changes. Read endpoints derive
+their ETag from the stamps of the scopes they depend on, so answering
+``If-None-Match`` costs one ``_id`` lookup instead of the real query. Random
+tokens (rather than counters) cannot repeat after the collection is reset,
+and every ETag also covers an "epoch" stamp created once per database, so a
+scope that was never bumped cannot collide across a database reset either.
+"""
+import uuid
+
+from pymongo import UpdateOne
+
+COLLECTION = "versions"
+EPOCH = "epoch"
+TIMESHEETS = "timesheets"
+PROJECTS = "projects"
+USERS = "users"
+
+
+def employee_timesheets(employee_id: str) -> str:
+    return f"timesheets:employee:{employee_id}"
+
+
+async def bump(db, *scopes: str) -> None:
+    if not scopes:
+        return
+    await db[COLLECTION].bulk_write(
+        [UpdateOne({"_id": scope}, {"$set": {"v": uuid.uuid4().hex}}, upsert=True) for scope in set(scopes)],
+        ordered=False,
+    )
+
+
+async def ensure_epoch(db) -> None:
+    await db[COLLECTION].update_one({"_id": EPOCH}, {"$setOnInsert": {"v": uuid.uuid4().hex}}, upsert=True)
+
+
+async def new_epoch(db) -> None:
+    """Invalidate every ETag at once, e.g. after data was repaired behind the API's back."""
+    await db[COLLECTION].update_one({"_id": EPOCH}, {"$set": {"v": uuid.uuid4().hex}}, upsert=True)
+
+
+async def read(db, scopes) -> list:
+    """The epoch stamp followed by the stamps of ``scopes`` ("0" if never bumped)."""
+    scopes = [EPOCH, *scopes]
+    stamps = {doc["_id"]: doc["v"] async for doc in db[COLLECTION].find({"_id": {"$in": scopes}})}
+    return [stamps.get(scope, "0") for scope in scopes]
@@ -158,7 +158,7 @@ class TimesheetBackendTester:
             response = self.session.get(f"{self.base_url}/projects", headers=headers)
             
             if response.status_code == 200:
-                projects = response.json()
+                projects = response.json()["items"]
                 if len(projects) > 0 and projects[0]["id"] == self.projects["main_project"]["id"]:
                     self.log("✅ Employee can access assigned project")
                 else:
@@ -177,7 +177,7 @@ class TimesheetBackendTester:
             response = self.session.get(f"{self.base_url}/projects", headers=headers)
             
             if response.status_code == 200:
-                projects = response.json()
+                projects = response.json()["items"]
                 if len(projects) > 0:
                     self.log("✅ Admin can access all projects")
                 else:
@@ -254,7 +254,7 @@ class TimesheetBackendTester:
             response = self.session.get(f"{self.base_url}/timesheets", headers=headers)
             
             if response.status_code == 200:
-                timesheets = response.json()
+                timesheets = response.json()["items"]
                 employee_id = self.users["employee"]["user_info"]["id"]
                 all_employee_timesheets = all(ts["employee_id"] == employee_id for ts in timesheets)
                 
@@ -404,7 +404,7 @@ class TimesheetBackendTester:
             response = self.session.get(f"{self.base_url}/timesheets?employee_id={manager_id}", headers=headers)
             
             if response.status_code == 200:
-                timesheets = response.json()
+                timesheets = response.json()["items"]
                 employee_id = self.users["employee"]["user_info"]["id"]
                 # Should only return employee's own timesheets, not manager's
                 all_employee_timesheets = all(ts["employee_id"] == employee_id for ts in timesheets)
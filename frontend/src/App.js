@@ -254,18 +254,58 @@ const Dashboard = () => {
   );
 };
 
+// List endpoints return one keyset page at a time (items + next_cursor);
+// further pages are fetched when asked for and appended to what is shown
+const appendPage = (current, items) => {
+  const shown = new Set(current.map((item) => item.id));
+  return [...current, ...items.filter((item) => !shown.has(item.id))];
+};
+
+const LoadMore = ({ cursor, onLoad }) => {
+  const [loading, setLoading] = useState(false);
+
+  if (!cursor) {
+    return null;
+  }
+
+  const load = async () => {
+    setLoading(true);
+    try {
+      await onLoad(cursor);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  return (
+    <div className="px-4 py-4 sm:px-6 text-center">
+      <button
+        onClick={load}
+        disabled={loading}
+        className="text-indigo-600 hover:text-indigo-900 text-sm font-medium disabled:opacity-50"
+      >
+        {loading ? 'Loading...' : 'Load more'}
+      </button>
+    </div>
+  );
+};
+
 const ProjectsList = () => {
   const [projects, setProjects] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     fetchProjects();
   }, []);
 
-  const fetchProjects = async () => {
+  const fetchProjects = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API}/projects`);
-      setProjects(response.data);
+      const response = await axios.get(`${API}/projects`, {
+        params: { fields: 'id,name,description,status,assigned_employees', cursor: cursor || undefined }
+      });
+      setProjects((current) => (cursor ? appendPage(current, response.data.items) : response.data.items));
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching projects:', error);
     } finally {
@@ -317,6 +357,7 @@ const ProjectsList = () => {
             </li>
           ))}
         </ul>
+        <LoadMore cursor={nextCursor} onLoad={fetchProjects} />
       </div>
     </div>
   );
@@ -324,17 +365,41 @@ const ProjectsList = () => {
 
 const TimesheetsList = () => {
   const [timesheets, setTimesheets] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const { user } = useAuth();
 
   useEffect(() => {
     fetchTimesheets();
+
+    // Live updates instead of polling. The browser reconnects on its own when
+    // the stream ends (including when the server evicts a client that fell
+    // behind), and every (re)connect refetches so no missed change is lost
+    const token = localStorage.getItem('token');
+    const source = new EventSource(`${API}/events/timesheets?access_token=${encodeURIComponent(token)}`);
+    const applyEvent = (event) => {
+      const timesheet = JSON.parse(event.data);
+      setTimesheets((current) => {
+        const others = current.filter((item) => item.id !== timesheet.id);
+        return event.type === 'deleted' ? others : [timesheet, ...others].sort((a, b) => (a.date < b.date ? 1 : -1));
+      });
+    };
+    ['created', 'updated', 'submitted', 'approved', 'rejected', 'deleted'].forEach((type) => {
+      source.addEventListener(type, applyEvent);
+    });
+    // A bulk write arrives as one hint listing the changed ids
+    source.addEventListener('bulk', () => fetchTimesheets());
+    source.onopen = () => fetchTimesheets();
+    return () => source.close();
   }, []);
 
-  const fetchTimesheets = async () => {
+  const fetchTimesheets = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API}/timesheets`);
-      setTimesheets(response.data);
+      const response = await axios.get(`${API}/timesheets`, {
+        params: { fields: 'id,date,hours,status,project_id,description', cursor: cursor || undefined }
+      });
+      setTimesheets((current) => (cursor ? appendPage(current, response.data.items) : response.data.items));
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching timesheets:', error);
     } finally {
@@ -348,7 +413,6 @@ const TimesheetsList = () => {
         status,
         rejection_reason: rejectionReason
       });
-      fetchTimesheets(); // Refresh the list
     } catch (error) {
       console.error('Error updating timesheet:', error);
     }
@@ -409,6 +473,7 @@ const TimesheetsList = () => {
             </li>
           ))}
         </ul>
+        <LoadMore cursor={nextCursor} onLoad={fetchTimesheets} />
       </div>
     </div>
   );
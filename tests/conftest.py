@@ -0,0 +1,39 @@
+"""Shared fixtures: the app on the in-memory storage backend, no services needed.
+
+The backend's modules import each other flat (``import server``), as when
+run from ``backend/``, so that directory goes on the path.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from tests.support import ROLES, make_client, register  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    with make_client() as client:
+        yield client
+
+
+@pytest.fixture
+def users(client) -> dict:
+    return {role: register(client, role) for role in ROLES}
+
+
+@pytest.fixture
+def repos(client):
+    return client.app.state.services.repos
+
+
+@pytest.fixture
+def project(client, users) -> dict:
+    response = client.post("/api/projects", headers=users["manager"]["headers"], json={
+        "name": "Apollo", "description": "Moon", "start_date": "2024-01-01T00:00:00",
+        "assigned_employees": [users["employee"]["id"]], "budget_hours": 100,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
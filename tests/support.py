@@ -0,0 +1,25 @@
+"""Helpers for building apps and users in tests (fixtures are in conftest.py)."""
+from fastapi.testclient import TestClient
+
+import server
+from settings import Settings
+
+ROLES = ("admin", "manager", "employee")
+
+
+def make_client(**overrides) -> TestClient:
+    settings = {"storage_backend": "memory", "mongo_min_pool_size": 0, "bcrypt_rounds": 4, **overrides}
+    return TestClient(server.create_app(Settings(**settings)))
+
+
+def register(client: TestClient, role: str, username: str = None) -> dict:
+    """Register and log in a user; returns ``{"headers", "id"}``."""
+    username = username or role
+    response = client.post("/api/auth/register", json={
+        "email": f"{username}@example.com", "username": username, "full_name": username.title(),
+        "password": "secret", "role": role,
+    })
+    assert response.status_code == 200, response.text
+    response = client.post("/api/auth/login", json={"username": username, "password": "secret"})
+    body = response.json()
+    return {"headers": {"Authorization": f"Bearer {body['access_token']}"}, "id": body["user"]["id"]}
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import server
+from settings import Settings
+from tests.support import make_client, register
+
+
+def test_probes_follow_the_lifespan():
+    app = server.create_app(Settings(storage_backend="memory", mongo_min_pool_size=0))
+    # Without the lifespan (no `with`), nothing has been opened
+    unstarted = TestClient(app)
+    assert unstarted.get("/healthz").json() == {"status": "ok"}
+    assert unstarted.get("/readyz").status_code == 503
+
+    with TestClient(app) as client:
+        assert client.get("/readyz").json() == {"status": "ready"}
+    assert app.state.services.ready is False
+
+
+def test_readiness_fails_when_the_storage_does_not_answer(client):
+    repos = client.app.state.services.repos
+
+    async def broken():
+        raise ConnectionError("down")
+
+    async def slow():
+        await asyncio.sleep(5)
+
+    client.app.state.services.settings.readiness_timeout_seconds = 0.05
+    for ping in (broken, slow):
+        repos.ping = ping
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Storage unavailable"
+        # Liveness does not depend on the storage
+        assert client.get("/healthz").status_code == 200
+
+
+def test_apps_in_one_process_do_not_share_state():
+    with make_client() as first, make_client() as second:
+        register(first, "admin")
+        assert second.post("/api/auth/login", json={"username": "admin", "password": "secret"}).status_code == 401
+        assert first.app.state.services.repos is not second.app.state.services.repos
+
+
+def test_settings_sources_in_order(tmp_path, monkeypatch):
+    env_file = tmp_path / ".env"
+    env_file.write_text("MONGO_URL=mongodb://from-file\nDB_NAME=file\nBCRYPT_ROUNDS=10\nMONGO_MAX_POOL_SIZE=20\n")
+    monkeypatch.setenv("DB_NAME", "environ")
+    monkeypatch.setenv("BCRYPT_ROUNDS", "11")
+    settings = Settings.from_env(env_file, bcrypt_rounds=9)
+    assert (settings.mongo_url, settings.db_name, settings.bcrypt_rounds) == ("mongodb://from-file", "environ", 9)
+    assert settings.mongo_client_options() == {
+        "maxPoolSize": 20, "minPoolSize": 10, "connectTimeoutMS": 5000, "serverSelectionTimeoutMS": 5000,
+    }
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,zlib")
+    assert Settings.from_env(env_file).mongo_client_options()["compressors"] == "zstd,zlib"
+
+
+def test_settings_are_validated(monkeypatch):
+    for name in ("MONGO_URL", "DB_NAME", "STORAGE_BACKEND"):
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(ValidationError, match="MONGO_URL and DB_NAME"):
+        Settings.from_env(None)
+    with pytest.raises(ValidationError, match="storage_backend must be one of"):
+        Settings(storage_backend="sqlite")
+    with pytest.raises(ValidationError):
+        Settings(storage_backend="memory", mongo_max_pool_size=0)
+    assert Settings.from_env(None, storage_backend="memory").storage_backend == "memory"
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import archive
+from memory_repositories import MemoryArchiveWatermarkRepository, MemoryTimesheetRepository
+
+START = datetime(2024, 1, 1)
+WATERMARK = START + timedelta(days=20)
+
+
+def _timesheet(day: int, status: str = "approved", employee_id: str = "e1") -> dict:
+    return {
+        "id": f"t{day:03d}", "employee_id": employee_id, "project_id": "p1", "date": START + timedelta(days=day),
+        "hours": 1.0, "description": "", "status": status,
+    }
+
+
+class CountingRepository:
+    """Delegates to a repository, counting page() calls."""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.pages = 0
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    async def page(self, *args, **kwargs):
+        self.pages += 1
+        return await self.repository.page(*args, **kwargs)
+
+
+def _tiered(timesheets):
+    cold = CountingRepository(MemoryTimesheetRepository())
+    tiered = archive.TieredTimesheetRepository(
+        MemoryTimesheetRepository(), cold, MemoryArchiveWatermarkRepository(), watermark_ttl=0
+    )
+
+    async def load():
+        await tiered.insert_many(timesheets)
+        moved = await archive.archive_timesheets(tiered, WATERMARK, batch_size=7, settle_seconds=0, log=lambda _: None)
+        cold.pages = 0
+        return moved
+
+    return tiered, cold, asyncio.run(load())
+
+
+async def _all_pages(repository, criteria: dict, limit: int) -> list:
+    seen, cursor = [], None
+    while True:
+        documents, cursor = await repository.page(criteria, limit, cursor, True, ["id", "date", "status"])
+        seen += [document["id"] for document in documents]
+        if cursor is None:
+            return seen
+
+
+def test_pages_merge_hot_and_archived_rows():
+    timesheets = [_timesheet(day, "submitted" if day % 5 == 0 else "approved") for day in range(40)]
+    tiered, cold, moved = _tiered(timesheets)
+    assert moved == 16  # approved and dated before day 20
+    expected = [timesheet["id"] for timesheet in sorted(timesheets, key=lambda t: t["date"], reverse=True)]
+    for limit in (1, 3, 7, 40, 100):
+        assert asyncio.run(_all_pages(tiered, {}, limit)) == expected
+
+
+def test_full_recent_page_skips_the_archive():
+    tiered, cold, _ = _tiered([_timesheet(day) for day in range(40)])
+    documents, cursor = asyncio.run(tiered.page({}, 10, None, True, ["id", "date"]))
+    assert [document["id"] for document in documents] == [f"t{day:03d}" for day in range(39, 29, -1)]
+    assert cold.pages == 0
+    # The page crossing the watermark does read the archive
+    documents, cursor = asyncio.run(tiered.page({}, 15, cursor, True, ["id", "date"]))
+    assert cold.pages == 1
+    assert [document["id"] for document in documents] == [f"t{day:03d}" for day in range(29, 14, -1)]
+
+
+def test_hot_tier_ending_exactly_on_a_full_page_still_continues_into_the_archive():
+    tiered, cold, _ = _tiered([_timesheet(day) for day in range(30)])
+    documents, cursor = asyncio.run(tiered.page({}, 10, None, True, ["id", "date"]))
+    assert len(documents) == 10 and cursor is not None and cold.pages == 0
+    documents, cursor = asyncio.run(tiered.page({}, 10, cursor, True, ["id", "date"]))
+    assert [document["id"] for document in documents] == [f"t{day:03d}" for day in range(19, 9, -1)]
+
+
+def test_reads_that_cannot_match_archived_rows_stay_hot():
+    tiered, cold, _ = _tiered([_timesheet(day) for day in range(40)])
+    asyncio.run(tiered.page({"status": "submitted"}, 10, None, True, ["id", "date"]))
+    asyncio.run(tiered.page({"date_from": WATERMARK}, 100, None, True, ["id", "date"]))
+    assert cold.pages == 0
+    assert asyncio.run(tiered.find_one({"id": "t003"}))["status"] == "approved"
+
+
+def test_update_many_limit_spans_the_tiers():
+    tiered, _, _ = _tiered([_timesheet(day) for day in range(40)])
+    updated = asyncio.run(tiered.update_many({"status": "approved"}, {"description": "checked"}, limit=25))
+    assert len(updated) == 25
+    documents, _ = asyncio.run(tiered.page({}, 100, None, True, ["id", "date", "description"]))
+    assert sum(document["description"] == "checked" for document in documents) == 25
+
+
+class EditingRepository(CountingRepository):
+    """Edits a row just before the first delete_many, as a manager could mid-run."""
+
+    def __init__(self, repository, timesheet_id: str):
+        super().__init__(repository)
+        self.timesheet_id = timesheet_id
+
+    async def delete_many(self, criteria: dict) -> int:
+        if self.timesheet_id is not None:
+            await self.repository.update(
+                {"id": self.timesheet_id}, {"description": "corrected", "updated_at": datetime(2024, 6, 1)}
+            )
+            self.timesheet_id = None
+        return await self.repository.delete_many(criteria)
+
+
+def test_rows_edited_while_being_archived_are_archived_as_edited():
+    hot = EditingRepository(MemoryTimesheetRepository(), "t009")
+    cold = MemoryTimesheetRepository()
+    tiered = archive.TieredTimesheetRepository(hot, cold, MemoryArchiveWatermarkRepository(), watermark_ttl=0)
+    timesheets = [{**_timesheet(day), "updated_at": START} for day in range(10)]
+
+    async def run():
+        await tiered.insert_many(timesheets)
+        moved = await archive.archive_timesheets(tiered, WATERMARK, batch_size=4, settle_seconds=0, log=lambda _: None)
+        return moved, await hot.find_one({}), await cold.find_one({"id": "t009"})
+
+    moved, left_hot, archived = asyncio.run(run())
+    assert moved == 10 and left_hot is None
+    assert archived["description"] == "corrected"
@@ -0,0 +1,56 @@
+from counters import GLOBAL_KEY, change_deltas, employee_key
+
+
+def timesheet(employee_id: str, hours: float, status: str) -> dict:
+    return {"employee_id": employee_id, "hours": hours, "status": status}
+
+
+def test_deltas_net_out_per_employee_and_globally():
+    deltas = change_deltas([
+        (None, timesheet("a", 8, "draft")),
+        (timesheet("a", 8, "draft"), timesheet("a", 6, "submitted")),
+        (timesheet("b", 4, "submitted"), timesheet("b", 4, "approved")),
+        (timesheet("b", 2, "approved"), None),
+    ])
+    assert deltas[employee_key("a")] == {
+        "total_hours": 6, "total_timesheets": 1, "approved_hours": 0,
+        "approved_timesheets": 0, "pending_hours": 6, "pending_timesheets": 1,
+    }
+    assert deltas[employee_key("b")] == {
+        "total_hours": -2, "total_timesheets": -1, "approved_hours": 2,
+        "approved_timesheets": 0, "pending_hours": -4, "pending_timesheets": -1,
+    }
+    assert deltas[GLOBAL_KEY] == {
+        "total_hours": 4, "total_timesheets": 0, "approved_hours": 2,
+        "approved_timesheets": 0, "pending_hours": 2, "pending_timesheets": 0,
+    }
+
+
+def test_rejected_only_counts_towards_totals():
+    deltas = change_deltas([(timesheet("a", 3, "submitted"), timesheet("a", 3, "rejected"))])
+    assert deltas[GLOBAL_KEY] == {
+        "total_hours": 0, "total_timesheets": 0, "approved_hours": 0,
+        "approved_timesheets": 0, "pending_hours": -3, "pending_timesheets": -1,
+    }
+
+
+def test_api_writes_keep_the_stored_counters_exact(client, users, repos, project):
+    employee, manager = users["employee"]["headers"], users["manager"]["headers"]
+    ids = []
+    for day, hours in ((2, 8), (3, 4), (4, 1)):
+        response = client.post("/api/timesheets", headers=employee, json={
+            "project_id": project["id"], "date": f"2024-01-0{day}T00:00:00", "hours": hours, "description": "x",
+        })
+        ids.append(response.json()["id"])
+    for timesheet_id in ids[:2]:
+        response = client.put(f"/api/timesheets/{timesheet_id}", headers=employee, json={"status": "submitted"})
+        assert response.status_code == 200
+    assert client.post(f"/api/timesheets/{ids[0]}/approve", headers=manager, json={"status": "approved"}).status_code == 200
+    assert client.delete(f"/api/timesheets/{ids[2]}", headers=employee).status_code == 200
+
+    stored = repos.counters.stored[employee_key(users["employee"]["id"])]
+    assert stored == {
+        "total_hours": 12, "total_timesheets": 2, "approved_hours": 8,
+        "approved_timesheets": 1, "pending_hours": 4, "pending_timesheets": 1,
+    }
+    assert repos.counters.stored[GLOBAL_KEY] == stored
@@ -0,0 +1,66 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+from exports import TIMESHEET_COLUMNS, csv_chunks, ndjson_chunks
+from tests.support import register
+
+
+async def _documents(count: int):
+    for index in range(count):
+        yield {"id": f"t{index}", "date": datetime(2024, 1, 1 + index), "hours": 1.5, "description": 'say "hi", then\nleave'}
+
+
+def _chunks(encoder, count: int, batch_size: int) -> list:
+    async def collect():
+        return [chunk async for chunk in encoder(_documents(count), TIMESHEET_COLUMNS, batch_size)]
+    return asyncio.run(collect())
+
+
+def test_csv_is_yielded_per_batch():
+    chunks = _chunks(csv_chunks, 5, 2)
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert [row["id"] for row in rows] == ["t0", "t1", "t2", "t3", "t4"]
+    assert rows[0]["date"] == "2024-01-01T00:00:00"
+    assert rows[0]["description"] == 'say "hi", then\nleave'
+    assert rows[0]["approved_by"] == ""
+    # An empty export is just the header
+    assert _chunks(csv_chunks, 0, 2) == [",".join(TIMESHEET_COLUMNS) + "\r\n"]
+
+
+def test_ndjson_is_yielded_per_batch():
+    chunks = _chunks(ndjson_chunks, 5, 2)
+    assert len(chunks) == 3
+    records = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [record["id"] for record in records] == ["t0", "t1", "t2", "t3", "t4"]
+    assert records[4] == {
+        **{column: None for column in TIMESHEET_COLUMNS},
+        "id": "t4", "date": "2024-01-05T00:00:00", "hours": 1.5, "description": 'say "hi", then\nleave',
+    }
+    assert _chunks(ndjson_chunks, 0, 2) == []
+
+
+def test_export_streams_the_callers_timesheets_in_date_order(client, users, project):
+    other = register(client, "employee", "other")
+    client.post(f"/api/projects/{project['id']}/members", headers=users["manager"]["headers"], json={
+        "employee_ids": [other["id"]],
+    })
+    for headers, day in ((users["employee"]["headers"], 3), (other["headers"], 2), (users["employee"]["headers"], 1)):
+        client.post("/api/timesheets", headers=headers, json={
+            "project_id": project["id"], "date": f"2024-01-0{day}T00:00:00", "hours": day, "description": "x",
+        })
+
+    response = client.get("/api/timesheets/export", headers=users["employee"]["headers"])
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="timesheets.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["date"], row["employee_id"]) for row in rows] == [
+        ("2024-01-01T00:00:00", users["employee"]["id"]), ("2024-01-03T00:00:00", users["employee"]["id"]),
+    ]
+
+    response = client.get("/api/timesheets/export?format=ndjson&date_from=2024-01-02T00:00:00", headers=users["manager"]["headers"])
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["hours"] for line in response.text.splitlines()] == [2, 3]
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from imports import ImportFormatError, csv_rows
+
+SAMPLE = (
+    '﻿username,project,date,hours,description\r\n'
+    'ada,Apollo,2024-01-02,7.5,"Design review, part 1"\r\n'
+    'ada,Apollo,2024-01-03,2,"Two\r\nlines and ""quotes"""\r\n'
+    '\r\n'
+    'bob,Zürich,2024-01-04,1,"Trailing\nnewline\n"\n'
+    'bob,Zürich,2024-01-05,8,no final line end'
+).encode("utf-8")
+
+EXPECTED = [
+    (1, ["username", "project", "date", "hours", "description"]),
+    (2, ["ada", "Apollo", "2024-01-02", "7.5", "Design review, part 1"]),
+    (3, ["ada", "Apollo", "2024-01-03", "2", 'Two\r\nlines and "quotes"']),
+    (6, ["bob", "Zürich", "2024-01-04", "1", "Trailing\nnewline\n"]),
+    (9, ["bob", "Zürich", "2024-01-05", "8", "no final line end"]),
+]
+
+
+def parse(chunks) -> list:
+    async def collect():
+        async def source():
+            for chunk in chunks:
+                yield chunk
+        return [record async for batch in csv_rows(source()) for record in batch]
+    return asyncio.run(collect())
+
+
+def test_records_and_line_numbers():
+    assert parse([SAMPLE]) == EXPECTED
+
+
+def test_every_split_point_gives_the_same_records():
+    # Cuts inside quoted fields, between "\r" and "\n", and inside the BOM and
+    # multi-byte characters
+    for cut in range(1, len(SAMPLE)):
+        assert parse([SAMPLE[:cut], SAMPLE[cut:]]) == EXPECTED, cut
+
+
+def test_byte_at_a_time():
+    assert parse([SAMPLE[i:i + 1] for i in range(len(SAMPLE))]) == EXPECTED
+
+
+def test_unterminated_quote():
+    with pytest.raises(ImportFormatError, match="line 2"):
+        parse([b'a,b\n1,"open\n', b'still open\n'])
+
+
+def test_not_utf8():
+    with pytest.raises(ImportFormatError, match="not UTF-8"):
+        parse([b'a,b\n', b'\xff\xfe,1\n'])
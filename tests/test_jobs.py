@@ -0,0 +1,125 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import counters
+import jobs
+from memory_repositories import MemoryJobRepository
+
+
+def _wait(client, headers, job_id: str) -> dict:
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(f"/api/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_counter_check_reports_drift_without_repairing(client, users, repos, project):
+    admin = users["admin"]["headers"]
+    client.post("/api/timesheets", headers=users["employee"]["headers"], json={
+        "project_id": project["id"], "date": "2024-01-02T00:00:00", "hours": 3, "description": "x",
+    })
+    repos.counters.stored[counters.GLOBAL_KEY]["total_hours"] += 5
+
+    response = client.post("/api/admin/counters/rebuild", headers=admin)
+    assert response.status_code == 202
+    job = _wait(client, admin, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["dry_run"] is True
+    assert job["result"]["sample"] == [[counters.GLOBAL_KEY, "total_hours", 8.0, 3.0]]
+    # Reported, not repaired
+    assert repos.counters.stored[counters.GLOBAL_KEY]["total_hours"] == 8.0
+
+
+def test_online_counter_repair_is_refused(client, users):
+    response = client.post("/api/admin/counters/rebuild?dry_run=false", headers=users["admin"]["headers"])
+    assert response.status_code == 400
+    assert client.post("/api/admin/counters/rebuild", headers=users["manager"]["headers"]).status_code == 403
+
+
+def test_jobs_are_only_visible_to_their_creator_and_admins(client, users):
+    response = client.post("/api/timesheets/export/jobs", headers=users["employee"]["headers"])
+    assert response.status_code == 202, response.text
+    job_id = response.json()["id"]
+    assert _wait(client, users["employee"]["headers"], job_id)["status"] == "succeeded"
+    assert client.get(f"/api/jobs/{job_id}", headers=users["manager"]["headers"]).status_code == 404
+    assert client.get(f"/api/jobs/{job_id}", headers=users["admin"]["headers"]).status_code == 200
+    output = client.get(f"/api/jobs/{job_id}/output", headers=users["employee"]["headers"])
+    assert output.status_code == 200
+
+
+def _abandoned_job(kind: str, status: str = jobs.RUNNING) -> dict:
+    stale = datetime.utcnow() - timedelta(seconds=jobs.ABANDONED_SECONDS + 60)
+    return {
+        "id": f"{kind}-job", "kind": kind, "params": {"project_id": "p1"}, "status": status,
+        "progress": {"done": 0, "total": None}, "result": None, "error": None, "created_by": None,
+        "created_at": stale, "started_at": stale, "finished_at": None, "heartbeat_at": stale,
+    }
+
+
+async def _settle(repository: MemoryJobRepository, job_ids) -> dict:
+    for _ in range(200):
+        found = {job_id: await repository.get(job_id) for job_id in job_ids}
+        if all(job["status"] in (jobs.SUCCEEDED, jobs.FAILED) for job in found.values()):
+            return found
+        await asyncio.sleep(0.01)
+    return found
+
+
+def test_abandoned_resumable_jobs_are_run_again_and_the_rest_failed():
+    calls = []
+
+    async def cascade(context, project_id):
+        calls.append(project_id)
+        return {"deleted_timesheets": 0}
+
+    async def scenario():
+        repository = MemoryJobRepository()
+        await repository.insert(_abandoned_job("cascade"))
+        await repository.insert(_abandoned_job("export", jobs.QUEUED))
+        runner = jobs.JobRunner(
+            repository, {"cascade": cascade, "export": cascade}, workers=1, max_queue=1, resumable={"cascade"}
+        )
+        await runner.start()
+        try:
+            return await _settle(repository, ["cascade-job", "export-job"])
+        finally:
+            await runner.stop()
+
+    found = asyncio.run(scenario())
+    assert found["cascade-job"]["status"] == jobs.SUCCEEDED
+    assert found["cascade-job"]["result"] == {"deleted_timesheets": 0}
+    assert found["export-job"]["status"] == jobs.FAILED
+    assert calls == ["p1"]
+
+
+def test_shutdown_requeues_resumable_jobs_for_the_next_worker():
+    async def scenario():
+        repository = MemoryJobRepository()
+        started, finish = asyncio.Event(), asyncio.Event()
+
+        async def cascade(context, project_id):
+            started.set()
+            await finish.wait()
+            return {"deleted_timesheets": 1}
+
+        first = jobs.JobRunner(repository, {"cascade": cascade}, workers=1, max_queue=1, resumable={"cascade"})
+        await first.start()
+        job = await first.submit("cascade", {"project_id": "p1"}, None)
+        await started.wait()
+        await first.stop()
+        interrupted = await repository.get(job["id"])
+
+        finish.set()
+        second = jobs.JobRunner(repository, {"cascade": cascade}, workers=1, max_queue=1, resumable={"cascade"})
+        await second.start()
+        try:
+            return interrupted, (await _settle(repository, [job["id"]]))[job["id"]]
+        finally:
+            await second.stop()
+
+    interrupted, resumed = asyncio.run(scenario())
+    assert interrupted["status"] == jobs.QUEUED
+    assert resumed["status"] == jobs.SUCCEEDED
@@ -0,0 +1,83 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import metrics
+from tests.support import make_client
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    """The value of the one sample of ``name`` carrying at least ``labels``."""
+    values = []
+    for line in text.splitlines():
+        match = re.fullmatch(r"([a-z_]+)(?:\{(.*)\})? (\S+)", line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ""))
+        if all(found.get(key) == value for key, value in labels.items()):
+            values.append(float(match.group(3)))
+    assert len(values) == 1, (name, labels, values)
+    return values[0]
+
+
+def test_registry_renders_the_text_format():
+    registry = metrics.Registry()
+    counter = registry.counter("things_total", "Things", ("kind",))
+    histogram = registry.histogram("wait_seconds", "Waits", buckets=(0.1, 1.0))
+    registry.gauge("depth", "Depth", collect=lambda: 7)
+    counter.inc('a "quoted"\nname')
+    counter.inc('a "quoted"\nname', amount=2)
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    with pytest.raises(ValueError):
+        registry.counter("things_total", "Again")
+
+    text = registry.render()
+    assert '# TYPE things_total counter' in text
+    assert 'things_total{kind="a \\"quoted\\"\\nname"} 3' in text
+    assert _sample(text, "wait_seconds_bucket", le="0.1") == 2
+    assert _sample(text, "wait_seconds_bucket", le="1.0") == 3
+    assert _sample(text, "wait_seconds_bucket", le="+Inf") == 4
+    assert _sample(text, "wait_seconds_count") == 4
+    assert _sample(text, "wait_seconds_sum") == pytest.approx(3.65)
+    assert _sample(text, "depth") == 7
+
+
+def test_requests_are_timed_by_route_template(client, users):
+    headers = users["employee"]["headers"]
+    for timesheet_id in ("a", "b"):
+        assert client.get(f"/api/timesheets/{timesheet_id}", headers=headers).status_code == 404
+    client.get("/api/no/such/route")
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    text = response.text
+    route = "/api/timesheets/{timesheet_id}"
+    assert _sample(text, "http_request_duration_seconds_count", method="GET", route=route, status="404") == 2
+    assert _sample(text, "http_request_duration_seconds_count", route="", status="404") == 1
+    assert _sample(text, "http_requests_in_flight") == 1  # this scrape
+    assert _sample(text, "cache_lookups_total", cache="users", result="hit") >= 2
+
+
+def test_metrics_can_be_disabled():
+    with make_client(metrics_enabled=False) as client:
+        assert client.get("/metrics").status_code == 404
+
+
+def test_mongodb_commands_are_timed_by_collection():
+    registry = metrics.Registry()
+    listener = metrics.CommandListener(registry)
+    find = SimpleNamespace(connection_id=("h", 1), request_id=1, command_name="find", command={"find": "timesheets"})
+    more = SimpleNamespace(
+        connection_id=("h", 1), request_id=2, command_name="getMore", command={"getMore": 5, "collection": "timesheets"},
+    )
+    listener.started(find)
+    listener.started(more)
+    listener.succeeded(SimpleNamespace(connection_id=("h", 1), request_id=1, command_name="find", duration_micros=1500))
+    listener.failed(SimpleNamespace(connection_id=("h", 1), request_id=2, command_name="getMore", duration_micros=10))
+
+    text = registry.render()
+    assert _sample(text, "mongodb_command_duration_seconds_sum", collection="timesheets", command="find") == 0.0015
+    assert _sample(text, "mongodb_command_duration_seconds_count", collection="timesheets", command="getMore") == 1
+    assert _sample(text, "mongodb_command_failures_total", collection="timesheets", command="getMore") == 1
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import base64
+
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+from repositories import TIMESHEET_SORT
+
+
+def test_cursor_round_trips_datetimes():
+    values = [datetime(2024, 5, 6, 7, 8, 9, 123000), "abc"]
+    assert decode_cursor(encode_cursor(values), TIMESHEET_SORT) == values
+
+
+def raw_cursor(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+BAD_CURSORS = [
+    "not base64!",
+    encode_cursor(["only one value"]),
+    encode_cursor([1, 2, 3]),
+    "eyJhIjogMX0",
+    raw_cursor('[{"$oid": "zz"}, "a"]'),
+    raw_cursor('[{"$binary": "!!"}, 1]'),
+    raw_cursor('[{"$date": "x"}, "a"]'),
+    raw_cursor('[{"$date": 99999999999999999999}, "a"]'),
+    raw_cursor('[{"$date": {"$numberLong": "9223372036854775807"}}, "a"]'),
+    # Well-formed, but not the sort fields' types
+    raw_cursor('[{"$date": "2024-01-01T00:00:00Z"}, {"$regex": ".*"}]'),
+    raw_cursor('[{"$gt": ""}, "a"]'),
+    raw_cursor('["2024-01-01", "a"]'),
+    raw_cursor('[{"$date": "2024-01-01T00:00:00Z"}, null]'),
+]
+
+
+@pytest.mark.parametrize("cursor", BAD_CURSORS)
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, TIMESHEET_SORT)
+
+
+@pytest.mark.parametrize("cursor", BAD_CURSORS)
+def test_bad_cursors_are_400s(client, users, cursor):
+    for path in ("/api/projects", "/api/timesheets", "/api/users"):
+        response = client.get(path, headers=users["admin"]["headers"], params={"cursor": cursor})
+        assert response.status_code == 400, (path, response.text)
+
+
+def test_keyset_filter_starts_strictly_after_the_cursor():
+    after = datetime(2024, 1, 1)
+    assert keyset_filter(TIMESHEET_SORT, [after, "t5"]) == {
+        "date": {"$lte": after},
+        "$or": [{"date": {"$lt": after}}, {"date": after, "id": {"$lt": "t5"}}],
+    }
+
+
+def _create(client, headers, project_id: str, day: int) -> str:
+    response = client.post("/api/timesheets", headers=headers, json={
+        "project_id": project_id, "date": f"2024-01-{day:02d}T00:00:00", "hours": 1, "description": "x",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_pages_cover_every_row_once_in_sort_order(client, users, project):
+    employee = users["employee"]["headers"]
+    # Several rows per date, so the id breaks ties between pages
+    created = {_create(client, employee, project["id"], 1 + index % 4): 1 + index % 4 for index in range(23)}
+    expected = sorted(created, key=lambda timesheet_id: (created[timesheet_id], timesheet_id), reverse=True)
+
+    for limit in (1, 5, 23, 50):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            body = client.get("/api/timesheets", headers=users["manager"]["headers"], params=params).json()
+            seen += [item["id"] for item in body["items"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == expected
+
+
+def test_unpaginated_and_invalid_cursor(client, users, project):
+    for day in (1, 2, 3):
+        _create(client, users["employee"]["headers"], project["id"], day)
+    body = client.get("/api/timesheets?paginate=false&limit=1", headers=users["manager"]["headers"]).json()
+    assert len(body["items"]) == 3 and body["next_cursor"] is None
+    response = client.get("/api/timesheets?cursor=garbage", headers=users["manager"]["headers"])
+    assert response.status_code == 400
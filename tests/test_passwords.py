@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+
+from passwords import PasswordHasher, PasswordHasherBusy, hash_rounds
+from tests.support import make_client, register
+
+
+def test_cancelled_callers_keep_their_slot_until_the_hash_ends():
+    release = threading.Event()
+
+    async def scenario():
+        hasher = PasswordHasher(rounds=4, workers=1, max_queue=1)
+        running = asyncio.create_task(hasher._run(release.wait))
+        queued = asyncio.create_task(hasher._run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PasswordHasherBusy):
+            await hasher._run(release.wait)
+        assert hasher.queue_depth == 1
+
+        # Disconnected clients: the running hash goes on, the queued one is dropped
+        running.cancel()
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        assert hasher.queue_depth == 0
+        waiting = asyncio.create_task(hasher._run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PasswordHasherBusy):
+            await asyncio.wait_for(hasher._run(release.wait), 1)
+        assert hasher.rejected == 2
+
+        release.set()
+        assert await waiting is True
+        await asyncio.sleep(0.05)
+        assert hasher._in_flight == 0
+        hasher.shutdown()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+
+
+def test_login_is_refused_with_503_while_the_hasher_is_saturated():
+    release = threading.Event()
+    with make_client(password_hash_workers=1, password_hash_max_queue=0) as client:
+        register(client, "employee")
+        hasher = client.app.state.services.password_hasher
+        busy = client.portal.start_task_soon(hasher._run, release.wait)
+        try:
+            response = client.post("/api/auth/login", json={"username": "employee", "password": "secret"})
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+        finally:
+            release.set()
+        busy.result()
+        response = client.post("/api/auth/login", json={"username": "employee", "password": "secret"})
+        assert response.status_code == 200
+
+
+def test_login_rehashes_passwords_made_at_another_cost(client, users, repos):
+    stored = client.portal.call(repos.users.get_by_username, "employee", True)["password"]
+    assert hash_rounds(stored) == 4
+
+    client.app.state.services.password_hasher.rounds = 5
+    assert client.post("/api/auth/login", json={"username": "employee", "password": "wrong"}).status_code == 401
+    assert hash_rounds(client.portal.call(repos.users.get_by_username, "employee", True)["password"]) == 4
+    assert client.post("/api/auth/login", json={"username": "employee", "password": "secret"}).status_code == 200
+    rehashed = client.portal.call(repos.users.get_by_username, "employee", True)["password"]
+    assert hash_rounds(rehashed) == 5
+    assert client.post("/api/auth/login", json={"username": "employee", "password": "secret"}).status_code == 200
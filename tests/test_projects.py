@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import members
+import versions
+from tests.support import register
+
+
+def test_membership_changes_bump_the_projects_etag(client, users, project):
+    manager = users["manager"]["headers"]
+    etag = client.get("/api/projects", headers=manager).headers["ETag"]
+    other = register(client, "employee", "other")
+    response = client.post(f"/api/projects/{project['id']}/members", headers=manager, json={
+        "employee_ids": [other["id"], users["employee"]["id"]],
+    })
+    assert response.json() == {"added": [other["id"]], "already_members": [users["employee"]["id"]]}
+    assert client.get("/api/projects", headers={**manager, "If-None-Match": etag}).status_code == 200
+    assert [item["id"] for item in client.get("/api/projects", headers=other["headers"]).json()["items"]] == [project["id"]]
+
+    path = f"/api/projects/{project['id']}/members/{other['id']}"
+    assert client.delete(path, headers=manager).status_code == 200
+    assert client.get("/api/projects", headers=other["headers"]).json()["items"] == []
+
+
+def test_stale_membership_never_outlives_the_cache(client, users, project):
+    # A membership change made through another worker: the shared stamp moves,
+    # this worker's cache does not
+    other = register(client, "employee", "other")
+    headers = other["headers"]
+    assert client.get("/api/projects", headers=headers).json()["items"] == []
+    repos = client.app.state.services.repos
+    client.portal.call(repos.members.add, project["id"], [other["id"]])
+    client.portal.call(repos.versions.bump, versions.PROJECTS)
+
+    stale = client.get("/api/projects", headers=headers)
+    assert stale.json()["items"] == []
+    # Once the cache entry expires, revalidating the stale tag gets the new list
+    client.app.state.services.membership_cache.invalidate(other["id"])
+    fresh = client.get("/api/projects", headers={**headers, "If-None-Match": stale.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert [item["id"] for item in fresh.json()["items"]] == [project["id"]]
+
+    dashboard = client.get("/api/dashboard/summary", headers=headers)
+    assert dashboard.json()["total_projects"] == 1
+    assert client.get("/api/dashboard/summary", headers={**headers, "If-None-Match": dashboard.headers["ETag"]}).status_code == 304
+
+
+def test_assigned_employees_arrays_are_migrated_once():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    created_at = datetime(2024, 1, 1)
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["timesheet"]
+        await db.projects.insert_many([
+            {"id": "p1", "name": "Apollo", "assigned_employees": ["e1", "e2", "e1"], "created_at": created_at},
+            {"id": "p2", "name": "Gemini", "assigned_employees": [], "created_at": created_at},
+            {"id": "p3", "name": "Mercury", "created_at": created_at},
+        ])
+        migrated = await members.migrate_assigned_employees(db)
+        rerun = await members.migrate_assigned_employees(db)
+        memberships = await db[members.COLLECTION].find({}, {"_id": 0}).sort("employee_id", 1).to_list(None)
+        leftover = await db.projects.count_documents({"assigned_employees": {"$exists": True}})
+        return migrated, rerun, memberships, leftover
+
+    migrated, rerun, memberships, leftover = asyncio.run(scenario())
+    assert migrated == 2
+    assert rerun == 0
+    assert memberships == [
+        {"project_id": "p1", "employee_id": "e1", "added_at": created_at},
+        {"project_id": "p1", "employee_id": "e2", "added_at": created_at},
+    ]
+    assert leftover == 0
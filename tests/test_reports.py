@@ -0,0 +1,147 @@
+from datetime import date, datetime
+
+from reports import STATUSES, merge_rollup_rows, project_burn_report
+from tests.support import register
+
+
+def _log(client, headers, project_id: str, day: str, hours: float) -> str:
+    response = client.post("/api/timesheets", headers=headers, json={
+        "project_id": project_id, "date": f"{day}T09:00:00", "hours": hours, "description": "x",
+    })
+    return response.json()["id"]
+
+
+def _by_status(**sums) -> dict:
+    # status=(hours, timesheets)
+    return {
+        status: dict(zip(("hours", "timesheets"), sums.get(status, (0, 0))))
+        for status in STATUSES
+    }
+
+
+def test_weekly_rollup_uses_iso_weeks_and_splits_by_status(client, users, project):
+    employee, manager = users["employee"]["headers"], users["manager"]["headers"]
+    # 2024-12-30 and 2025-01-05 are both in ISO week 2025-W01
+    _log(client, employee, project["id"], "2024-12-29", 1)
+    submitted = _log(client, employee, project["id"], "2024-12-30", 2)
+    _log(client, employee, project["id"], "2025-01-05", 4)
+    client.put(f"/api/timesheets/{submitted}", headers=employee, json={"status": "submitted"})
+
+    body = client.get("/api/reports/hours?period=week&group_by=employee", headers=manager).json()
+    assert body["period"] == "week" and body["group_by"] == ["employee"]
+    employee_id = users["employee"]["id"]
+    assert body["rows"] == [
+        {"period": "2024-W52", "employee_id": employee_id, "total_hours": 1, "total_timesheets": 1,
+         "by_status": _by_status(draft=(1, 1))},
+        {"period": "2025-W01", "employee_id": employee_id, "total_hours": 6, "total_timesheets": 2,
+         "by_status": _by_status(draft=(4, 1), submitted=(2, 1))},
+    ]
+
+    body = client.get("/api/reports/hours?period=month&group_by=&date_from=2025-01-01T00:00:00", headers=manager).json()
+    assert [(row["period"], row["total_hours"]) for row in body["rows"]] == [("2025-01", 4)]
+
+
+def test_rollups_are_scoped_like_the_timesheet_list(client, users, project):
+    other = register(client, "employee", "other")
+    client.post(f"/api/projects/{project['id']}/members", headers=users["manager"]["headers"], json={
+        "employee_ids": [other["id"]],
+    })
+    _log(client, users["employee"]["headers"], project["id"], "2024-01-02", 3)
+    _log(client, other["headers"], project["id"], "2024-01-02", 5)
+
+    mine = client.get("/api/reports/hours?group_by=project", headers=users["employee"]["headers"]).json()
+    assert [row["total_hours"] for row in mine["rows"]] == [3]
+    everyone = client.get("/api/reports/hours?group_by=project", headers=users["manager"]["headers"]).json()
+    assert [(row["project_id"], row["total_hours"]) for row in everyone["rows"]] == [(project["id"], 8)]
+    response = client.get("/api/reports/hours?group_by=employee,status", headers=users["manager"]["headers"])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cannot group by: status"
+
+
+def _row(period: str, hours: float, timesheets: int, **sums) -> dict:
+    return {
+        "period": period, "employee_id": "a", "total_hours": hours, "total_timesheets": timesheets,
+        "by_status": _by_status(**sums),
+    }
+
+
+def test_merged_rollups_sum_matching_groups():
+    hot = [_row("2024-W01", 2, 1, draft=(2, 1))]
+    archived = [_row("2023-W52", 8, 1, approved=(8, 1)), _row("2024-W01", 5, 2, approved=(5, 2))]
+    assert merge_rollup_rows(hot, archived) == [
+        _row("2023-W52", 8, 1, approved=(8, 1)),
+        _row("2024-W01", 7, 3, draft=(2, 1), approved=(5, 2)),
+    ]
+    # The inputs are left as they were
+    assert hot == [_row("2024-W01", 2, 1, draft=(2, 1))]
+
+
+START = datetime(2024, 1, 1)
+
+
+def _burn(hours_by_day: dict, today: date, **project) -> dict:
+    facets = {
+        "by_day": [{"_id": day, "hours": hours} for day, hours in sorted(hours_by_day.items())],
+        "by_employee": [{
+            "_id": "e1", "hours": sum(hours_by_day.values()), "approved_hours": 0, "timesheets": len(hours_by_day),
+        }] if hours_by_day else [],
+    }
+    return project_burn_report({"id": "p1", "name": "Apollo", "start_date": START, **project}, facets, today)
+
+
+def test_burn_without_a_budget():
+    report = _burn({"2024-01-01": 8}, date(2024, 1, 4), budget_hours=None)
+    assert report["budget_hours"] is None
+    assert report["remaining_hours"] is None and report["percent_consumed"] is None
+    assert report["projected_exhaustion_date"] is None
+    assert report["daily_burn_rate"] == 2  # 8 hours over four days
+
+
+def test_burn_with_nothing_logged():
+    report = _burn({}, date(2024, 1, 10), budget_hours=100)
+    assert report["daily_burn_rate"] == 0
+    assert report["remaining_hours"] == 100 and report["percent_consumed"] == 0
+    assert report["projected_exhaustion_date"] is None
+
+
+def test_burn_projects_the_exhaustion_date():
+    report = _burn({"2024-01-01": 10, "2024-01-02": 10}, date(2024, 1, 2), budget_hours=100)
+    assert report["daily_burn_rate"] == 10
+    assert report["projected_exhaustion_date"] == "2024-01-10"
+
+
+def test_burn_over_budget():
+    report = _burn({"2024-01-01": 80, "2024-01-02": 40}, date(2024, 1, 2), budget_hours=100)
+    assert report["remaining_hours"] == -20
+    assert report["percent_consumed"] == 120
+    assert report["projected_exhaustion_date"] is None
+
+
+def test_burn_projection_past_the_calendar():
+    report = _burn({"2024-01-01": 0.01}, date(2024, 1, 1), budget_hours=1e9)
+    assert report["projected_exhaustion_date"] is None
+    # Just inside date.max still projects
+    report = _burn({"2024-01-01": 1}, date(2024, 1, 1), budget_hours=(date.max - date(2024, 1, 1)).days)
+    assert report["projected_exhaustion_date"] == "9999-12-30"
+
+
+def test_burn_of_an_ended_project():
+    report = _burn({"2024-01-01": 10}, date(2024, 6, 1), budget_hours=100, end_date=datetime(2024, 1, 10))
+    assert report["daily_burn_rate"] == 1  # over the ten days the project ran
+    assert report["projected_exhaustion_date"] is None
+
+
+def test_project_report_is_cached_until_a_timesheet_changes(client, users, project):
+    manager = users["manager"]["headers"]
+    path = f"/api/projects/{project['id']}/report"
+    assert client.get(path, headers=users["employee"]["headers"]).status_code == 403
+    assert client.get("/api/projects/missing/report", headers=manager).status_code == 404
+    assert client.get(path, headers=manager).json()["consumed_hours"] == 0
+
+    timesheet = _log(client, users["employee"]["headers"], project["id"], "2024-01-02", 6)
+    report = client.get(path, headers=manager).json()
+    assert (report["consumed_hours"], report["remaining_hours"]) == (6, 94)
+    assert report["by_employee"][0]["employee_id"] == users["employee"]["id"]
+
+    client.post(f"/api/timesheets/{timesheet}/approve", headers=manager, json={"status": "rejected"})
+    assert client.get(path, headers=manager).json()["consumed_hours"] == 0
@@ -0,0 +1,66 @@
+from datetime import datetime
+from functools import partial
+
+import seed
+from counters import GLOBAL_KEY
+
+END = datetime(2025, 1, 1)
+
+
+def _dataset(seed_value: int = 1, **sizes) -> seed.Dataset:
+    sizes = {
+        "admins": 1, "managers": 2, "employees": 12, "projects": 4, "members": 3, "timesheets": 300, "days": 60,
+        **sizes,
+    }
+    return seed.Dataset(seed=seed_value, end=END, **sizes)
+
+
+def _documents(dataset: seed.Dataset) -> tuple:
+    return (
+        list(dataset.users({role: role for role in seed.ROLES})),
+        list(dataset.project_documents()),
+        list(dataset.membership_documents()),
+        list(dataset.timesheet_documents()),
+    )
+
+
+def test_the_same_seed_gives_the_same_documents():
+    first = _documents(_dataset())
+    assert first == _documents(_dataset())
+    # Each generator restarts its stream
+    dataset = _dataset()
+    assert list(dataset.timesheet_documents()) == list(dataset.timesheet_documents()) == first[3]
+
+    other = _documents(_dataset(2))
+    assert {user["id"] for user in other[0]}.isdisjoint(user["id"] for user in first[0])
+    assert [timesheet["id"] for timesheet in other[3]] != [timesheet["id"] for timesheet in first[3]]
+
+
+def test_documents_are_consistent():
+    dataset = _dataset()
+    users, projects, memberships, timesheets = _documents(dataset)
+    assert len(users) == 15 and len(projects) == 4 and len(timesheets) == 300
+    assert len({user["username"] for user in users}) == 15
+
+    assigned = {(membership["project_id"], membership["employee_id"]) for membership in memberships}
+    assert len(assigned) == len(memberships)
+    employees = {user["id"] for user in users if user["role"] == "employee"}
+    assert {employee_id for _, employee_id in assigned} == employees
+    for timesheet in timesheets:
+        assert (timesheet["project_id"], timesheet["employee_id"]) in assigned
+        assert dataset.start <= timesheet["date"] < END
+        assert (timesheet["approved_by"] is not None) == (timesheet["status"] == "approved")
+        assert (timesheet["submitted_at"] is None) == (timesheet["status"] == "draft")
+
+
+def test_seeded_data_is_usable_through_the_api(client, repos):
+    dataset = _dataset()
+    written = client.portal.call(partial(seed.seed, repos, dataset, 4, batch_size=50, log=lambda _: None))
+    assert written == {"users": 15, "projects": 4, "members": len(list(dataset.membership_documents())), "timesheets": 300}
+
+    login = client.post("/api/auth/login", json={"username": "manager00000", "password": "seed-manager"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    summary = client.get("/api/dashboard/summary", headers=headers).json()
+    hours = sum(timesheet["hours"] for timesheet in dataset.timesheet_documents())
+    assert summary["total_hours"] == repos.counters.stored[GLOBAL_KEY]["total_hours"] == hours
+    assert (summary["total_projects"], summary["total_employees"], summary["total_timesheets"]) == (4, 12, 300)
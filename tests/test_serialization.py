@@ -0,0 +1,112 @@
+from datetime import datetime
+
+from tests.support import make_client, register
+
+LEGACY_PROJECT = {
+    # Stored before end_date / budget_hours existed
+    "id": "legacy",
+    "name": "Legacy",
+    "description": "Imported",
+    "start_date": datetime(2023, 1, 1),
+    "status": "active",
+    "created_by": "someone",
+    "created_at": datetime(2023, 1, 1),
+}
+ALL_PROJECT_FIELDS = "id,name,description,start_date,end_date,status,assigned_employees,budget_hours,created_by,created_at"
+
+
+def _projects(fast: bool, path: str) -> dict:
+    with make_client(fast_list_serialization=fast) as client:
+        manager = register(client, "manager")
+        client.portal.call(client.app.state.services.repos.projects.insert, dict(LEGACY_PROJECT))
+        response = client.get(path, headers=manager["headers"])
+        assert response.status_code == 200, response.text
+        return response.json()
+
+
+def test_fast_list_matches_models_for_legacy_documents():
+    path = f"/api/projects?fields={ALL_PROJECT_FIELDS}"
+    fast, modelled = _projects(True, path), _projects(False, path)
+    assert fast == modelled
+    assert fast["items"][0]["budget_hours"] is None
+    assert fast["items"][0]["end_date"] is None
+    assert fast["items"][0]["assigned_employees"] == []
+
+
+def test_sparse_fieldsets_fill_defaults():
+    listed = _projects(False, "/api/projects?fields=id,budget_hours,end_date")
+    assert listed["items"][0] == {"id": "legacy", "created_at": "2023-01-01T00:00:00", "budget_hours": None, "end_date": None}
+    detail = _projects(False, "/api/projects/legacy?fields=id,budget_hours")
+    assert detail == {"id": "legacy", "budget_hours": None}
+
+
+def test_sparse_detail_matches_full_detail():
+    full = _projects(True, "/api/projects/legacy")
+    sparse = _projects(True, "/api/projects/legacy?fields=id,end_date,budget_hours,status")
+    assert sparse == {field: full[field] for field in sparse}
+
+
+LEGACY_TIMESHEET = {
+    # A draft from before the approval fields were written on every row
+    "id": "legacy-timesheet",
+    "employee_id": "someone",
+    "project_id": "legacy",
+    "date": datetime(2023, 1, 2),
+    "hours": 3.5,
+    "description": "Imported",
+    "status": "draft",
+    "created_at": datetime(2023, 1, 2),
+    "updated_at": datetime(2023, 1, 2),
+}
+ALL_TIMESHEET_FIELDS = (
+    "id,employee_id,project_id,date,hours,description,status,submitted_at,approved_at,approved_by,"
+    "rejected_at,rejected_by,rejection_reason,created_at,updated_at"
+)
+
+
+def _timesheets(fast: bool, path: str) -> dict:
+    with make_client(fast_list_serialization=fast) as client:
+        manager = register(client, "manager")
+        client.portal.call(client.app.state.services.repos.timesheets.insert, dict(LEGACY_TIMESHEET))
+        response = client.get(path, headers=manager["headers"])
+        assert response.status_code == 200, response.text
+        return response.json()
+
+
+def test_fast_timesheet_list_matches_models():
+    for path in ("/api/timesheets", f"/api/timesheets?fields={ALL_TIMESHEET_FIELDS}", "/api/timesheets?fields=id,approved_by"):
+        fast, modelled = _timesheets(True, path), _timesheets(False, path)
+        assert fast == modelled, path
+    item = _timesheets(True, f"/api/timesheets?fields={ALL_TIMESHEET_FIELDS}")["items"][0]
+    assert item["approved_by"] is None and item["rejection_reason"] is None
+
+
+def test_unknown_fields_are_rejected(client, users, project):
+    timesheet = client.post("/api/timesheets", headers=users["employee"]["headers"], json={
+        "project_id": project["id"], "date": "2024-01-02T00:00:00", "hours": 1, "description": "x",
+    }).json()
+    for path in (
+        "/api/projects", f"/api/projects/{project['id']}",
+        "/api/timesheets", f"/api/timesheets/{timesheet['id']}",
+        "/api/users",
+    ):
+        response = client.get(path, headers=users["admin"]["headers"], params={"fields": "id, nope,_id"})
+        assert response.status_code == 400, path
+        assert response.json()["detail"] == "Unknown field(s): nope, _id"
+    # Password hashes are not a field of any response model
+    response = client.get("/api/users", headers=users["admin"]["headers"], params={"fields": "password"})
+    assert response.status_code == 400
+
+
+def test_sparse_lists_keep_their_sort_key_for_paging(client, users, project):
+    for day in (1, 2, 3):
+        client.post("/api/timesheets", headers=users["employee"]["headers"], json={
+            "project_id": project["id"], "date": f"2024-01-0{day}T00:00:00", "hours": day, "description": "x",
+        })
+    first = client.get("/api/timesheets?fields=hours&limit=2", headers=users["manager"]["headers"]).json()
+    assert [set(item) for item in first["items"]] == [{"id", "date", "hours"}] * 2
+    rest = client.get("/api/timesheets", headers=users["manager"]["headers"], params={
+        "fields": "hours", "limit": 2, "cursor": first["next_cursor"],
+    }).json()
+    assert [item["hours"] for item in first["items"] + rest["items"]] == [3, 2, 1]
+    assert rest["next_cursor"] is None
@@ -0,0 +1,202 @@
+import pytest
+
+from counters import GLOBAL_KEY
+from server import MAX_BULK_ENTRIES
+from tests.support import register
+
+
+def _create(client, headers, project_id: str, **overrides) -> dict:
+    response = client.post("/api/timesheets", headers=headers, json={
+        "project_id": project_id, "date": "2024-01-02T00:00:00", "hours": 4, "description": "Work", **overrides,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _approve(client, headers, timesheet_id: str, status: str = "approved"):
+    return client.post(f"/api/timesheets/{timesheet_id}/approve", headers=headers, json={"status": status})
+
+
+@pytest.fixture
+def other_employee(client, project, users) -> dict:
+    other = register(client, "employee", "other")
+    response = client.post(f"/api/projects/{project['id']}/members", headers=users["manager"]["headers"], json={
+        "employee_ids": [other["id"]],
+    })
+    assert response.status_code == 200, response.text
+    return other
+
+
+def test_employees_cannot_touch_other_employees_timesheets(client, users, project, other_employee):
+    timesheet = _create(client, users["employee"]["headers"], project["id"])
+    path = f"/api/timesheets/{timesheet['id']}"
+    assert client.put(path, headers=other_employee["headers"], json={"hours": 1}).status_code == 403
+    assert client.delete(path, headers=other_employee["headers"]).status_code == 403
+    assert client.get(path, headers=users["employee"]["headers"]).json()["hours"] == 4
+
+
+def test_finalized_timesheets_are_read_only_for_employees(client, users, project):
+    employee, manager = users["employee"]["headers"], users["manager"]["headers"]
+    for status in ("approved", "rejected"):
+        timesheet = _create(client, employee, project["id"])
+        path = f"/api/timesheets/{timesheet['id']}"
+        assert _approve(client, manager, timesheet["id"], status).status_code == 200
+        response = client.put(path, headers=employee, json={"hours": 1})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Cannot edit approved/rejected timesheets"
+        assert client.delete(path, headers=employee).status_code == 400
+        # Managers are not bound by the guard
+        assert client.put(path, headers=manager, json={"hours": 2}).json()["hours"] == 2
+
+
+def test_approval_transitions(client, users, project):
+    employee, manager = users["employee"]["headers"], users["manager"]["headers"]
+    timesheet = _create(client, employee, project["id"])
+    assert _approve(client, employee, timesheet["id"]).status_code == 403
+    assert _approve(client, manager, timesheet["id"], "submitted").status_code == 400
+    approved = _approve(client, manager, timesheet["id"])
+    assert approved.status_code == 200
+    assert approved.json()["approved_by"] == users["manager"]["id"]
+    assert _approve(client, manager, timesheet["id"], "rejected").status_code == 409
+    assert _approve(client, manager, "missing").status_code == 404
+
+
+def test_missing_timesheets(client, users):
+    employee = users["employee"]["headers"]
+    assert client.put("/api/timesheets/missing", headers=employee, json={"hours": 1}).status_code == 404
+    assert client.delete("/api/timesheets/missing", headers=employee).status_code == 404
+
+
+def test_unassigned_employees_cannot_log_time(client, users, project):
+    other = register(client, "employee", "other")
+    response = client.post("/api/timesheets", headers=other["headers"], json={
+        "project_id": project["id"], "date": "2024-01-02T00:00:00", "hours": 4, "description": "Work",
+    })
+    assert response.status_code == 403
+
+
+def test_etags_answer_304_until_a_relevant_write(client, users, project, other_employee):
+    employee = users["employee"]["headers"]
+    _create(client, employee, project["id"])
+    first = client.get("/api/timesheets", headers=employee)
+    etag = first.headers["ETag"]
+    assert client.get("/api/timesheets", headers={**employee, "If-None-Match": etag}).status_code == 304
+    # Another employee's timesheets are outside this list
+    _create(client, other_employee["headers"], project["id"])
+    assert client.get("/api/timesheets", headers={**employee, "If-None-Match": etag}).status_code == 304
+    # The URL and the caller are part of the tag
+    assert client.get("/api/timesheets?limit=5", headers={**employee, "If-None-Match": etag}).status_code == 200
+    assert client.get("/api/timesheets", headers={**users["manager"]["headers"], "If-None-Match": etag}).status_code == 200
+
+    _create(client, employee, project["id"], date="2024-01-03T00:00:00")
+    changed = client.get("/api/timesheets", headers={**employee, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()["items"]) == 2
+
+
+def test_bulk_writes_publish_one_event_per_subscriber(client, users, project):
+    # More rows than a subscriber queue holds (event_queue_size=100)
+    broker = client.app.state.services.event_broker
+    manager_events = broker.subscribe()
+    employee_events = broker.subscribe(users["employee"]["id"])
+    entries = [
+        {"project_id": project["id"], "date": f"2024-02-{1 + index % 28:02d}T00:00:00", "hours": 1, "description": "x"}
+        for index in range(150)
+    ]
+    response = client.post("/api/timesheets/bulk", headers=users["employee"]["headers"], json={"entries": entries})
+    assert response.json()["created"] == 150
+
+    assert broker.evictions == 0
+    for subscriber in (manager_events, employee_events):
+        assert subscriber.queue.qsize() == 1
+        event = subscriber.queue.get_nowait()
+        assert event["type"] == "bulk"
+        assert len(event["data"]["ids"]) == 150
+
+
+def _submitted(client, headers, project_id: str, count: int) -> list:
+    entries = [
+        {"project_id": project_id, "date": f"2024-03-{1 + index:02d}T00:00:00", "hours": 1, "description": "x"}
+        for index in range(count)
+    ]
+    response = client.post("/api/timesheets/bulk", headers=headers, json={"entries": entries, "submit": True})
+    return [result["timesheet"]["id"] for result in response.json()["results"]]
+
+
+def test_bulk_approval_by_ids_reports_skipped_ids(client, users, project):
+    employee, manager = users["employee"]["headers"], users["manager"]["headers"]
+    submitted = _submitted(client, employee, project["id"], 3)
+    draft = _create(client, employee, project["id"])["id"]
+    ids = [*submitted, draft, "missing"]
+    response = client.post("/api/timesheets/bulk/approve", headers=manager, json={"status": "approved", "ids": ids})
+    assert response.json() == {"updated": 3, "skipped": 2, "skipped_ids": [draft, "missing"], "truncated": False}
+    # Already approved: nothing changes the second time
+    response = client.post("/api/timesheets/bulk/approve", headers=manager, json={"status": "rejected", "ids": ids})
+    assert response.json()["updated"] == 0
+    assert client.get(f"/api/timesheets/{submitted[0]}", headers=manager).json()["status"] == "approved"
+
+
+def test_bulk_approval_by_filter_is_capped(client, users, project, monkeypatch):
+    import server
+    monkeypatch.setattr(server, "MAX_BULK_APPROVAL_IDS", 4)
+    manager = users["manager"]["headers"]
+    _submitted(client, users["employee"]["headers"], project["id"], 10)
+    assert client.post("/api/timesheets/bulk/approve", headers=manager, json={"status": "approved"}).status_code == 400
+
+    results = []
+    while not results or results[-1]["truncated"]:
+        response = client.post("/api/timesheets/bulk/approve", headers=manager, json={
+            "status": "approved", "project_id": project["id"],
+        })
+        results.append(response.json())
+    assert [(result["updated"], result["truncated"]) for result in results] == [(4, True), (4, True), (2, False)]
+    listed = client.get("/api/timesheets", headers=manager).json()["items"]
+    assert {item["status"] for item in listed} == {"approved"}
+
+
+def test_bulk_create_reports_each_failed_entry(client, users, project):
+    manager = users["manager"]["headers"]
+    unassigned = client.post("/api/projects", headers=manager, json={
+        "name": "Gemini", "description": "", "start_date": "2024-01-01T00:00:00",
+    }).json()
+    entries = [
+        {"project_id": project["id"], "date": "2024-01-02T00:00:00", "hours": 8, "description": "a"},
+        {"project_id": "missing", "date": "2024-01-03T00:00:00", "hours": 8, "description": "b"},
+        {"project_id": unassigned["id"], "date": "2024-01-04T00:00:00", "hours": 8, "description": "c"},
+    ]
+    body = client.post("/api/timesheets/bulk", headers=users["employee"]["headers"], json={"entries": entries}).json()
+    assert (body["created"], body["failed"]) == (1, 2)
+    assert [(result["index"], result["error"]) for result in body["results"]] == [
+        (0, None), (1, "Project not found"), (2, "You are not assigned to this project"),
+    ]
+    assert body["results"][0]["timesheet"]["status"] == "draft"
+    listed = client.get("/api/timesheets", headers=manager).json()["items"]
+    assert [item["id"] for item in listed] == [body["results"][0]["timesheet"]["id"]]
+
+
+def test_bulk_submit_is_all_or_nothing(client, users, project, repos):
+    employee = users["employee"]["headers"]
+    week = [
+        {"project_id": project["id"], "date": f"2024-01-0{day}T00:00:00", "hours": 8, "description": "x"}
+        for day in range(1, 6)
+    ]
+    body = client.post("/api/timesheets/bulk", headers=employee, json={
+        "entries": [*week, {**week[0], "project_id": "missing"}], "submit": True,
+    }).json()
+    assert (body["created"], body["failed"]) == (0, 1)
+    assert all(result["timesheet"] is None for result in body["results"])
+    assert client.get("/api/timesheets", headers=employee).json()["items"] == []
+    assert GLOBAL_KEY not in repos.counters.stored
+
+    body = client.post("/api/timesheets/bulk", headers=employee, json={"entries": week, "submit": True}).json()
+    assert (body["created"], body["failed"]) == (5, 0)
+    assert {item["status"] for item in client.get("/api/timesheets", headers=employee).json()["items"]} == {"submitted"}
+    assert repos.counters.stored[GLOBAL_KEY]["pending_hours"] == 40
+
+
+def test_bulk_entries_are_bounded(client, users, project):
+    entry = {"project_id": project["id"], "date": "2024-01-02T00:00:00", "hours": 8, "description": "x"}
+    for entries in ([], [entry] * (MAX_BULK_ENTRIES + 1)):
+        response = client.post("/api/timesheets/bulk", headers=users["employee"]["headers"], json={"entries": entries})
+        assert response.status_code == 422
@@ -0,0 +1,57 @@
+from cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    clock = Clock()
+    cache = TTLCache(max_size=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # "b" is the least recently used
+    assert cache.get("b") is None and cache.get("c") == 3
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+
+    disabled = TTLCache(max_size=2, ttl=0)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
+
+
+def test_requests_are_served_from_the_user_cache(client, users, repos):
+    lookups = []
+    get_by_username = repos.users.get_by_username
+
+    async def counting(username):
+        lookups.append(username)
+        return await get_by_username(username)
+
+    repos.users.get_by_username = counting
+    for _ in range(3):
+        assert client.get("/api/auth/me", headers=users["employee"]["headers"]).status_code == 200
+    assert lookups == []
+
+
+def test_user_updates_take_effect_on_the_next_request(client, users):
+    admin, employee = users["admin"]["headers"], users["employee"]["headers"]
+    path = f"/api/users/{users['employee']['id']}"
+    assert client.get("/api/users", headers=employee).status_code == 403
+
+    assert client.put(path, headers=admin, json={"role": "manager"}).json()["role"] == "manager"
+    assert client.get("/api/auth/me", headers=employee).json()["role"] == "manager"
+    assert client.get("/api/users", headers=employee).status_code == 200
+
+    assert client.put(path, headers=admin, json={"is_active": False}).status_code == 200
+    response = client.get("/api/auth/me", headers=employee)
+    assert response.status_code == 400 and response.json()["detail"] == "Inactive user"
+
+    assert client.put(path, headers=admin, json={}).status_code == 400
+    assert client.put("/api/users/missing", headers=admin, json={"full_name": "X"}).status_code == 404